@@ -0,0 +1,261 @@
+"""
+Offline amenity POI index for nearby amenity lookups.
+
+Amenities from an OSM extract (a .osm.pbf file, read with the optional `osmium`
+package, or an Overpass `out center` JSON dump) are categorized once at build time
+with nearby_amenities.CATEGORY_MAPPING and stored as flat arrays. A KD-tree over
+projected coordinates answers the same bbox query get_nearby_amenities sends to
+Overpass, so amenity summaries for a point, or for whole arrays of points, are
+computed locally in well under a millisecond.
+
+Usage:
+    python amenity_index.py download --out data/amenities.json
+    python amenity_index.py build data/amenities.json --out amenity_index
+"""
+import argparse
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from sklearn.neighbors import KDTree
+
+from geo_utils import METERS_PER_DEGREE, bbox_offsets
+
+DEFAULT_INDEX_DIR = os.getenv(
+    "AMENITY_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "amenity_index")
+)
+META_FILENAME = "amenity_index.json"
+
+
+def elements_from_pbf(path: str) -> List[Dict]:
+    """
+    Return amenity nodes and ways of an OSM PBF extract as Overpass-style elements
+    (requires `osmium`). Ways get the mean of their node locations as `center`;
+    relations are skipped.
+    """
+    try:
+        import osmium
+    except ImportError:
+        raise ImportError("Reading .osm.pbf files requires the 'osmium' package (pip install osmium)")
+
+    elements = []
+
+    class AmenityHandler(osmium.SimpleHandler):
+        def node(self, node):
+            if "amenity" in node.tags:
+                elements.append({"lat": node.location.lat, "lon": node.location.lon, "tags": dict(node.tags)})
+
+        def way(self, way):
+            if "amenity" not in way.tags:
+                return
+            coords = [(node.lat, node.lon) for node in way.nodes if node.location.valid()]
+            if coords:
+                lat, lon = np.mean(coords, axis=0)
+                elements.append({"center": {"lat": float(lat), "lon": float(lon)}, "tags": dict(way.tags)})
+
+    AmenityHandler().apply_file(path, locations=True)
+    return elements
+
+
+class AmenityIndex:
+    """
+    Categorized amenity points with a KD-tree over projected coordinates.
+
+    Points are projected to metres around the index's mid-latitude
+    (x = lon * cos(mid_lat), y = lat), so a Chebyshev radius query returns a
+    square that contains each query's lat/lon bbox; an exact bbox filter on the
+    candidates then matches the Overpass query.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, category: np.ndarray,
+                 categories: List[str], names: List[str], types: List[str]):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.category = np.asarray(category, dtype=np.int8)
+        self.categories = list(categories)
+        self.names = names
+        self.types = types
+        if len(self.lat):
+            self.min_lat, self.max_lat = float(self.lat.min()), float(self.lat.max())
+            self.min_lon, self.max_lon = float(self.lon.min()), float(self.lon.max())
+        else:
+            self.min_lat = self.max_lat = self.min_lon = self.max_lon = 0.0
+        self.lon_scale = float(np.cos(np.radians((self.min_lat + self.max_lat) / 2)))
+        self.tree = KDTree(self._project(self.lat, self.lon), metric="chebyshev") if len(self.lat) else None
+
+    def _project(self, lat, lon):
+        return np.column_stack((
+            np.asarray(lon, dtype=np.float64) * METERS_PER_DEGREE * self.lon_scale,
+            np.asarray(lat, dtype=np.float64) * METERS_PER_DEGREE
+        ))
+
+    @classmethod
+    def from_elements(cls, elements: List[Dict]) -> "AmenityIndex":
+        """Categorize Overpass-style elements with the same rules as get_nearby_amenities."""
+        from nearby_amenities import AMENITY_CATEGORIES, parse_amenity_elements
+
+        amenities = [a for a in parse_amenity_elements(elements) if a["lat"] is not None and a["lon"] is not None]
+        codes = {category: i for i, category in enumerate(AMENITY_CATEGORIES)}
+        return cls(
+            lat=[a["lat"] for a in amenities],
+            lon=[a["lon"] for a in amenities],
+            category=[codes[a["category"]] for a in amenities],
+            categories=AMENITY_CATEGORIES,
+            names=[a["name"] for a in amenities],
+            types=[a["type"] for a in amenities]
+        )
+
+    def save(self, directory: str = DEFAULT_INDEX_DIR):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "coords.npy"), np.column_stack((self.lat, self.lon)))
+        np.save(os.path.join(directory, "category.npy"), self.category)
+        with open(os.path.join(directory, META_FILENAME), "w") as f:
+            json.dump({"categories": self.categories, "names": self.names, "types": self.types}, f)
+
+    @classmethod
+    def load(cls, directory: str = DEFAULT_INDEX_DIR) -> "AmenityIndex":
+        with open(os.path.join(directory, META_FILENAME)) as f:
+            meta = json.load(f)
+        coords = np.load(os.path.join(directory, "coords.npy"))
+        category = np.load(os.path.join(directory, "category.npy"))
+        return cls(coords[:, 0], coords[:, 1], category, meta["categories"], meta["names"], meta["types"])
+
+    def __len__(self):
+        return len(self.lat)
+
+    def covers(self, lat, lon, radius_meters: float = 1000):
+        """True where the bbox around each point lies inside the indexed area."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        lat_offset, lon_offset = bbox_offsets(lat, radius_meters)
+        return ((len(self) > 0) & (lat - lat_offset >= self.min_lat) & (lat + lat_offset <= self.max_lat) &
+                (lon - lon_offset >= self.min_lon) & (lon + lon_offset <= self.max_lon))
+
+    def query_indices(self, lat, lon, radius_meters: float = 1000) -> List[np.ndarray]:
+        """Sorted indices of the amenities inside the bbox around each point, vectorized over arrays of points."""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        lat_offset, lon_offset = bbox_offsets(lat, radius_meters)
+        if self.tree is None:
+            return [np.empty(0, dtype=np.int64) for _ in lat]
+
+        # Half-width of each bbox in projected metres is lon_offset * lon_scale, which exceeds
+        # radius_meters north of the mid-latitude; search the larger of the two half-widths
+        search_radius = np.maximum(radius_meters, lon_offset * METERS_PER_DEGREE * self.lon_scale) * (1 + 1e-9)
+        candidates = self.tree.query_radius(self._project(lat, lon), r=search_radius)
+
+        results = []
+        for i, idx in enumerate(candidates):
+            inside = ((np.abs(self.lat[idx] - lat[i]) <= lat_offset) &
+                      (np.abs(self.lon[idx] - lon[i]) <= lon_offset[i]))
+            results.append(np.sort(idx[inside]))
+        return results
+
+    def amenities(self, indices: np.ndarray) -> List[Dict]:
+        """Amenity records ({name, type, lat, lon, category}) for the given indices."""
+        return [
+            {
+                "name": self.names[i],
+                "type": self.types[i],
+                "lat": float(self.lat[i]),
+                "lon": float(self.lon[i]),
+                "category": self.categories[self.category[i]]
+            }
+            for i in indices
+        ]
+
+    def query(self, lat: float, lon: float, radius_meters: float = 1000) -> List[Dict]:
+        """Amenity records inside the bbox around one point, in build order."""
+        return self.amenities(self.query_indices(lat, lon, radius_meters)[0])
+
+    def category_counts(self, lat, lon, radius_meters: float = 1000) -> np.ndarray:
+        """Amenity counts per category for each point, shape (n_points, n_categories)."""
+        counts = [
+            np.bincount(self.category[idx], minlength=len(self.categories))
+            for idx in self.query_indices(lat, lon, radius_meters)
+        ]
+        return np.array(counts, dtype=np.int64).reshape(-1, len(self.categories))
+
+
+def build_amenity_index(source_path: str, out_dir: str = DEFAULT_INDEX_DIR) -> AmenityIndex:
+    """Build and save an AmenityIndex from an .osm.pbf extract or an Overpass JSON dump."""
+    if source_path.endswith(".pbf"):
+        elements = elements_from_pbf(source_path)
+    else:
+        with open(source_path) as f:
+            elements = json.load(f).get("elements", [])
+
+    index = AmenityIndex.from_elements(elements)
+    index.save(out_dir)
+    print(f"✅ Indexed {len(index):,} amenities (of {len(elements):,} elements) -> {out_dir}")
+    return index
+
+
+def download_region_amenities(out_path: str, train_path: str = os.path.join("data", "train.xlsx"),
+                              url: Optional[str] = None):
+    """Save an Overpass `out center` dump of all amenities over the training region."""
+    from http_clients import overpass_query
+    from regional_raster import region_bounds_from_training
+
+    min_lat, min_lon, max_lat, max_lon = region_bounds_from_training(train_path)
+    bbox = f"{min_lat},{min_lon},{max_lat},{max_lon}"
+    query = f"""
+    [out:json][timeout:900];
+    (
+      node["amenity"]({bbox});
+      way["amenity"]({bbox});
+      relation["amenity"]({bbox});
+    );
+    out center;
+    """
+    response = overpass_query(query, timeout=960, url=url)
+    response.raise_for_status()
+    with open(out_path, "wb") as f:
+        f.write(response.content)
+    print(f"✅ Saved amenities for {bbox} -> {out_path}")
+
+
+_amenity_index = None
+_amenity_index_loaded = False
+_amenity_index_lock = threading.Lock()
+
+
+def get_amenity_index() -> Optional[AmenityIndex]:
+    """Process-wide AmenityIndex from AMENITY_INDEX_DIR, or None if no index has been built."""
+    global _amenity_index, _amenity_index_loaded
+    if not _amenity_index_loaded:
+        with _amenity_index_lock:
+            if not _amenity_index_loaded:
+                if os.path.exists(os.path.join(DEFAULT_INDEX_DIR, META_FILENAME)):
+                    try:
+                        _amenity_index = AmenityIndex.load(DEFAULT_INDEX_DIR)
+                    except Exception as e:
+                        print(f"Could not load amenity index: {e}")
+                _amenity_index_loaded = True
+    return _amenity_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline amenity POI index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    download_parser = subparsers.add_parser("download", help="Dump the training region's amenities from Overpass")
+    download_parser.add_argument("--out", default=os.path.join("data", "amenities.json"))
+    download_parser.add_argument("--train", default=os.path.join("data", "train.xlsx"))
+
+    build_parser = subparsers.add_parser("build", help="Build the index from a .osm.pbf or Overpass JSON file")
+    build_parser.add_argument("source", help="OSM extract (.osm.pbf) or Overpass JSON dump")
+    build_parser.add_argument("--out", default=DEFAULT_INDEX_DIR)
+
+    args = parser.parse_args()
+    if args.command == "download":
+        download_region_amenities(args.out, train_path=args.train)
+    elif args.command == "build":
+        build_amenity_index(args.source, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,10 @@ import pandas as pd
 import os
 
 # Local service (replace backend HTTP calls)
-from price_predictor_service import predict_price, get_features, get_nearby_amenities
+from price_predictor_service import (
+    predict_price, get_features, get_nearby_amenities,
+    iter_location_features, predict_prices_batch, MAX_COMPARISON_LOCATIONS
+)
 
 st.set_page_config(
     layout="wide",
@@ -519,6 +522,11 @@ if lat and lon:
                         st.write(f"- Greenery (NDVI): {features_data.get('ndvi', 0):.3f}")
                         st.write(f"- Water (NDWI): {features_data.get('ndwi', 0):.3f}")
                         st.write(f"- Road Density: {features_data.get('road_density', 0):.3f}")
+                    
+                    timings = result.get("timings", {})
+                    if timings:
+                        st.write("\n**Timings (ms):**")
+                        st.write(" | ".join(f"{stage}: {ms:,.1f}" for stage, ms in timings.items()))
         except Exception as e:
             st.error(f"Error: {str(e)}")
     
@@ -680,9 +688,9 @@ if lat and lon:
         
         with col_add:
             if st.button("Add Current Location to Comparison", 
-                        disabled=len(st.session_state.comparison_locations) >= 3,
+                        disabled=len(st.session_state.comparison_locations) >= MAX_COMPARISON_LOCATIONS,
                         use_container_width=True):
-                if lat and lon and len(st.session_state.comparison_locations) < 3:
+                if lat and lon and len(st.session_state.comparison_locations) < MAX_COMPARISON_LOCATIONS:
                     # Check if location already exists
                     location_exists = False
                     for existing_loc in st.session_state.comparison_locations:
@@ -708,7 +716,7 @@ if lat and lon:
                 elif not lat or not lon:
                     st.error("Please select a location first")
                 else:
-                    st.warning("Maximum 3 locations allowed for comparison")
+                    st.warning(f"Maximum {MAX_COMPARISON_LOCATIONS} locations allowed for comparison")
         
         with col_clear:
             if st.button("Clear All", use_container_width=True):
@@ -720,67 +728,68 @@ if lat and lon:
         if st.session_state.comparison_locations:
             st.subheader(f"Comparing {len(st.session_state.comparison_locations)} Location{'s' if len(st.session_state.comparison_locations) > 1 else ''}")
             
-            # Create comparison data with progress
-            comparison_data = []
+            # Gather features for all locations concurrently and show each row as it arrives
+            locations = st.session_state.comparison_locations
+            comparison_data = [None] * len(locations)
+            gathered_features = [None] * len(locations)
+            
+            def location_row(loc, features=None, price=None, error=None):
+                if error is not None:
+                    price_text, per_sqft_text = f"Error: {str(error)[:20]}...", "Error"
+                elif price is not None:
+                    price_per_sqft = price / loc["sqft"] if loc["sqft"] > 0 else 0
+                    price_text, per_sqft_text = f"${price:,.0f}", f"${price_per_sqft:,.0f}"
+                else:
+                    price_text, per_sqft_text = "Scoring...", "..."
+                return {
+                    "Location": loc["name"],
+                    "Price": price_text,
+                    "Price/sqft": per_sqft_text,
+                    "Beds": loc["bedrooms"],
+                    "Baths": loc["bathrooms"],
+                    "Sqft": f"{loc['sqft']:,}",
+                    "Greenery": f"{features.get('ndvi', 0):.2f}" if features else "N/A",
+                    "Water": f"{features.get('ndwi', 0):.2f}" if features else "N/A",
+                    "Connectivity": f"{features.get('road_density', 0.3):.2f}" if features else "N/A"
+                }
             
             progress_bar = st.progress(0)
             status_text = st.empty()
+            table_slot = st.empty()
+            status_text.text(f"Analyzing {len(locations)} location{'s' if len(locations) > 1 else ''}...")
             
-            for i, loc in enumerate(st.session_state.comparison_locations):
-                status_text.text(f"Analyzing {loc['name']}...")
-                
-                try:
-                    # Use local service with all property features for comparison
-                    price_data = predict_price(
-                        bedrooms=loc["bedrooms"],
-                        bathrooms=loc["bathrooms"],
-                        sqft_living=loc.get("sqft_living", loc["sqft"]),
-                        lat=loc["lat"],
-                        lon=loc["lon"],
-                        sqft_lot=loc.get("sqft_lot", 5000),
-                        floors=loc.get("floors", 1),
-                        waterfront=loc.get("waterfront", 0),
-                        view=loc.get("view", 0),
-                        condition=loc.get("condition", 3),
-                        grade=loc.get("grade", 7),
-                        sqft_above=loc.get("sqft_above", loc.get("sqft_living", loc["sqft"])),
-                        sqft_basement=loc.get("sqft_basement", 0),
-                        yr_built=loc.get("yr_built", 2000),
-                        yr_renovated=loc.get("yr_renovated", 0)
-                    )
-                    predicted_price = price_data.get("predicted_price")
-                    price_per_sqft = predicted_price / loc["sqft"] if loc["sqft"] > 0 else 0
-
-                    features = get_features(loc["lat"], loc["lon"]) or {"ndvi": 0.0, "ndwi": 0.0, "road_density": 0.3}
-
-                    comparison_data.append({
-                        "Location": loc["name"],
-                        "Price": f"${predicted_price:,.0f}",
-                        "Price/sqft": f"${price_per_sqft:,.0f}",
-                        "Beds": loc["bedrooms"],
-                        "Baths": loc["bathrooms"],
-                        "Sqft": f"{loc['sqft']:,}",
-                        "Greenery": f"{features.get('ndvi', 0):.2f}",
-                        "Water": f"{features.get('ndwi', 0):.2f}",
-                        "Connectivity": f"{features.get('road_density', 0.3):.2f}"
-                    })
-                
-                except Exception as e:
-                    comparison_data.append({
-                        "Location": loc["name"],
-                        "Price": f"Error: {str(e)[:20]}...",
-                        "Price/sqft": "Error",
-                        "Beds": loc["bedrooms"],
-                        "Baths": loc["bathrooms"],
-                        "Sqft": f"{loc['sqft']:,}",
-                        "Greenery": "N/A",
-                        "Water": "N/A",
-                        "Connectivity": "N/A"
-                    })
-                
-                # Update progress
-                progress_bar.progress((i + 1) / len(st.session_state.comparison_locations))
+            for done, (i, features) in enumerate(iter_location_features(locations), start=1):
+                gathered_features[i] = features
+                comparison_data[i] = location_row(locations[i], features)
+                table_slot.dataframe(
+                    pd.DataFrame([row for row in comparison_data if row is not None]),
+                    use_container_width=True, hide_index=True
+                )
+                progress_bar.progress(done / len(locations))
+            
+            # Score every location with one batched model call
+            status_text.text("Scoring...")
+            try:
+                prices = predict_prices_batch([
+                    {
+                        **loc,
+                        "sqft_living": loc.get("sqft_living", loc["sqft"]),
+                        "sqft_above": loc.get("sqft_above", loc.get("sqft_living", loc["sqft"]))
+                    }
+                    for loc in locations
+                ], gathered_features)
+                comparison_data = [
+                    location_row(loc, features, float(price))
+                    for loc, features, price in zip(locations, gathered_features, prices)
+                ]
+            except Exception as e:
+                # Keep the gathered features; only the price columns failed
+                comparison_data = [
+                    location_row(loc, features, error=e)
+                    for loc, features in zip(locations, gathered_features)
+                ]
             
+            table_slot.empty()
             progress_bar.empty()
             status_text.empty()
             
@@ -963,11 +972,11 @@ if lat and lon:
             
         else:
             st.info("How to Compare Properties:")
-            st.markdown("""
+            st.markdown(f"""
             1. **Select a location** using coordinates or map click
             2. **Adjust property specs** in the sidebar (bedrooms, bathrooms, sqft)
             3. **Click "Add Current Location to Comparison"**
-            4. **Repeat steps 1-3** for up to 3 different locations
+            4. **Repeat steps 1-3** for up to {MAX_COMPARISON_LOCATIONS} different locations
             5. **View the comparison table** with prices, features, and analysis
             
             Tip: Compare similar properties to see how location affects price!
@@ -0,0 +1,143 @@
+"""
+Vectorized batch scoring helpers shared by the API and offline scoring tools.
+Turns property records into float64 feature matrices in `model/feature_names.txt`
+order and scores them with one `model.predict` call per chunk.
+"""
+import os
+from typing import Dict, Iterator, List, Sequence, Union
+
+import numpy as np
+
+FEATURE_NAMES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model", "feature_names.txt")
+
+# Same order as train_tabular.py; used when feature_names.txt is not available
+DEFAULT_FEATURE_COLUMNS = [
+    "bedrooms", "bathrooms", "sqft_living", "sqft_lot", "floors",
+    "waterfront", "view", "condition", "grade", "sqft_above",
+    "sqft_basement", "yr_built", "yr_renovated", "zipcode",
+    "lat", "long", "sqft_living15", "sqft_lot15"
+]
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def load_feature_names(path: str = FEATURE_NAMES_PATH) -> List[str]:
+    """Load the model's feature order from feature_names.txt (falls back to the training order)."""
+    if os.path.exists(path):
+        with open(path) as f:
+            names = [line.strip() for line in f if line.strip()]
+        if names:
+            return names
+    return list(DEFAULT_FEATURE_COLUMNS)
+
+
+FEATURE_COLUMNS = load_feature_names()
+
+
+def records_to_matrix(records: Sequence[Union[Sequence[float], Dict[str, float]]],
+                      feature_columns: Sequence[str] = FEATURE_COLUMNS) -> np.ndarray:
+    """
+    Convert property records to a float64 matrix of shape (n_records, n_features).
+
+    Each record is either a list of values already in feature order, or a dict
+    keyed by feature name (extra keys such as `id` are ignored).
+    Raises ValueError if a record is missing features or has the wrong length.
+    """
+    n_features = len(feature_columns)
+    X = np.empty((len(records), n_features), dtype=np.float64)
+
+    for i, record in enumerate(records):
+        if isinstance(record, dict):
+            missing = [name for name in feature_columns if record.get(name) is None]
+            if missing:
+                raise ValueError(f"Record {i} is missing features: {', '.join(missing)}")
+            X[i] = [record[name] for name in feature_columns]
+        else:
+            if len(record) != n_features:
+                raise ValueError(f"Record {i} has {len(record)} values, expected {n_features}")
+            X[i] = record
+
+    return X
+
+
+NEIGHBOURHOOD_COLUMNS = ("sqft_living15", "sqft_lot15")
+
+
+def frame_to_matrix(df, feature_columns: Sequence[str] = FEATURE_COLUMNS, neighbourhood_index=None) -> np.ndarray:
+    """
+    Select the feature columns of a DataFrame as a float64 matrix (raises ValueError if any are missing).
+    With a NeighbourhoodIndex, missing sqft_living15 / sqft_lot15 columns are computed from lat/long.
+    """
+    if neighbourhood_index is not None and not all(name in df.columns for name in NEIGHBOURHOOD_COLUMNS):
+        if "lat" in df.columns and "long" in df.columns:
+            df = neighbourhood_index.fill_frame(df)
+    missing = [name for name in feature_columns if name not in df.columns]
+    if missing:
+        raise ValueError(f"Input is missing feature columns: {', '.join(missing)}")
+    return df[list(feature_columns)].to_numpy(dtype=np.float64)
+
+
+# Property specs not set by the user (see properties_to_matrix)
+PROPERTY_DEFAULTS = {
+    "sqft_lot": 5000,
+    "floors": 1,
+    "waterfront": 0,
+    "view": 0,
+    "condition": 3,
+    "grade": 7,
+    "sqft_above": None,
+    "sqft_basement": 0,
+    "yr_built": 2000,
+    "yr_renovated": 0,
+    "zipcode": None
+}
+
+
+def resolve_zipcode(zipcode, location_features: Dict) -> str:
+    """Provided zipcode or the extracted one; missing or non-numeric values become the default Seattle zipcode."""
+    zipcode = str(zipcode or location_features.get("zipcode") or "98178")
+    return zipcode if zipcode.isdigit() else "98178"
+
+
+def properties_to_matrix(properties: Sequence[Dict], location_features: Sequence[Dict],
+                         feature_columns: Sequence[str] = FEATURE_COLUMNS, neighbourhood_index=None) -> np.ndarray:
+    """
+    Feature matrix for partial property specs (bedrooms, bathrooms, sqft_living,
+    lat and lon plus any PROPERTY_DEFAULTS keys) and their location features.
+    sqft_living15 / sqft_lot15 come from the NeighbourhoodIndex when given,
+    otherwise from the properties' own areas.
+    """
+    lats = np.array([prop["lat"] for prop in properties], dtype=np.float64)
+    lons = np.array([prop["lon"] for prop in properties], dtype=np.float64)
+
+    # Mean living/lot area of the 15 nearest training properties, like the training data
+    if neighbourhood_index is not None and len(properties):
+        sqft_living15, sqft_lot15 = neighbourhood_index.aggregates(lats, lons)
+    else:
+        # Fall back to the properties' own areas
+        sqft_living15 = [prop["sqft_living"] for prop in properties]
+        sqft_lot15 = [prop.get("sqft_lot") or PROPERTY_DEFAULTS["sqft_lot"] for prop in properties]
+
+    records = []
+    for i, (prop, features) in enumerate(zip(properties, location_features)):
+        spec = {**PROPERTY_DEFAULTS, **{k: v for k, v in prop.items() if v is not None}}
+        records.append({
+            **{name: spec[name] for name in ("bedrooms", "bathrooms", "sqft_living", "sqft_lot", "floors",
+                                             "waterfront", "view", "condition", "grade", "sqft_basement",
+                                             "yr_built", "yr_renovated")},
+            # Default to living area if not specified
+            "sqft_above": spec["sqft_above"] if spec["sqft_above"] is not None else spec["sqft_living"],
+            "zipcode": float(resolve_zipcode(spec["zipcode"], features)),
+            "lat": lats[i],
+            "long": lons[i],
+            "sqft_living15": sqft_living15[i],
+            "sqft_lot15": sqft_lot15[i]
+        })
+    return records_to_matrix(records, feature_columns)
+
+
+def predict_in_chunks(model, X: np.ndarray, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """Yield predictions for X one chunk at a time, one vectorized predict call per chunk."""
+    chunk_size = max(1, int(chunk_size))
+    for start in range(0, X.shape[0], chunk_size):
+        yield np.asarray(model.predict(X[start:start + chunk_size]), dtype=np.float64)
@@ -0,0 +1,123 @@
+"""
+Benchmark: one Overpass request per point vs clustered get_nearby_amenities_batch,
+against a local stub Overpass server.
+
+Usage:
+    python benchmarks/bench_amenity_batch.py --points 10000 --latency 0.5
+
+The stub serves a synthetic set of amenities around Seattle, answering each bbox
+query after `--latency` seconds. The per-point baseline is timed on a sample and
+extrapolated; both paths are checked to return identical results on that sample.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Unthrottle the HTTP clients before they read their settings, and keep the offline
+# index out of the comparison
+os.environ["AMENITY_INDEX_DIR"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_no_amenity_index")
+os.environ["OVERPASS_RATE_LIMIT"] = "0"
+
+import http_clients  # noqa: E402
+import nearby_amenities  # noqa: E402
+from nearby_amenities import (  # noqa: E402
+    CATEGORY_MAPPING, fetch_amenity_elements, get_nearby_amenities_batch, summarize_amenities,
+    parse_amenity_elements
+)
+from geo_utils import bbox_offsets  # noqa: E402
+
+REGION = (47.2, -122.5, 47.8, -121.9)
+
+
+def make_elements(n, seed=0):
+    rng = np.random.default_rng(seed)
+    types = list(CATEGORY_MAPPING)
+    lat = rng.uniform(REGION[0], REGION[2], n)
+    lon = rng.uniform(REGION[1], REGION[3], n)
+    kind = rng.integers(0, len(types), n)
+    return lat, lon, [
+        {"type": "node", "id": i, "lat": float(lat[i]), "lon": float(lon[i]),
+         "tags": {"amenity": types[kind[i]], "name": f"Place {i}"}}
+        for i in range(n)
+    ]
+
+
+def start_stub(lat, lon, elements, latency):
+    class StubOverpass(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+            query = parse_qs(body)["data"][0]
+            south, west, north, east = map(float, re.search(r"\(([-\d.,]+)\)", query).group(1).split(","))
+            inside = np.flatnonzero((lat >= south) & (lat <= north) & (lon >= west) & (lon <= east))
+            payload = json.dumps({"elements": [elements[i] for i in inside]}).encode()
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    # Port 0 lets the OS pick a free port, so concurrent runs do not collide
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOverpass)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    http_clients.OVERPASS_URL = f"http://127.0.0.1:{server.server_address[1]}/api/interpreter"
+    return server
+
+
+def per_point(lat, lon, radius):
+    """The pre-batch behaviour: one bbox query per point."""
+    lat_offset, lon_offset = bbox_offsets(lat, radius)
+    elements, error = fetch_amenity_elements(lat - lat_offset, lon - lon_offset, lat + lat_offset, lon + lon_offset)
+    return summarize_amenities(parse_amenity_elements(elements))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--amenities", type=int, default=50000, help="Synthetic amenities served by the stub")
+    parser.add_argument("--radius", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub response delay in seconds")
+    parser.add_argument("--sample", type=int, default=20, help="Points timed with one request each")
+    args = parser.parse_args()
+
+    amenity_lat, amenity_lon, elements = make_elements(args.amenities)
+    server = start_stub(amenity_lat, amenity_lon, elements, args.latency)
+
+    rng = np.random.default_rng(1)
+    lats = rng.uniform(47.4, 47.7, args.points)
+    lons = rng.uniform(-122.4, -122.0, args.points)
+
+    start = time.perf_counter()
+    baseline = [per_point(lats[i], lons[i], args.radius) for i in range(args.sample)]
+    per_point_seconds = (time.perf_counter() - start) / args.sample
+
+    requests_before = nearby_amenities.get_amenity_cache_stats()["network"]
+    start = time.perf_counter()
+    results = get_nearby_amenities_batch(lats, lons, args.radius)
+    batch_seconds = time.perf_counter() - start
+    server.shutdown()
+
+    assert results[:args.sample] == baseline, "batch results differ from per-point results"
+    clusters = len(np.unique(np.floor(np.column_stack((lats, lons)) / nearby_amenities.BATCH_CLUSTER_SIZE), axis=0))
+    print(f"points: {args.points:,}  clusters (Overpass queries): {clusters}  "
+          f"scored: {nearby_amenities.get_amenity_cache_stats()['network'] - requests_before:,}")
+    print(f"per-point: {per_point_seconds * 1000:.1f} ms/point -> ~{per_point_seconds * args.points:.0f} s for all points")
+    print(f"batch:     {batch_seconds:.2f} s ({args.points / batch_seconds:,.0f} points/s), "
+          f"~{per_point_seconds * args.points / batch_seconds:,.0f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Latency benchmark: sklearn RandomForestRegressor.predict vs the flattened engine.
+
+Usage:
+    python benchmarks/bench_forest_inference.py [--model model/price_model.pkl] [--repeats 200]
+
+Checks that both engines agree on the validation set, then reports p50/p99
+latency per predict call for batch sizes 1, 100 and 10,000.
+"""
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_predictor import FEATURE_COLUMNS, frame_to_matrix  # noqa: E402
+from forest_engine import FlatForest  # noqa: E402
+
+BATCH_SIZES = (1, 100, 10000)
+
+
+def time_predict(predict, X, repeats):
+    """Return per-call latencies in milliseconds."""
+    predict(X)  # warm-up
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict(X)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.path.join("model", "price_model.pkl"))
+    parser.add_argument("--data", default=os.path.join("data", "validation.xlsx"))
+    parser.add_argument("--repeats", type=int, default=200, help="Timed calls per batch size (fewer are used for 10k)")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    model.verbose = 0
+    flat = FlatForest.from_sklearn(model)
+    X_val = frame_to_matrix(pd.read_excel(args.data), FEATURE_COLUMNS)
+
+    sklearn_pred = model.predict(X_val)
+    flat_pred = flat.predict(X_val)
+    max_diff = float(np.max(np.abs(sklearn_pred - flat_pred)))
+    print(f"Agreement on {len(X_val):,} validation rows: max |sklearn - flat| = {max_diff:.3e}")
+    assert np.allclose(sklearn_pred, flat_pred, rtol=1e-9, atol=1e-6), "Flat engine disagrees with sklearn"
+
+    print(f"\n{'batch':>7} {'engine':>8} {'p50 ms':>10} {'p99 ms':>10} {'rows/sec':>12}")
+    for batch_size in BATCH_SIZES:
+        X = np.resize(X_val, (batch_size, X_val.shape[1]))
+        repeats = args.repeats if batch_size < 10000 else max(5, args.repeats // 20)
+        for name, predict in (("sklearn", model.predict), ("flat", flat.predict)):
+            latencies = time_predict(predict, X, repeats)
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{batch_size:>7} {name:>8} {p50:>10.3f} {p99:>10.3f} {batch_size / (p50 / 1000):>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Start-up benchmark: time to first prediction for the pickled forest vs the memory-mapped flat arrays.
+
+Usage:
+    python benchmarks/bench_model_startup.py [--model-dir model] [--runs 5]
+
+Each run starts a fresh Python process (like a new uvicorn worker or a Streamlit
+cold start), loads the model with model_store.load_price_model and predicts one
+row. Reports load time, time to first prediction and the process's peak RSS.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+import numpy as np
+from model_store import load_price_model
+model = load_price_model(sys.argv[1], engine=sys.argv[2])
+loaded = time.perf_counter()
+if hasattr(model, "verbose"):
+    model.verbose = 0
+model.predict(np.array([[3, 1.0, 1180, 5650, 1, 0, 0, 3, 7, 1180, 0, 1955, 0, 98178, 47.5112, -122.257, 1340, 5650]], dtype=np.float64))
+predicted = time.perf_counter()
+print(json.dumps({
+    "load_s": loaded - started,
+    "first_prediction_s": predicted - started,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+}))
+"""
+
+
+def run_once(model_dir, engine):
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD_SCRIPT, model_dir, engine],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=os.path.join(REPO_DIR, "model"))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    model_dir = os.path.abspath(args.model_dir)
+
+    print(f"{'format':>10} {'load s':>10} {'first pred s':>14} {'peak RSS MB':>13}")
+    # "sklearn" unpickles price_model.pkl; "auto" maps price_model_flat/ when it exists
+    for label, engine in (("pickle", "sklearn"), ("mmap", "auto")):
+        runs = [run_once(model_dir, engine) for _ in range(args.runs)]
+        load = np.median([r["load_s"] for r in runs])
+        first = np.median([r["first_prediction_s"] for r in runs])
+        rss = np.median([r["max_rss_mb"] for r in runs])
+        print(f"{label:>10} {load:>10.3f} {first:>14.3f} {rss:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Throughput benchmark: one predict call per /predict request vs MicroBatcher.
+
+Usage:
+    python benchmarks/bench_predict_batching.py [--model-dir model] [--clients 200] [--requests 5000]
+
+Simulates `--clients` concurrent callers issuing `--requests` single-row
+predictions on one event loop, scored on a 2-thread inference pool as in
+main.py, and reports sustained requests/sec and p50/p99 latency for both
+paths. Every batched prediction is checked against the unbatched one.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_predictor import FEATURE_COLUMNS, frame_to_matrix  # noqa: E402
+from micro_batcher import MicroBatcher  # noqa: E402
+from model_store import load_price_model  # noqa: E402
+
+
+async def drive(predict_row, X, clients):
+    """Run len(X) requests through `clients` concurrent workers; returns (predictions, latencies ms, seconds)."""
+    predictions = np.empty(len(X))
+    latencies = np.empty(len(X))
+    next_row = iter(range(len(X)))
+
+    async def client():
+        for i in next_row:
+            started = time.perf_counter()
+            predictions[i] = await predict_row(X[i])
+            latencies[i] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return predictions, latencies, time.perf_counter() - started
+
+
+async def run(model, X, args):
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    async def run_inference(batch):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, lambda: np.asarray(model.predict(batch), dtype=np.float64))
+
+    async def unbatched(row):
+        return float((await run_inference(row.reshape(1, -1)))[0])
+
+    batcher = MicroBatcher(run_inference, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    results = {}
+    for name, predict_row in (("per-request", unbatched), ("micro-batch", batcher.submit)):
+        await drive(predict_row, X[:min(len(X), args.clients)], args.clients)  # warm-up
+        results[name] = await drive(predict_row, X, args.clients)
+    return results, batcher.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default="model")
+    parser.add_argument("--data", default=os.path.join("data", "validation.xlsx"))
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    model = load_price_model(args.model_dir)
+    if model is None:
+        sys.exit(f"No model found in {args.model_dir}; run train_tabular.py first")
+    if hasattr(model, "verbose"):
+        model.verbose = 0
+    X = np.resize(frame_to_matrix(pd.read_excel(args.data), FEATURE_COLUMNS), (args.requests, len(FEATURE_COLUMNS)))
+
+    results, stats = asyncio.run(run(model, X, args))
+    baseline = results["per-request"][0]
+    assert np.allclose(results["micro-batch"][0], baseline, rtol=1e-9), "batched predictions differ"
+
+    print(f"{type(model).__name__}, {args.requests:,} requests from {args.clients} concurrent clients")
+    print(f"\n{'path':>12} {'req/sec':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, (_, latencies, seconds) in results.items():
+        print(f"{name:>12} {args.requests / seconds:>10,.0f} {np.percentile(latencies, 50):>9.2f} "
+              f"{np.percentile(latencies, 99):>9.2f}")
+    speedup = results["per-request"][2] / results["micro-batch"][2]
+    print(f"\nmicro-batching: {speedup:.1f}x throughput, mean batch {stats['mean_batch_size']} rows, "
+          f"peak queue depth {stats['max_queue_depth']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Microbenchmark: per-segment Python loop vs vectorized road_length_km on an Overpass payload.
+
+Usage:
+    python benchmarks/bench_road_length.py --payload recorded_overpass.json
+    python benchmarks/bench_road_length.py --record recorded_overpass.json   # fetch downtown Seattle first
+    python benchmarks/bench_road_length.py                                   # synthetic payload
+
+The payload is an Overpass `out geom` response such as get_road_density receives.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo_utils import pack_way_geometry, road_length_km  # noqa: E402
+from road_index import HIGHWAY_FILTER  # noqa: E402
+
+
+def legacy_road_length_km(elements):
+    """The original get_road_density loop: NumPy ufuncs on scalars, one node pair at a time."""
+    total_length = 0.0
+    for element in elements:
+        if "geometry" in element:
+            geometry = element["geometry"]
+            if len(geometry) > 1:
+                for i in range(len(geometry) - 1):
+                    lat1, lon1 = geometry[i]["lat"], geometry[i]["lon"]
+                    lat2, lon2 = geometry[i + 1]["lat"], geometry[i + 1]["lon"]
+                    dlat = np.radians(lat2 - lat1)
+                    dlon = np.radians(lon2 - lon1)
+                    a = np.sin(dlat / 2) ** 2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon / 2) ** 2
+                    c = 2 * np.arcsin(np.sqrt(a))
+                    total_length += 6371 * c
+    return total_length
+
+
+def vectorized_road_length_km(elements):
+    return road_length_km(*pack_way_geometry(elements))
+
+
+def synthetic_payload(n_ways=4000, seed=0):
+    """Random short polylines around downtown Seattle, roughly the shape of a dense urban response."""
+    rng = np.random.default_rng(seed)
+    elements = []
+    for way_id in range(n_ways):
+        n_nodes = int(rng.integers(2, 40))
+        lats = 47.61 + rng.normal(0, 0.01) + np.cumsum(rng.normal(0, 0.0003, n_nodes))
+        lons = -122.33 + rng.normal(0, 0.015) + np.cumsum(rng.normal(0, 0.0004, n_nodes))
+        elements.append({
+            "type": "way",
+            "id": way_id,
+            "geometry": [{"lat": float(lat), "lon": float(lon)} for lat, lon in zip(lats, lons)]
+        })
+    return {"elements": elements}
+
+
+def record_payload(path, lat=47.6062, lon=-122.3321, radius_meters=2000):
+    import requests
+
+    lat_offset = radius_meters / 111000
+    lon_offset = radius_meters / (111000 * np.cos(np.radians(lat)))
+    bbox = f"{lat - lat_offset},{lon - lon_offset},{lat + lat_offset},{lon + lon_offset}"
+    query = f"[out:json][timeout:60];({HIGHWAY_FILTER}({bbox}););out geom;"
+    response = requests.post("https://overpass-api.de/api/interpreter", data={"data": query}, timeout=90)
+    response.raise_for_status()
+    with open(path, "wb") as f:
+        f.write(response.content)
+    print(f"Recorded Overpass payload -> {path}")
+
+
+def best_of(fn, arg, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn(arg)
+        times.append(time.perf_counter() - started)
+    return result, min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payload", help="Recorded Overpass JSON payload")
+    parser.add_argument("--record", help="Fetch a dense downtown Seattle payload to this path, then benchmark it")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.record:
+        record_payload(args.record)
+        args.payload = args.record
+
+    if args.payload:
+        with open(args.payload) as f:
+            payload = json.load(f)
+        source = args.payload
+    else:
+        payload = synthetic_payload()
+        source = "synthetic payload"
+
+    elements = payload.get("elements", [])
+    n_segments = sum(max(len(e.get("geometry") or ()) - 1, 0) for e in elements)
+    print(f"{source}: {len(elements):,} ways, {n_segments:,} segments")
+
+    legacy_km, legacy_ms = best_of(legacy_road_length_km, elements, args.repeats)
+    vector_km, vector_ms = best_of(vectorized_road_length_km, elements, args.repeats)
+    assert abs(legacy_km - vector_km) <= 1e-9 * max(1.0, legacy_km), (legacy_km, vector_km)
+
+    print(f"{'loop':>12}: {legacy_ms:9.2f} ms  ({legacy_km:.3f} km)")
+    print(f"{'vectorized':>12}: {vector_ms:9.2f} ms  ({vector_km:.3f} km)  {legacy_ms / vector_ms:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Post-training compaction of the random forest.
+
+The depth-20 forest of 200 trees dominates worker memory, cold start and image
+size. Compaction writes `model/price_model_compact/` next to the original
+artifacts, with:
+- the smallest subset of trees whose mean keeps validation R² within `--tolerance`
+  of the full forest, chosen greedily (each step adds the tree that raises R² most)
+  on half of the validation rows and checked on the other half
+- node arrays in the smallest dtypes that fit (see forest_engine.FlatForest.compact):
+  int8 feature ids, int16 root-relative child pointers, float32 thresholds rounded
+  down so every split is unchanged, float32 leaf values
+
+Serve the compact copy with PRICE_MODEL_ENGINE=compact. Retraining removes it
+(rerun this after train_tabular.py or incremental_train.py).
+
+Usage:
+    python compact_forest.py [--model-dir model] [--tolerance 0.002] [--max-trees 100]
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+from sklearn.metrics import mean_absolute_error, r2_score
+
+from batch_predictor import DEFAULT_FEATURE_COLUMNS
+from forest_engine import FlatForest
+from model_backends import RandomForestBackend
+from model_store import MODEL_DIR, load_model_metadata
+from prepare_data import load_dataset
+
+DEFAULT_VALIDATION_PATH = os.path.join("data", "validation.xlsx")
+# Largest validation R² drop accepted for the tree subset
+DEFAULT_TOLERANCE = 0.002
+COMPACT_META_FILENAME = "compact.json"
+
+
+def greedy_tree_order(tree_predictions: np.ndarray, y: np.ndarray, max_trees: Optional[int] = None) -> List[int]:
+    """
+    Greedy forward selection over the columns of tree_predictions (n_rows, n_trees):
+    each step adds the tree whose inclusion gives the highest R² of the mean.
+    Returns up to max_trees tree indices in selection order.
+    """
+    n_trees = tree_predictions.shape[1]
+    max_trees = min(max_trees or n_trees, n_trees)
+    chosen: List[int] = []
+    remaining = np.ones(n_trees, dtype=bool)
+    running_sum = np.zeros(len(y))
+
+    while len(chosen) < max_trees:
+        candidates = np.flatnonzero(remaining)
+        means = (running_sum[:, None] + tree_predictions[:, candidates]) / (len(chosen) + 1)
+        # Highest R² is lowest squared error, the total sum of squares is the same for every candidate
+        best = candidates[int(np.argmin(np.sum((y[:, None] - means) ** 2, axis=0)))]
+        chosen.append(int(best))
+        remaining[best] = False
+        running_sum += tree_predictions[:, best]
+    return chosen
+
+
+def prefix_r2(tree_predictions: np.ndarray, y: np.ndarray, order: List[int]) -> np.ndarray:
+    """R² of the mean of the first k trees of order, for k = 1..len(order)."""
+    means = np.cumsum(tree_predictions[:, order], axis=1) / np.arange(1, len(order) + 1)
+    return 1 - np.sum((y[:, None] - means) ** 2, axis=0) / np.sum((y - y.mean()) ** 2)
+
+
+def split_rows(n_rows: int):
+    """(selection, holdout) row indices: trees are chosen on the even validation rows, reported on the odd ones."""
+    return np.arange(0, n_rows, 2), np.arange(1, n_rows, 2)
+
+
+def select_trees(tree_predictions: np.ndarray, y: np.ndarray, tolerance: float,
+                 max_trees: Optional[int] = None) -> List[int]:
+    """
+    Smallest greedy subset whose R² stays within tolerance of the full forest's.
+    The order is chosen on the selection rows and the subset must also hold on the
+    holdout rows, so a few trees that happen to fit the selection rows are not
+    mistaken for the forest.
+    """
+    selection, holdout = split_rows(len(y))
+    order = greedy_tree_order(tree_predictions[selection], y[selection], max_trees)
+    keeps_r2 = np.ones(len(order), dtype=bool)
+    for rows in (selection, holdout):
+        full_r2 = r2_score(y[rows], tree_predictions[rows].mean(axis=1))
+        keeps_r2 &= prefix_r2(tree_predictions[rows], y[rows], order) >= full_r2 - tolerance
+    n_kept = int(np.argmax(keeps_r2)) + 1 if keeps_r2.any() else len(order)
+    return order[:n_kept]
+
+
+def directory_bytes(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def profile(load, X_val, y_val, repeats: int = 200) -> Dict:
+    """Load time (median of 3), accuracy on (X_val, y_val), single-row p50/p99 and 10k-row batch throughput."""
+    load_times = []
+    for _ in range(3):
+        started = time.perf_counter()
+        model = load()
+        load_times.append(time.perf_counter() - started)
+    if hasattr(model, "verbose"):
+        model.verbose = 0
+
+    y_pred = model.predict(X_val)
+    latencies = []
+    for i in range(repeats):
+        row = X_val[i % len(X_val):i % len(X_val) + 1]
+        started = time.perf_counter()
+        model.predict(row)
+        latencies.append((time.perf_counter() - started) * 1000)
+    batch = np.resize(X_val, (10000, X_val.shape[1]))
+    started = time.perf_counter()
+    model.predict(batch)
+    batch_seconds = time.perf_counter() - started
+
+    return {
+        "holdout_r2": float(r2_score(y_val, y_pred)),
+        "holdout_mae": float(mean_absolute_error(y_val, y_pred)),
+        "load_ms": float(np.median(load_times)) * 1000,
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p99_ms": float(np.percentile(latencies, 99)),
+        "batch_rows_per_sec": len(batch) / batch_seconds
+    }
+
+
+def compact_model(model_dir: str = MODEL_DIR, validation_path: str = DEFAULT_VALIDATION_PATH,
+                  tolerance: float = DEFAULT_TOLERANCE, max_trees: Optional[int] = None) -> Dict:
+    """Select trees, write `<model_dir>/price_model_compact/` and return the selection with a before/after report."""
+    backend = RandomForestBackend()
+    if load_model_metadata(model_dir)["backend"] != backend.name:
+        raise ValueError(f"Compaction needs a random_forest model, {model_dir} holds a different backend")
+    pickle_path, flat_dir = backend.artifact_paths(model_dir)
+    compact_dir = os.path.join(model_dir, backend.compact_dirname)
+
+    if os.path.isdir(flat_dir):
+        forest = FlatForest.load(flat_dir, mmap_mode=None)
+    else:
+        forest = FlatForest.from_sklearn(joblib.load(pickle_path))
+
+    X_val, y_val = load_dataset(validation_path, DEFAULT_FEATURE_COLUMNS).features_and_target("price")
+    tree_predictions = forest.value[forest.apply(X_val)]
+    full_r2 = float(r2_score(y_val, tree_predictions.mean(axis=1)))
+    trees = select_trees(tree_predictions, y_val, tolerance, max_trees)
+
+    compact = forest.select(trees).compact()
+    compact.save(compact_dir)
+    with open(os.path.join(compact_dir, COMPACT_META_FILENAME), "w") as f:
+        json.dump({"trees": trees, "source_trees": forest.n_trees, "tolerance": tolerance,
+                   "full_r2": full_r2, "validation": validation_path}, f, indent=2)
+
+    loaders = {
+        "pickle": (pickle_path, lambda: joblib.load(pickle_path)),
+        "flat": (flat_dir, lambda: FlatForest.load(flat_dir, mmap_mode="r")),
+        "compact": (compact_dir, lambda: FlatForest.load(compact_dir, mmap_mode="r")),
+    }
+    # Accuracy on the holdout rows only: the selection rows favour the chosen trees
+    _, holdout = split_rows(len(y_val))
+    report = []
+    for name, (path, load) in loaders.items():
+        if os.path.exists(path):
+            report.append({"artifact": name, "trees": forest.n_trees if name != "compact" else len(trees),
+                           "size_mb": directory_bytes(path) / 1e6,
+                           **profile(load, X_val[holdout], y_val[holdout])})
+    return {"trees": trees, "source_trees": forest.n_trees, "full_r2": full_r2,
+            "compact_dir": compact_dir, "report": report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune the price forest and store it in compact dtypes")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--validation", default=DEFAULT_VALIDATION_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Largest validation R² drop accepted for the tree subset")
+    parser.add_argument("--max-trees", type=int, default=None, help="Upper bound on the trees kept")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    result = compact_model(args.model_dir, args.validation, args.tolerance, args.max_trees)
+    report = pd.DataFrame(result["report"]).set_index("artifact")
+    print(f"🌲 Kept {len(result['trees'])} of {result['source_trees']} trees "
+          f"(full forest validation R² {result['full_r2']:.6f}, tolerance {args.tolerance})")
+    print(report.to_string(float_format=lambda v: f"{v:,.4g}"))
+    if "flat" in report.index:
+        before, after = report.loc["flat"], report.loc["compact"]
+        print(f"\nvs flat: size {after['size_mb'] / before['size_mb']:.1%}, "
+              f"load {after['load_ms'] - before['load_ms']:+.2f} ms, "
+              f"p50 {after['latency_p50_ms'] - before['latency_p50_ms']:+.3f} ms, "
+              f"batch {after['batch_rows_per_sec'] / before['batch_rows_per_sec']:.1f}x, "
+              f"holdout R² {after['holdout_r2'] - before['holdout_r2']:+.4f}")
+    print(f"✅ Compact forest saved to {result['compact_dir']} (serve with PRICE_MODEL_ENGINE=compact)")
+
+
+if __name__ == "__main__":
+    main()
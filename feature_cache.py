@@ -0,0 +1,215 @@
+"""
+Persistent on-disk cache for location features (satellite indices, road density, zipcode, amenities).
+
+Entries live in a SQLite database keyed by source and a quantized lat/lon cell, so
+nearby coordinates share an entry and the FastAPI backend and the Streamlit app
+(separate processes) reuse each other's lookups. Each source has its own TTL, the
+table is bounded with least-recently-used eviction, and hit/miss counters are
+kept per source.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "FEATURE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "features.sqlite")
+)
+DEFAULT_MAX_ENTRIES = int(os.getenv("FEATURE_CACHE_MAX_ENTRIES", "100000"))
+# ~100 m cells: features are aggregated over a few hundred metres around the point anyway
+DEFAULT_CELL_SIZE = float(os.getenv("FEATURE_CACHE_CELL_SIZE", "0.001"))
+
+# Seconds each source stays fresh
+DEFAULT_TTLS = {
+    "bands": 30 * 24 * 3600,       # raw Sentinel-2 tiles for the same fixed window
+    "satellite": 30 * 24 * 3600,   # fixed 2023 imagery window, effectively static
+    "road_density": 7 * 24 * 3600,
+    "zipcode": 90 * 24 * 3600,
+    "amenities": 7 * 24 * 3600,    # raw POI sets per ~1 km cell
+}
+DEFAULT_TTL = 24 * 3600
+
+
+class FeatureCache:
+    """SQLite-backed feature cache with per-source TTLs, LRU eviction and hit/miss counters."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttls: Optional[Dict[str, float]] = None, cell_size: float = DEFAULT_CELL_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.cell_size = cell_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        try:
+            self._init_db()
+        except (sqlite3.Error, OSError) as e:
+            # Fall back to always-miss behaviour (e.g. read-only deployments)
+            print(f"Feature cache disabled: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets the API and Streamlit processes read while one writes."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    source TEXT NOT NULL,
+                    cell TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (source, cell)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS counters (
+                    source TEXT PRIMARY KEY,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+
+    def cell_key(self, lat: float, lon: float, variant: str = "") -> str:
+        """Quantize a coordinate to its grid cell (plus an optional variant such as a radius)."""
+        key = f"{round(lat / self.cell_size)}:{round(lon / self.cell_size)}"
+        return f"{key}:{variant}" if variant else key
+
+    def ttl(self, source: str) -> float:
+        return self.ttls.get(source, DEFAULT_TTL)
+
+    def _count(self, conn, source: str, hit: bool):
+        column = "hits" if hit else "misses"
+        conn.execute(
+            f"INSERT INTO counters (source, {column}) VALUES (?, 1) "
+            f"ON CONFLICT(source) DO UPDATE SET {column} = {column} + 1",
+            (source,)
+        )
+
+    def get_raw(self, source: str, lat: float, lon: float, variant: str = "") -> Optional[bytes]:
+        """Return the stored bytes for a cell, or None on a miss or expired entry."""
+        cell = self.cell_key(lat, lon, variant)
+        now = time.time()
+        try:
+            with self._lock, self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM entries WHERE source = ? AND cell = ?", (source, cell)
+                ).fetchone()
+                hit = row is not None and now - row[1] < self.ttl(source)
+                if hit:
+                    conn.execute(
+                        "UPDATE entries SET accessed_at = ? WHERE source = ? AND cell = ?", (now, source, cell)
+                    )
+                self._count(conn, source, hit)
+            return row[0] if hit else None
+        except (sqlite3.Error, OSError) as e:
+            print(f"Feature cache read error: {e}")
+            return None
+
+    def set_raw(self, source: str, lat: float, lon: float, value: bytes, variant: str = ""):
+        """Store bytes for a cell and evict the least recently used entries beyond max_entries."""
+        cell = self.cell_key(lat, lon, variant)
+        now = time.time()
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (source, cell, value, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (source, cell, sqlite3.Binary(value), now, now)
+                )
+                overflow = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM entries WHERE rowid IN "
+                        "(SELECT rowid FROM entries ORDER BY accessed_at LIMIT ?)",
+                        (overflow,)
+                    )
+        except (sqlite3.Error, OSError) as e:
+            print(f"Feature cache write error: {e}")
+
+    def get(self, source: str, lat: float, lon: float, variant: str = "") -> Any:
+        """Return the cached JSON value for a cell, or None."""
+        raw = self.get_raw(source, lat, lon, variant)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, source: str, lat: float, lon: float, value: Any, variant: str = ""):
+        """Cache a JSON-serializable value for a cell."""
+        self.set_raw(source, lat, lon, json.dumps(value).encode("utf-8"), variant)
+
+    def get_or_compute(self, source: str, lat: float, lon: float, compute: Callable[[], Any],
+                       variant: str = "") -> Any:
+        """Return the cached value, or call compute() and cache its result (None results are not cached)."""
+        value = self.get(source, lat, lon, variant)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.set(source, lat, lon, value, variant)
+        return value
+
+    async def get_or_compute_async(self, source: str, lat: float, lon: float,
+                                   compute: Callable[[], Awaitable[Any]], variant: str = "") -> Any:
+        """get_or_compute for a coroutine function compute()."""
+        value = self.get(source, lat, lon, variant)
+        if value is None:
+            value = await compute()
+            if value is not None:
+                self.set(source, lat, lon, value, variant)
+        return value
+
+    def stats(self) -> Dict:
+        """Hit/miss counters per source plus the current entry count."""
+        try:
+            with self._lock, self._connect() as conn:
+                counters = conn.execute("SELECT source, hits, misses FROM counters").fetchall()
+                entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        except (sqlite3.Error, OSError) as e:
+            return {"error": f"Feature cache unavailable: {e}"}
+
+        by_source = {}
+        for source, hits, misses in counters:
+            total = hits + misses
+            by_source[source] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / total, 4) if total else 0.0
+            }
+        return {
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "cell_size_deg": self.cell_size,
+            "sources": by_source
+        }
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM counters")
+
+
+_feature_cache = None
+_feature_cache_lock = threading.Lock()
+
+
+def get_feature_cache() -> FeatureCache:
+    """Process-wide FeatureCache at FEATURE_CACHE_PATH (shared on disk by the API and Streamlit)."""
+    global _feature_cache
+    if _feature_cache is None:
+        with _feature_cache_lock:
+            if _feature_cache is None:
+                _feature_cache = FeatureCache()
+    return _feature_cache
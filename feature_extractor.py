@@ -12,34 +12,61 @@ from sentinelhub import (
     bbox_to_dimensions
 )
 from sentinel_config import get_sh_config
-import requests
+from feature_cache import get_feature_cache
+from regional_raster import get_regional_raster
+from road_index import HIGHWAY_FILTER, density_from_length, get_road_index
+from geo_utils import bbox_offsets, pack_way_geometry, road_length_km
+from http_clients import overpass_query, overpass_query_async, reverse_geocode, reverse_geocode_async
+from zipcode_index import get_zipcode_index
+import asyncio
+import functools
+import io
+import threading
 import time
-from geopy.geocoders import Nominatim
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 
+# Sentinel-2 mosaic window shared by every band tile
+DEFAULT_TIME_INTERVAL = ("2023-01-01", "2023-12-31")
+# Half-width of the tile around a point, in degrees
+TILE_HALF_SIZE = 0.002
+# Raw band tiles kept in memory per process (on top of the persistent feature cache)
+TILE_MEMORY_ENTRIES = 64
 
-def fetch_satellite_bands(lat, lon, size_pixels=256):
-    """
-    Fetch Sentinel-2 bands needed for NDVI and NDWI calculations.
-    Returns: numpy array with bands [B02, B03, B04, B08, B11] (RGB, NIR, SWIR)
-    """
-    bbox = BBox(
-        bbox=[lon - 0.002, lat - 0.002, lon + 0.002, lat + 0.002],
-        crs=CRS.WGS84
-    )
+# Seconds each source may take in extract_all_features_concurrent, measured from the start of the call
+DEFAULT_SOURCE_DEADLINES = {
+    "satellite": 20.0,
+    "road_density": 30.0,
+    "zipcode": 10.0,
+}
 
-    resolution = 10  # meters per pixel
-    width, height = bbox_to_dimensions(bbox, resolution=resolution)
-    # Ensure reasonable size
-    width = min(width, size_pixels)
-    height = min(height, size_pixels)
+# Fallback values used when a source fails or misses its deadline
+DEFAULT_FEATURES = {
+    "ndvi": 0.0,
+    "ndwi": 0.0,
+    "road_density": 0.3,
+    "zipcode": "98178",  # Default Seattle zipcode
+}
+
+# Shared pool for the network-bound fan-out; lookups that miss their deadline keep
+# running here and still populate the feature cache for the next request. Sized so a
+# full Streamlit comparison (25 locations x 3 sources) runs in a single wave.
+_fanout_executor = ThreadPoolExecutor(max_workers=80, thread_name_prefix="feature-fanout")
 
-    evalscript = """
+
+BANDS_EVALSCRIPT = """
     //VERSION=3
     function setup() {
         return {
-            input: ["B02", "B03", "B04", "B08", "B11"],
-            output: { bands: 5 }
+            input: [{
+                bands: ["B02", "B03", "B04", "B08", "B11"],
+                units: "DN"
+            }],
+            output: {
+                bands: 5,
+                sampleType: "UINT16"
+            }
         };
     }
 
@@ -48,37 +75,120 @@ def fetch_satellite_bands(lat, lon, size_pixels=256):
     }
     """
 
+
+def fetch_bands_bbox(bbox_coords, size, time_interval=DEFAULT_TIME_INTERVAL):
+    """
+    Fetch the [B02, B03, B04, B08, B11] bands (uint16 DN) for an arbitrary WGS84 bbox
+    [min_lon, min_lat, max_lon, max_lat] at the given (width, height) in pixels.
+    """
     request = SentinelHubRequest(
-        evalscript=evalscript,
+        evalscript=BANDS_EVALSCRIPT,
         input_data=[
             SentinelHubRequest.input_data(
                 data_collection=DataCollection.SENTINEL2_L2A,
-                time_interval=("2023-01-01", "2023-12-31"),
+                time_interval=time_interval,
                 mosaicking_order="mostRecent"
             )
         ],
         responses=[
             SentinelHubRequest.output_response("default", MimeType.TIFF)
         ],
-        bbox=bbox,
-        size=(width, height),
+        bbox=BBox(bbox=bbox_coords, crs=CRS.WGS84),
+        size=size,
         config=get_sh_config()
     )
+    return request.get_data()[0]
+
+
+def fetch_satellite_bands(lat, lon, size_pixels=256, time_interval=DEFAULT_TIME_INTERVAL):
+    """
+    Fetch Sentinel-2 bands needed for NDVI and NDWI calculations.
+    Returns: uint16 numpy array with bands [B02, B03, B04, B08, B11] (RGB, NIR, SWIR)
+    as digital numbers (reflectance * 10000).
+    """
+    bbox = BBox(
+        bbox=[lon - TILE_HALF_SIZE, lat - TILE_HALF_SIZE, lon + TILE_HALF_SIZE, lat + TILE_HALF_SIZE],
+        crs=CRS.WGS84
+    )
+
+    resolution = 10  # meters per pixel
+    width, height = bbox_to_dimensions(bbox, resolution=resolution)
+    # Ensure reasonable size
+    width = min(width, size_pixels)
+    height = min(height, size_pixels)
+
+    return fetch_bands_bbox(list(bbox), (width, height), time_interval)
+
 
-    bands = request.get_data()[0]
+_tile_memory = OrderedDict()
+_tile_memory_lock = threading.Lock()
+_tile_fetch_locks = {}
+
+
+def get_band_tile(lat, lon, time_interval=DEFAULT_TIME_INTERVAL):
+    """
+    Return the raw [B02, B03, B04, B08, B11] tile around a location, fetching it from
+    Sentinel Hub at most once per tile and time window.
+
+    The tile centre is snapped to the feature cache grid so nearby points share a
+    tile. Tiles are kept in a small in-process LRU and in the persistent feature
+    cache; concurrent callers for the same tile wait for a single fetch. The RGB
+    preview, NDVI and NDWI are all derived locally from this array.
+    """
+    cache = get_feature_cache()
+    lat = round(lat / cache.cell_size) * cache.cell_size
+    lon = round(lon / cache.cell_size) * cache.cell_size
+    variant = f"{time_interval[0]}/{time_interval[1]}"
+    key = (cache.cell_key(lat, lon), variant)
+
+    with _tile_memory_lock:
+        if key in _tile_memory:
+            _tile_memory.move_to_end(key)
+            return _tile_memory[key]
+        fetch_lock = _tile_fetch_locks.setdefault(key, threading.Lock())
+
+    with fetch_lock:
+        try:
+            with _tile_memory_lock:
+                if key in _tile_memory:
+                    return _tile_memory[key]
+
+            raw = cache.get_raw("bands", lat, lon, variant)
+            if raw is not None:
+                bands = np.load(io.BytesIO(raw), allow_pickle=False)
+            else:
+                bands = fetch_satellite_bands(lat, lon, time_interval=time_interval)
+                buffer = io.BytesIO()
+                np.save(buffer, bands, allow_pickle=False)
+                cache.set_raw("bands", lat, lon, buffer.getvalue(), variant)
+
+            with _tile_memory_lock:
+                _tile_memory[key] = bands
+                while len(_tile_memory) > TILE_MEMORY_ENTRIES:
+                    _tile_memory.popitem(last=False)
+        finally:
+            # Drop the per-tile lock on every exit, including failed fetches
+            with _tile_memory_lock:
+                _tile_fetch_locks.pop(key, None)
     return bands
 
 
-def calculate_ndvi(bands):
+def render_rgb_preview(bands, gain=2.5, gamma=1.8):
     """
-    Calculate NDVI (Normalized Difference Vegetation Index) from satellite bands.
-    NDVI = (NIR - Red) / (NIR + Red)
+    Render a uint8 RGB display image from a band tile, with the same gain and gamma
+    correction the Sentinel Hub visualisation evalscript used.
+    """
+    reflectance = bands[:, :, [2, 1, 0]].astype(np.float32) / 10000.0  # B04, B03, B02
+    rgb = np.power(np.clip(reflectance * gain, 0, 1), 1 / gamma) * 255
+    return rgb.astype(np.uint8)
+
+
+def ndvi_pixels(bands):
+    """
+    Per-pixel NDVI (Normalized Difference Vegetation Index), NDVI = (NIR - Red) / (NIR + Red).
     bands: array with shape (height, width, 5) where [B02, B03, B04, B08, B11]
     B08 is NIR, B04 is Red
     """
-    if bands.shape[2] < 4:
-        return 0.0
-    
     # Normalize bands to 0-1 range (Sentinel-2 values are typically 0-10000)
     red = bands[:, :, 2].astype(np.float32) / 10000.0  # B04
     nir = bands[:, :, 3].astype(np.float32) / 10000.0  # B08
@@ -90,23 +200,29 @@ def calculate_ndvi(bands):
     ndvi = (nir - red) / denominator
     
     # Clip to valid range [-1, 1]
-    ndvi = np.clip(ndvi, -1, 1)
+    return np.clip(ndvi, -1, 1)
+
+
+def calculate_ndvi(bands):
+    """
+    Calculate NDVI (Normalized Difference Vegetation Index) from satellite bands.
+    NDVI = (NIR - Red) / (NIR + Red)
+    bands: array with shape (height, width, 5) where [B02, B03, B04, B08, B11]
+    B08 is NIR, B04 is Red
+    """
+    if bands.shape[2] < 4:
+        return 0.0
     
     # Return mean NDVI value
-    return float(np.nanmean(ndvi))
+    return float(np.nanmean(ndvi_pixels(bands)))
 
 
-def calculate_ndwi(bands):
+def ndwi_pixels(bands):
     """
-    Calculate NDWI (Normalized Difference Water Index) from satellite bands.
-    NDWI = (Green - NIR) / (Green + NIR)
-    Alternative: NDWI = (Green - SWIR) / (Green + SWIR) - using SWIR for better water detection
+    Per-pixel NDWI (Normalized Difference Water Index), NDWI = (Green - SWIR) / (Green + SWIR).
     bands: array with shape (height, width, 5) where [B02, B03, B04, B08, B11]
     B03 is Green, B11 is SWIR
     """
-    if bands.shape[2] < 5:
-        return 0.0
-    
     # Normalize bands to 0-1 range
     green = bands[:, :, 1].astype(np.float32) / 10000.0  # B03
     swir = bands[:, :, 4].astype(np.float32) / 10000.0   # B11
@@ -118,112 +234,233 @@ def calculate_ndwi(bands):
     ndwi = (green - swir) / denominator
     
     # Clip to valid range [-1, 1]
-    ndwi = np.clip(ndwi, -1, 1)
+    return np.clip(ndwi, -1, 1)
+
+
+def calculate_ndwi(bands):
+    """
+    Calculate NDWI (Normalized Difference Water Index) from satellite bands.
+    NDWI = (Green - NIR) / (Green + NIR)
+    Alternative: NDWI = (Green - SWIR) / (Green + SWIR) - using SWIR for better water detection
+    bands: array with shape (height, width, 5) where [B02, B03, B04, B08, B11]
+    B03 is Green, B11 is SWIR
+    """
+    if bands.shape[2] < 5:
+        return 0.0
     
     # Return mean NDWI value (higher = more water)
-    return float(np.nanmean(ndwi))
+    return float(np.nanmean(ndwi_pixels(bands)))
+
+
+def get_satellite_indices(lat, lon):
+    """
+    Return {"ndvi", "ndwi"} for a location.
+
+    Points inside the precomputed regional rasters (see regional_raster.py) are
+    answered from local disk; elsewhere the band tile is fetched and the result
+    kept in the persistent feature cache.
+    """
+    raster = get_regional_raster()
+    if raster is not None:
+        indices = raster.lookup(lat, lon)
+        if indices is not None:
+            return indices
+
+    def compute():
+        bands = get_band_tile(lat, lon)
+        return {"ndvi": calculate_ndvi(bands), "ndwi": calculate_ndwi(bands)}
+
+    return get_feature_cache().get_or_compute("satellite", lat, lon, compute)
 
 
 def get_road_density(lat, lon, radius_meters=500):
     """
     Calculate road density using OpenStreetMap Overpass API.
     Returns a score from 0-1 indicating road density in the area.
+    Points covered by the offline road index (see road_index.py) are answered
+    locally. Otherwise successful lookups are cached per location and radius;
+    failures fall back to 0.3 uncached.
     """
     try:
-        # Calculate bounding box around the point
-        # Approximate: 1 degree latitude ≈ 111 km
-        # 1 degree longitude ≈ 111 km * cos(latitude)
-        lat_offset = radius_meters / 111000
-        lon_offset = radius_meters / (111000 * np.cos(np.radians(lat)))
-        
-        bbox = f"{lat - lat_offset},{lon - lon_offset},{lat + lat_offset},{lon + lon_offset}"
-        
-        # Overpass API query to get roads
-        query = f"""
-        [out:json][timeout:25];
-        (
-          way["highway"~"^(primary|secondary|tertiary|residential|unclassified|service|trunk|motorway)$"]({bbox});
-        );
-        out geom;
-        """
-        
-        url = "https://overpass-api.de/api/interpreter"
-        response = requests.post(url, data={"data": query}, timeout=30)
-        
-        if response.status_code == 200:
-            data = response.json()
-            elements = data.get("elements", [])
-            
-            # Calculate total road length
-            total_length = 0.0
-            for element in elements:
-                if "geometry" in element:
-                    geometry = element["geometry"]
-                    if len(geometry) > 1:
-                        # Calculate approximate length of road segment
-                        for i in range(len(geometry) - 1):
-                            lat1, lon1 = geometry[i]["lat"], geometry[i]["lon"]
-                            lat2, lon2 = geometry[i+1]["lat"], geometry[i+1]["lon"]
-                            # Haversine distance approximation
-                            dlat = np.radians(lat2 - lat1)
-                            dlon = np.radians(lon2 - lon1)
-                            a = np.sin(dlat/2)**2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon/2)**2
-                            c = 2 * np.arcsin(np.sqrt(a))
-                            distance_km = 6371 * c
-                            total_length += distance_km
-            
-            # Normalize: road density score (km/km²)
-            # Area in km²
-            area_km2 = (2 * lat_offset * 111) * (2 * lon_offset * 111 * np.cos(np.radians(lat)))
-            if area_km2 > 0:
-                density = total_length / area_km2
-                # Normalize to 0-1 scale (assuming max reasonable density is ~20 km/km²)
-                normalized_density = min(density / 20.0, 1.0)
-                return float(normalized_density)
-            else:
-                return 0.0
-        else:
-            # If API fails, return a default value
-            return 0.3  # Medium density assumption
+        return _cached_road_density(lat, lon, radius_meters)
     except Exception as e:
         print(f"Error fetching road density: {e}")
-        return 0.3  # Default medium density
+        return DEFAULT_FEATURES["road_density"]
 
 
-def get_zipcode(lat, lon, max_retries=3):
-    """Get zipcode from coordinates using reverse geocoding."""
-    geolocator = Nominatim(user_agent="property_price_predictor")
-    location = None
-    retries = 0
+async def get_road_density_async(lat, lon, radius_meters=500):
+    """get_road_density on the async HTTP client: same index, cache and fallback behaviour."""
+    try:
+        return await _cached_road_density_async(lat, lon, radius_meters)
+    except Exception as e:
+        print(f"Error fetching road density: {e}")
+        return DEFAULT_FEATURES["road_density"]
+
+
+def _indexed_road_density(lat, lon, radius_meters=500):
+    """Road density from the offline road index, or None if the point is not covered."""
+    road_index = get_road_index()
+    if road_index is not None and road_index.covers(lat, lon, radius_meters):
+        return float(road_index.road_density(lat, lon, radius_meters))
+    return None
+
+
+def _cached_road_density(lat, lon, radius_meters=500):
+    """Road index, then feature cache, then Overpass; raises if the Overpass lookup fails."""
+    density = _indexed_road_density(lat, lon, radius_meters)
+    if density is not None:
+        return density
+    return get_feature_cache().get_or_compute(
+        "road_density", lat, lon,
+        lambda: _fetch_road_density(lat, lon, radius_meters),
+        variant=str(radius_meters)
+    )
+
+
+async def _cached_road_density_async(lat, lon, radius_meters=500):
+    """_cached_road_density with the Overpass call made on the async HTTP client."""
+    density = _indexed_road_density(lat, lon, radius_meters)
+    if density is not None:
+        return density
+    return await get_feature_cache().get_or_compute_async(
+        "road_density", lat, lon,
+        lambda: _fetch_road_density_async(lat, lon, radius_meters),
+        variant=str(radius_meters)
+    )
+
+
+def _road_density_query(lat, lon, radius_meters=500):
+    """Return (Overpass query, lat_offset, lon_offset) for the roads around a point."""
+    # Calculate bounding box around the point
+    lat_offset, lon_offset = bbox_offsets(lat, radius_meters)
+    
+    bbox = f"{lat - lat_offset},{lon - lon_offset},{lat + lat_offset},{lon + lon_offset}"
     
-    while retries < max_retries:
+    # Overpass API query to get roads
+    query = f"""
+    [out:json][timeout:25];
+    (
+      {HIGHWAY_FILTER}({bbox});
+    );
+    out geom;
+    """
+    return query, lat_offset, lon_offset
+
+
+def _road_density_from_response(response, lat, lat_offset, lon_offset):
+    """Road density score from an Overpass response; raises if the API call failed."""
+    if response.status_code == 200:
+        data = response.json()
+        elements = data.get("elements", [])
+        
+        # Calculate total road length in one vectorized pass over all segments
+        coords, way_offsets = pack_way_geometry(elements)
+        total_length = road_length_km(coords, way_offsets)
+        
+        # Normalize: road density score (km/km², max reasonable density ~20 km/km²)
+        return float(density_from_length(total_length, lat, lat_offset, lon_offset))
+    else:
+        raise RuntimeError(f"Overpass API error: {response.status_code}")
+
+
+def _fetch_road_density(lat, lon, radius_meters=500):
+    """Query Overpass for the road density score; raises if the API call fails."""
+    query, lat_offset, lon_offset = _road_density_query(lat, lon, radius_meters)
+    response = overpass_query(query, timeout=30)
+    return _road_density_from_response(response, lat, lat_offset, lon_offset)
+
+
+async def _fetch_road_density_async(lat, lon, radius_meters=500):
+    query, lat_offset, lon_offset = _road_density_query(lat, lon, radius_meters)
+    response = await overpass_query_async(query, timeout=30)
+    return _road_density_from_response(response, lat, lat_offset, lon_offset)
+
+
+def get_zipcode(lat, lon, max_retries=3):
+    """
+    Get zipcode from coordinates using reverse geocoding (cached per location; misses are not cached).
+    The offline zipcode index (see zipcode_index.py) answers covered points without Nominatim.
+    """
+    zipcode = _indexed_zipcode(lat, lon)
+    if zipcode is not None:
+        return zipcode
+    return get_feature_cache().get_or_compute("zipcode", lat, lon, lambda: _fetch_zipcode(lat, lon, max_retries))
+
+
+async def get_zipcode_async(lat, lon, max_retries=3):
+    """get_zipcode on the async HTTP client: offline index, then feature cache, then Nominatim."""
+    zipcode = _indexed_zipcode(lat, lon)
+    if zipcode is not None:
+        return zipcode
+    return await get_feature_cache().get_or_compute_async(
+        "zipcode", lat, lon, lambda: _fetch_zipcode_async(lat, lon, max_retries)
+    )
+
+
+def _indexed_zipcode(lat, lon):
+    """Zipcode from the offline zipcode index, or None if it is not built or has no answer."""
+    index = get_zipcode_index()
+    return index.lookup(lat, lon) if index is not None else None
+
+
+def _zipcode_from_address(address):
+    """Zipcode from a Nominatim address dict, or None without a postcode."""
+    postcode = (address or {}).get("postcode")
+    return postcode.split('-')[0] if postcode else None  # Get first part if zip+4
+
+
+def _fetch_zipcode(lat, lon, max_retries=3):
+    """Reverse-geocode a zipcode with Nominatim."""
+    for attempt in range(max_retries):
         try:
-            location = geolocator.reverse((lat, lon), exactly_one=True, language="en")
-            if location and 'address' in location.raw and 'postcode' in location.raw['address']:
-                return location.raw['address']['postcode'].split('-')[0]  # Get first part if zip+4
-            break
+            location = reverse_geocode(lat, lon, exactly_one=True, language="en")
+            return _zipcode_from_address(location.raw.get("address") if location else None)
         except (GeocoderTimedOut, GeocoderServiceError) as e:
-            retries += 1
-            if retries == max_retries:
+            if attempt == max_retries - 1:
                 print(f"Could not get zipcode: {e}")
                 return None
             time.sleep(1)  # Wait before retrying
-    
     return None
 
 
+async def _fetch_zipcode_async(lat, lon, max_retries=3):
+    """_fetch_zipcode on the async HTTP client."""
+    import httpx
+
+    for attempt in range(max_retries):
+        try:
+            result = await reverse_geocode_async(lat, lon)
+            return _zipcode_from_address((result or {}).get("address"))
+        except httpx.HTTPError as e:
+            if attempt == max_retries - 1:
+                print(f"Could not get zipcode: {e}")
+                return None
+            await asyncio.sleep(1)  # Wait before retrying
+    return None
+
+
+async def run_blocking(fn, *args):
+    """
+    Run a blocking call (Sentinel Hub requests, image rendering) on the bounded
+    fan-out pool so it neither blocks the event loop nor uses Starlette's threadpool.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_fanout_executor, functools.partial(fn, *args))
+
+
+async def get_satellite_indices_async(lat, lon):
+    return await run_blocking(get_satellite_indices, lat, lon)
+
+
 def extract_all_features(lat, lon):
     """
     Extract all visual and location-based features for a given location.
     Returns a dictionary with NDVI, NDWI, road_density, and zipcode.
     """
     try:
-        # Fetch satellite bands
-        bands = fetch_satellite_bands(lat, lon)
-        
-        # Calculate indices
-        ndvi = calculate_ndvi(bands)
-        ndwi = calculate_ndwi(bands)
+        # Satellite indices (cached per location)
+        indices = get_satellite_indices(lat, lon)
+        ndvi = indices["ndvi"]
+        ndwi = indices["ndwi"]
         
         # Get road density
         road_density = get_road_density(lat, lon)
@@ -249,3 +486,110 @@ def extract_all_features(lat, lon):
             "success": False,
             "error": str(e)
         }
+
+
+def _timed(started, fn, *args):
+    """(result, error, seconds since started) of fn(*args); the error is returned, not raised."""
+    try:
+        return fn(*args), None, time.monotonic() - started
+    except Exception as e:
+        return None, e, time.monotonic() - started
+
+
+async def _timed_async(started, awaitable):
+    """_timed for a coroutine."""
+    try:
+        return await awaitable, None, time.monotonic() - started
+    except Exception as e:
+        return None, e, time.monotonic() - started
+
+
+def _gathered_features(outcomes, timed_out, started):
+    """
+    Result of the concurrent extractors from the _timed outcomes of the sources
+    that finished by their deadline and the names of those that did not.
+    """
+    features = dict(DEFAULT_FEATURES)
+    failed = {}
+    for source, (result, error, _) in outcomes.items():
+        if error is not None:
+            print(f"Error fetching {source}: {error}")
+            failed[source] = str(error)
+        elif source == "satellite":
+            features["ndvi"] = result["ndvi"]
+            features["ndwi"] = result["ndwi"]
+        else:
+            features[source] = result
+
+    partial = bool(timed_out or failed)
+    return {
+        **features,
+        "success": not partial,
+        "partial": partial,
+        "timed_out": timed_out,
+        "failed": failed,
+        "source_seconds": {source: round(seconds, 3) for source, (_, _, seconds) in outcomes.items()},
+        "elapsed_seconds": round(time.monotonic() - started, 3)
+    }
+
+
+def extract_all_features_concurrent(lat, lon, deadlines=None):
+    """
+    Like extract_all_features, but fetches satellite indices, road density and
+    zipcode concurrently, so latency is bounded by the slowest source rather than
+    the sum of all three.
+
+    deadlines: optional {source: seconds} overriding DEFAULT_SOURCE_DEADLINES.
+    Sources that miss their deadline are listed in "timed_out" and sources that
+    raise are listed in "failed"; both fall back to DEFAULT_FEATURES and set
+    "partial" to True. "source_seconds" holds the elapsed time of every source
+    that finished within its deadline.
+    """
+    deadlines = {**DEFAULT_SOURCE_DEADLINES, **(deadlines or {})}
+    started = time.monotonic()
+
+    futures = {
+        "satellite": _fanout_executor.submit(_timed, started, get_satellite_indices, lat, lon),
+        # Not get_road_density: its 0.3 fallback would hide failures from "failed"
+        "road_density": _fanout_executor.submit(_timed, started, _cached_road_density, lat, lon),
+        "zipcode": _fanout_executor.submit(_timed, started, get_zipcode, lat, lon),
+    }
+
+    outcomes = {}
+    timed_out = []
+    for source, future in futures.items():
+        remaining = deadlines[source] - (time.monotonic() - started)
+        try:
+            outcomes[source] = future.result(timeout=max(remaining, 0))
+        except FutureTimeoutError:
+            timed_out.append(source)
+    return _gathered_features(outcomes, timed_out, started)
+
+
+async def extract_all_features_async(lat, lon, deadlines=None):
+    """
+    extract_all_features_concurrent for async callers: road density and zipcode
+    use the async HTTP client, satellite indices run on the fan-out pool. Same
+    deadlines and result format; sources that miss their deadline keep running
+    in the background and fill the cache.
+    """
+    deadlines = {**DEFAULT_SOURCE_DEADLINES, **(deadlines or {})}
+    started = time.monotonic()
+
+    tasks = {
+        "satellite": asyncio.ensure_future(_timed_async(started, get_satellite_indices_async(lat, lon))),
+        # Not get_road_density_async: its 0.3 fallback would hide failures from "failed"
+        "road_density": asyncio.ensure_future(_timed_async(started, _cached_road_density_async(lat, lon))),
+        "zipcode": asyncio.ensure_future(_timed_async(started, get_zipcode_async(lat, lon))),
+    }
+
+    outcomes = {}
+    timed_out = []
+    for source, task in tasks.items():
+        remaining = deadlines[source] - (time.monotonic() - started)
+        try:
+            # Shield so a missed deadline leaves the lookup running to populate the cache
+            outcomes[source] = await asyncio.wait_for(asyncio.shield(task), timeout=max(remaining, 0))
+        except asyncio.TimeoutError:
+            timed_out.append(source)
+    return _gathered_features(outcomes, timed_out, started)
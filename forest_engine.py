@@ -0,0 +1,191 @@
+"""
+Flattened RandomForest inference engine.
+Exports the trees of a fitted sklearn forest into flat contiguous NumPy arrays
+(feature, threshold, left, right, value) and evaluates all trees at once with
+vectorized traversal, avoiding sklearn's per-tree Python and joblib overhead.
+A forest can be cut down to a subset of its trees (select) and stored in the
+smallest dtypes that keep its splits exact (compact), see compact_forest.py.
+"""
+import json
+import os
+
+import numpy as np
+
+ENGINE_ENV_VAR = "PRICE_MODEL_ENGINE"
+ARRAY_NAMES = ("feature", "threshold", "left", "right", "value", "roots")
+META_FILENAME = "forest.json"
+
+
+class FlatForest:
+    """
+    All trees of a forest stored as one node table.
+
+    Node i of the table splits on `feature[i]` at `threshold[i]`; rows with
+    `x <= threshold` go to `left[i]`, the rest to `right[i]`. Leaves point to
+    themselves on both sides with an infinite threshold, so every row can be
+    advanced `max_depth` times without branching. `roots[t]` is the first node
+    of tree t and `value[i]` is the node's mean target.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features,
+                 relative_children=False):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        # Compact forests store child pointers relative to their tree's root (see compact())
+        self.relative_children = bool(relative_children)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Build a FlatForest from a fitted RandomForestRegressor (or any forest of single-output regression trees)."""
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        sizes = np.array([tree.node_count for tree in trees], dtype=np.int64)
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        n_nodes = int(sizes.sum())
+
+        feature = np.empty(n_nodes, dtype=np.int64)
+        threshold = np.empty(n_nodes, dtype=np.float64)
+        left = np.empty(n_nodes, dtype=np.int64)
+        right = np.empty(n_nodes, dtype=np.int64)
+        value = np.empty(n_nodes, dtype=np.float64)
+
+        for tree, offset, size in zip(trees, roots, sizes):
+            nodes = slice(offset, offset + size)
+            own = np.arange(offset, offset + size, dtype=np.int64)
+            is_leaf = tree.children_left == -1
+
+            feature[nodes] = np.where(is_leaf, 0, tree.feature)
+            threshold[nodes] = np.where(is_leaf, np.inf, tree.threshold)
+            left[nodes] = np.where(is_leaf, own, tree.children_left + offset)
+            right[nodes] = np.where(is_leaf, own, tree.children_right + offset)
+            value[nodes] = tree.value[:, 0, 0]
+
+        max_depth = max(tree.max_depth for tree in trees)
+        return cls(feature, threshold, left, right, value, roots, max_depth, model.n_features_in_)
+
+    def save(self, directory):
+        """Write the node arrays as raw .npy files plus a small JSON header, so they can be memory-mapped."""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(directory, META_FILENAME), "w") as f:
+            json.dump({"max_depth": self.max_depth, "n_features": self.n_features, "n_trees": self.n_trees,
+                       "relative_children": self.relative_children}, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """
+        Open a forest written by save(). With mmap_mode="r" the arrays are mapped
+        read-only, so loading is near-instant and processes on one host share the
+        same page-cache pages instead of each holding a private copy.
+        """
+        with open(os.path.join(directory, META_FILENAME)) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+        return cls(max_depth=meta["max_depth"], n_features=meta["n_features"],
+                   relative_children=meta.get("relative_children", False), **arrays)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAY_NAMES)
+
+    def tree_sizes(self):
+        roots = np.asarray(self.roots, dtype=np.int64)
+        return np.append(roots[1:], self.n_nodes) - roots
+
+    def select(self, trees):
+        """A FlatForest of only the given trees (indices into roots), in that order."""
+        trees = np.asarray(trees, dtype=np.int64)
+        starts = np.asarray(self.roots, dtype=np.int64)[trees]
+        sizes = self.tree_sizes()[trees]
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        nodes = np.concatenate([np.arange(start, start + size) for start, size in zip(starts, sizes)])
+        # Absolute child pointers move with their tree; relative ones stay valid
+        shift = 0 if self.relative_children else np.repeat(roots - starts, sizes)
+        return FlatForest(
+            np.asarray(self.feature[nodes]), np.asarray(self.threshold[nodes]),
+            self.left[nodes] + shift, self.right[nodes] + shift, np.asarray(self.value[nodes]),
+            roots.astype(self.roots.dtype), self.max_depth, self.n_features, self.relative_children
+        )
+
+    def compact(self):
+        """
+        A copy in the smallest dtypes that fit: int8 feature ids, float32 thresholds
+        and values, and child pointers relative to the tree's root in int16 when every
+        tree has fewer than 32,768 nodes (absolute int32 otherwise).
+
+        apply() compares float32 rows, so every threshold is rounded down to the
+        largest float32 not above it: a row goes left exactly when it did with the
+        float64 threshold. Leaf values lose precision only at float32 resolution
+        (~1e-7 relative).
+        """
+        threshold = np.asarray(self.threshold).astype(np.float32)
+        rounded_up = threshold > self.threshold
+        threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+
+        sizes = self.tree_sizes()
+        left, right = np.asarray(self.left, dtype=np.int64), np.asarray(self.right, dtype=np.int64)
+        relative = self.relative_children or sizes.max() <= np.iinfo(np.int16).max
+        if relative and not self.relative_children:
+            base = np.repeat(np.asarray(self.roots, dtype=np.int64), sizes)
+            left, right = left - base, right - base
+        child_dtype = np.min_scalar_type(-int(sizes.max() if relative else self.n_nodes))
+        return FlatForest(
+            np.asarray(self.feature).astype(np.min_scalar_type(-self.n_features)),
+            threshold,
+            left.astype(child_dtype),
+            right.astype(child_dtype),
+            np.asarray(self.value).astype(np.float32),
+            np.asarray(self.roots).astype(np.min_scalar_type(-self.n_nodes)),
+            self.max_depth, self.n_features, relative
+        )
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_samples, n_trees)."""
+        # sklearn compares float32 inputs against float64 thresholds; do the same for identical splits
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected X with shape (n_samples, {self.n_features}), got {X.shape}")
+
+        X_flat = X.ravel()
+        row_offsets = (np.arange(X.shape[0], dtype=np.int64) * self.n_features)[:, None]
+        roots = np.broadcast_to(np.asarray(self.roots, dtype=np.int64), (X.shape[0], self.n_trees))
+        nodes = roots.copy()
+
+        for _ in range(self.max_depth):
+            go_left = X_flat[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            if self.relative_children:
+                nodes = roots + nodes
+        return nodes
+
+    def predict(self, X):
+        """Predict with the mean of all trees' leaf values, like RandomForestRegressor.predict."""
+        return self.value[self.apply(X)].mean(axis=1, dtype=np.float64)
+
+
+def select_engine(model, engine=None):
+    """
+    Wrap a loaded sklearn forest in the inference engine named by `engine`
+    (default: the PRICE_MODEL_ENGINE env var, else "auto", as in the backend's load).
+    "auto" and "flat" return a FlatForest, "compact" a FlatForest in compact dtypes,
+    anything else ("sklearn") returns the model unchanged.
+    """
+    engine = (engine or os.getenv(ENGINE_ENV_VAR, "auto")).lower()
+    if model is not None and engine in ("auto", "flat", "compact") and hasattr(model, "estimators_"):
+        flat = FlatForest.from_sklearn(model)
+        return flat.compact() if engine == "compact" else flat
+    return model
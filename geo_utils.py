@@ -0,0 +1,65 @@
+"""
+Vectorized geodesic helpers shared by the feature modules and offline indexes.
+"""
+from operator import itemgetter
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+# Approximate metres per degree of latitude, as used by the bbox calculations throughout the project
+METERS_PER_DEGREE = 111000.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between coordinate arrays (degrees), element-wise."""
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(a))
+
+
+def bbox_offsets(lat, radius_meters):
+    """Half-height and half-width in degrees of the square bbox around a latitude (scalar or array)."""
+    lat_offset = radius_meters / METERS_PER_DEGREE
+    lon_offset = radius_meters / (METERS_PER_DEGREE * np.cos(np.radians(lat)))
+    return lat_offset, lon_offset
+
+
+def pack_way_geometry(elements):
+    """
+    Pack the node geometry of Overpass `out geom` ways into flat arrays.
+
+    Returns (coords, way_offsets): coords is an (n_nodes, 2) float64 array of
+    (lat, lon) for all ways back to back, and way i spans
+    coords[way_offsets[i]:way_offsets[i + 1]].
+    """
+    geometries = [element["geometry"] for element in elements if len(element.get("geometry") or ()) > 1]
+    nodes = [node for geometry in geometries for node in geometry]
+    # fromiter over itemgetter avoids building a Python tuple per node
+    coords = np.empty((len(nodes), 2), dtype=np.float64)
+    coords[:, 0] = np.fromiter(map(itemgetter("lat"), nodes), dtype=np.float64, count=len(nodes))
+    coords[:, 1] = np.fromiter(map(itemgetter("lon"), nodes), dtype=np.float64, count=len(nodes))
+    way_offsets = np.zeros(len(geometries) + 1, dtype=np.int64)
+    np.cumsum([len(geometry) for geometry in geometries], out=way_offsets[1:])
+    return coords, way_offsets
+
+
+def way_segments(coords, way_offsets):
+    """Return (lat1, lon1, lat2, lon2) arrays for every consecutive node pair within each way."""
+    coords = np.asarray(coords, dtype=np.float64)
+    if len(coords) < 2:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty, empty, empty
+    # Pair i joins node i and i + 1; drop pairs that would join the last node of a way to the next way
+    starts_of_ways = np.asarray(way_offsets)[1:-1]
+    keep = np.ones(len(coords) - 1, dtype=bool)
+    keep[starts_of_ways[starts_of_ways > 0] - 1] = False
+    start, end = coords[:-1][keep], coords[1:][keep]
+    return start[:, 0], start[:, 1], end[:, 0], end[:, 1]
+
+
+def road_length_km(coords, way_offsets):
+    """Total length in km of all ways packed by pack_way_geometry, computed in one vectorized pass."""
+    return float(haversine_km(*way_segments(coords, way_offsets)).sum())
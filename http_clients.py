@@ -0,0 +1,264 @@
+"""
+Shared HTTP client layer for the OpenStreetMap services (Overpass and Nominatim).
+
+All callers go through one keep-alive `requests.Session` per process, so repeated
+lookups reuse pooled TCP/TLS connections. Endpoints are configurable through
+environment variables (e.g. a local Overpass mirror), concurrent identical
+requests are coalesced into a single upstream call, and a token bucket per
+service spaces requests to the public servers' limits up front instead of
+backing off after a 429.
+
+The async API (`overpass_query_async`, `reverse_geocode_async`) serves the FastAPI
+endpoints from an `httpx.AsyncClient` without tying up a thread per request; it
+shares the token buckets and counters with the sync API.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OVERPASS_URL = os.getenv("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+NOMINATIM_DOMAIN = os.getenv("NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = os.getenv("NOMINATIM_SCHEME", "https")
+USER_AGENT = "property_price_predictor"
+
+# Requests per second and burst size; a rate of 0 disables limiting (e.g. for a local mirror).
+# overpass-api.de grants two query slots per client; Nominatim's policy is at most 1 request/s.
+OVERPASS_RATE_LIMIT = float(os.getenv("OVERPASS_RATE_LIMIT", "1.0"))
+OVERPASS_BURST = int(os.getenv("OVERPASS_BURST", "2"))
+NOMINATIM_RATE_LIMIT = float(os.getenv("NOMINATIM_RATE_LIMIT", "1.0"))
+NOMINATIM_BURST = 1
+
+POOL_MAXSIZE = 32
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds the caller must wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve the token now (possibly going negative) so waiters queue up in order
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited_seconds += wait
+        return wait
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Take one token, awaiting (without blocking the event loop) until one is available."""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RequestCoalescer:
+    """
+    Run at most one call per key at a time; callers that arrive while a call
+    for the same key is in flight wait for and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def run(self, key: Hashable, fn: Callable):
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+    async def run_async(self, key: Hashable, fn: Callable):
+        """Like run(), for a coroutine function; waiters share the leader's task on the event loop."""
+        key = ("async", key)
+        with self._lock:
+            task = self._in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(fn())
+                self._in_flight[key] = task
+                self.calls += 1
+                task.add_done_callback(lambda _: self._forget(key))
+            else:
+                self.coalesced += 1
+        # Shield so a cancelled waiter does not cancel the shared upstream call
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+
+_session = None
+_session_lock = threading.Lock()
+_overpass_bucket = TokenBucket(OVERPASS_RATE_LIMIT, OVERPASS_BURST)
+_nominatim_bucket = TokenBucket(NOMINATIM_RATE_LIMIT, NOMINATIM_BURST)
+_overpass_coalescer = RequestCoalescer()
+_nominatim_coalescer = RequestCoalescer()
+
+
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session with a connection pool large enough for the feature fan-out."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["User-Agent"] = USER_AGENT
+                _session = session
+    return _session
+
+
+def overpass_query(query: str, timeout: float = 30, url: Optional[str] = None) -> requests.Response:
+    """
+    POST an Overpass QL query to OVERPASS_URL (or `url`) through the shared session.
+    Identical queries already in flight share one upstream call, and new calls
+    wait for the Overpass token bucket.
+    """
+    url = url or OVERPASS_URL
+
+    def send():
+        _overpass_bucket.acquire()
+        return get_session().post(url, data={"data": query}, timeout=timeout)
+
+    return _overpass_coalescer.run((url, query), send)
+
+
+_geolocator = None
+_geolocator_lock = threading.Lock()
+
+
+def get_geolocator():
+    """Process-wide geopy Nominatim geolocator for NOMINATIM_DOMAIN (one pooled session)."""
+    global _geolocator
+    if _geolocator is None:
+        with _geolocator_lock:
+            if _geolocator is None:
+                from geopy.geocoders import Nominatim
+
+                _geolocator = Nominatim(user_agent=USER_AGENT, domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME)
+    return _geolocator
+
+
+def reverse_geocode(lat: float, lon: float, **kwargs):
+    """
+    Nominatim reverse lookup through the shared geolocator, coalesced per
+    coordinate and spaced by the Nominatim token bucket.
+    """
+    def send():
+        _nominatim_bucket.acquire()
+        return get_geolocator().reverse((lat, lon), **kwargs)
+
+    return _nominatim_coalescer.run((round(lat, 6), round(lon, 6), tuple(sorted(kwargs.items()))), send)
+
+
+_async_client = None
+
+
+def get_async_client():
+    """Event-loop-wide keep-alive httpx.AsyncClient, created on first use."""
+    global _async_client
+    if _async_client is None:
+        import httpx
+
+        _async_client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_MAXSIZE)
+        )
+    return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+async def overpass_query_async(query: str, timeout: float = 30, url: Optional[str] = None):
+    """Async overpass_query: returns an httpx.Response (`status_code`, `json()` as with requests)."""
+    url = url or OVERPASS_URL
+
+    async def send():
+        await _overpass_bucket.acquire_async()
+        return await get_async_client().post(url, data={"data": query}, timeout=timeout)
+
+    return await _overpass_coalescer.run_async((url, query), send)
+
+
+async def reverse_geocode_async(lat: float, lon: float, language: str = "en", timeout: float = 10) -> Optional[Dict]:
+    """
+    Async Nominatim reverse lookup; returns the raw JSON result (with `address`),
+    or None if nothing was found.
+    """
+    async def send():
+        await _nominatim_bucket.acquire_async()
+        response = await get_async_client().get(
+            f"{NOMINATIM_SCHEME}://{NOMINATIM_DOMAIN}/reverse",
+            params={"lat": lat, "lon": lon, "format": "json", "addressdetails": 1, "accept-language": language},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        result = response.json()
+        return None if "error" in result else result
+
+    return await _nominatim_coalescer.run_async((round(lat, 6), round(lon, 6), language), send)
+
+
+def get_client_stats() -> Dict:
+    """Upstream calls, coalesced requests and total rate-limit wait per service in this process."""
+    return {
+        service: {
+            "upstream_calls": coalescer.calls,
+            "coalesced": coalescer.coalesced,
+            "throttled_seconds": round(bucket.waited_seconds, 3)
+        }
+        for service, coalescer, bucket in (
+            ("overpass", _overpass_coalescer, _overpass_bucket),
+            ("nominatim", _nominatim_coalescer, _nominatim_bucket),
+        )
+    }
@@ -0,0 +1,213 @@
+"""
+Incremental (warm-start) refresh of the forest when new sales arrive.
+
+Instead of refitting all trees on the full history, an update:
+1. loads the current `model/price_model.pkl` and `model/tree_windows.json`
+   (which data window each tree was grown on);
+2. grows `--add-trees` new trees with sklearn's warm_start on the new rows plus
+   a replay sample of earlier windows (`--replay-ratio` times the new rows, and at
+   least `--min-window-rows` in total), so refresh time scales with the size of the
+   update, not the total history;
+3. retires the oldest trees beyond `--max-trees`;
+4. scores the candidate on `data/validation.xlsx` and promotes it only if its R² is
+   within `--tolerance` of the last full retrain's (`reference_metrics` in model.json),
+   so successive updates cannot drift further and further below it.
+
+Promotion rewrites the pickle, the flat arrays, model.json and tree_windows.json.
+Replays read each window's prepared copy under the hash recorded for it, so later
+edits to (or removal of) a source file do not change what it contributes.
+
+Usage:
+    python incremental_train.py data/new_sales.xlsx [--add-trees 10] [--max-trees 200] [--dry-run]
+"""
+import argparse
+import os
+import time
+from typing import Dict
+
+import joblib
+import numpy as np
+from sklearn.metrics import mean_absolute_error, r2_score
+
+from batch_predictor import DEFAULT_FEATURE_COLUMNS
+from model_backends import RandomForestBackend
+from model_store import MODEL_DIR, load_model_metadata, load_tree_windows, save_model, save_tree_windows
+from prepare_data import load_dataset, load_recorded_dataset, source_key
+
+DEFAULT_TRAIN_PATH = os.path.join("data", "train.xlsx")
+DEFAULT_VALIDATION_PATH = os.path.join("data", "validation.xlsx")
+DEFAULT_ADD_TREES = 10
+DEFAULT_REPLAY_RATIO = 8
+# Trees fitted on fewer rows than this are noticeably weaker than the full-retrain trees,
+# so small updates replay up to this many rows in total
+DEFAULT_MIN_WINDOW_ROWS = 10000
+# Largest validation R² drop accepted when promoting a refreshed forest
+DEFAULT_TOLERANCE = 0.002
+
+
+def data_window(window_id: int, path: str, rows: int, random_state: int) -> Dict:
+    return {
+        "id": window_id,
+        "source": path,
+        "sha256": source_key(path, DEFAULT_FEATURE_COLUMNS),
+        "rows": int(rows),
+        "random_state": int(random_state),
+        "added_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+
+def window_random_state(window_id: int) -> int:
+    """
+    Seed for the trees of a window. warm_start only skips as many draws of the forest's
+    random_state as there are trees left, so after retiring trees a fixed seed would
+    hand the new trees the bootstrap and feature draws of the previous window's trees.
+    """
+    return int(np.random.SeedSequence(window_id).generate_state(1)[0])
+
+
+def initial_tree_windows(model, train_path: str = DEFAULT_TRAIN_PATH) -> Dict:
+    """Registry for a forest fitted from scratch: every tree belongs to window 0, the training file."""
+    rows = len(load_dataset(train_path, DEFAULT_FEATURE_COLUMNS))
+    return {"windows": [data_window(0, train_path, rows, model.random_state)], "trees": [0] * len(model.estimators_)}
+
+
+def replay_sample(windows, n_rows: int, rng: np.random.Generator):
+    """Up to n_rows rows drawn uniformly from the data of earlier windows, as recorded."""
+    parts = [
+        load_recorded_dataset(window["source"], window["sha256"], DEFAULT_FEATURE_COLUMNS).features_and_target("price")
+        for window in windows
+    ]
+    X = np.concatenate([X for X, _ in parts])
+    y = np.concatenate([y for _, y in parts])
+    if n_rows < len(X):
+        rows = rng.choice(len(X), size=n_rows, replace=False)
+        X, y = X[rows], y[rows]
+    return X, y
+
+
+def evaluate(model, X_val, y_val) -> Dict:
+    y_pred = model.predict(X_val)
+    return {
+        "val_r2": float(r2_score(y_val, y_pred)),
+        "val_mae": float(mean_absolute_error(y_val, y_pred)),
+        "val_rmse": float(np.sqrt(np.mean((y_val - y_pred) ** 2)))
+    }
+
+
+def update_model(new_path: str, model_dir: str = MODEL_DIR, add_trees: int = DEFAULT_ADD_TREES,
+                 max_trees: int = None, replay_ratio: float = DEFAULT_REPLAY_RATIO,
+                 tolerance: float = DEFAULT_TOLERANCE, validation_path: str = DEFAULT_VALIDATION_PATH,
+                 train_path: str = DEFAULT_TRAIN_PATH, dry_run: bool = False,
+                 min_window_rows: int = DEFAULT_MIN_WINDOW_ROWS) -> Dict:
+    """Warm-start the forest in model_dir on new_path; returns a report (promoted, metrics, timings)."""
+    started = time.perf_counter()
+    metadata = load_model_metadata(model_dir)
+    backend = RandomForestBackend()
+    if metadata["backend"] != backend.name:
+        raise ValueError(f"Incremental training needs a random_forest model, {model_dir} holds {metadata['backend']}")
+
+    model = joblib.load(backend.artifact_paths(model_dir)[0])
+    model.verbose = 0
+    registry = load_tree_windows(model_dir) or initial_tree_windows(model, train_path)
+    if len(registry["trees"]) != len(model.estimators_):
+        raise ValueError(f"tree_windows.json lists {len(registry['trees'])} trees, the model has {len(model.estimators_)}")
+    max_trees = max_trees or len(model.estimators_)
+
+    new_data = load_dataset(new_path, DEFAULT_FEATURE_COLUMNS)
+    new_key = source_key(new_path, DEFAULT_FEATURE_COLUMNS)
+    if any(window["sha256"] == new_key for window in registry["windows"]):
+        raise ValueError(f"{new_path} has already been added to this model")
+    X_new, y_new = new_data.features_and_target("price")
+
+    window_id = max(window["id"] for window in registry["windows"]) + 1
+    random_state = window_random_state(window_id)
+    rng = np.random.default_rng(random_state)
+    n_replay = max(int(len(X_new) * replay_ratio), min_window_rows - len(X_new))
+    X_replay, y_replay = replay_sample(registry["windows"], n_replay, rng)
+    X_window = np.concatenate([X_new, X_replay])
+    y_window = np.concatenate([y_new, y_replay])
+
+    validation = load_dataset(validation_path, DEFAULT_FEATURE_COLUMNS)
+    X_val, y_val = validation.features_and_target("price")
+    current_metrics = evaluate(model, X_val, y_val)
+    # Models saved before reference metrics were recorded are validated against themselves
+    reference_metrics = metadata.get("reference_metrics") or current_metrics
+
+    # warm_start keeps the fitted trees and grows only the additional ones on this window
+    fit_started = time.perf_counter()
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees, random_state=random_state)
+    model.fit(X_window, y_window)
+    model.set_params(warm_start=False)
+    fit_seconds = time.perf_counter() - fit_started
+    tree_windows = registry["trees"] + [window_id] * add_trees
+
+    # Retire the oldest trees beyond max_trees
+    retired = max(0, len(model.estimators_) - max_trees)
+    if retired:
+        model.estimators_ = model.estimators_[retired:]
+        model.n_estimators = len(model.estimators_)
+        tree_windows = tree_windows[retired:]
+
+    candidate_metrics = evaluate(model, X_val, y_val)
+    promoted = candidate_metrics["val_r2"] >= reference_metrics["val_r2"] - tolerance and not dry_run
+
+    windows = registry["windows"] + [data_window(window_id, new_path, len(X_new), random_state)]
+    # Windows no tree was grown on any more stay listed: they still feed the replay sample
+    if promoted:
+        params = {**metadata.get("params", {}), "n_estimators": len(model.estimators_)}
+        save_model(model, model_dir, backend.name, params, candidate_metrics, reference_metrics)
+        save_tree_windows(windows, tree_windows, model_dir)
+
+    return {
+        "promoted": promoted,
+        "new_rows": len(X_new),
+        "window_rows": len(X_window),
+        "trees_added": add_trees,
+        "trees_retired": retired,
+        "n_trees": len(model.estimators_),
+        "tree_windows": {window["id"]: tree_windows.count(window["id"]) for window in windows},
+        "reference": reference_metrics,
+        "current": current_metrics,
+        "candidate": candidate_metrics,
+        "fit_seconds": fit_seconds,
+        "total_seconds": time.perf_counter() - started
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm-start the price forest on newly arrived sales")
+    parser.add_argument("new_data", help="New sales with the 18 feature columns and price (xlsx, CSV or Parquet)")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--add-trees", type=int, default=DEFAULT_ADD_TREES, help="Trees grown on the new window")
+    parser.add_argument("--max-trees", type=int, default=None,
+                        help="Forest size cap; the oldest trees beyond it are retired (default: current size)")
+    parser.add_argument("--replay-ratio", type=float, default=DEFAULT_REPLAY_RATIO,
+                        help="Rows replayed from earlier windows per new row")
+    parser.add_argument("--min-window-rows", type=int, default=DEFAULT_MIN_WINDOW_ROWS,
+                        help="Replay at least enough rows for a window of this size")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Largest validation R² drop below the last full retrain accepted for promotion")
+    parser.add_argument("--validation", default=DEFAULT_VALIDATION_PATH)
+    parser.add_argument("--train", default=DEFAULT_TRAIN_PATH,
+                        help="Original training file, registered as window 0 if tree_windows.json is missing")
+    parser.add_argument("--dry-run", action="store_true", help="Validate the refreshed forest without promoting it")
+    args = parser.parse_args()
+
+    report = update_model(args.new_data, args.model_dir, args.add_trees, args.max_trees, args.replay_ratio,
+                          args.tolerance, args.validation, args.train, args.dry_run, args.min_window_rows)
+    print(f"🌲 Grew {report['trees_added']} trees on {report['window_rows']:,} rows "
+          f"({report['new_rows']:,} new) in {report['fit_seconds']:.1f}s, retired {report['trees_retired']}")
+    print(f"   Trees per window: {report['tree_windows']}")
+    print(f"   Validation R²: {report['current']['val_r2']:.6f} -> {report['candidate']['val_r2']:.6f} "
+          f"(last full retrain {report['reference']['val_r2']:.6f}) | "
+          f"MAE: ${report['current']['val_mae']:,.0f} -> ${report['candidate']['val_mae']:,.0f}")
+    if report["promoted"]:
+        print(f"✅ Promoted to {args.model_dir} ({report['total_seconds']:.1f}s total)")
+    elif args.dry_run:
+        print("⏸️  Dry run: model not updated")
+    else:
+        print(f"⚠️  Not promoted: validation R² is more than {args.tolerance} below the last full retrain")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,24 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Body, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-import joblib
 import os
-from fastapi.responses import Response
+import json
+from typing import Dict, List, Union
+from fastapi.responses import Response, StreamingResponse
 from backend.sentinel_fetcher import fetch_satellite_image
-from backend.feature_extractor import extract_all_features, calculate_ndvi, calculate_ndwi, fetch_satellite_bands, get_road_density
-from backend.nearby_amenities import get_nearby_amenities
+from backend.feature_extractor import (
+    extract_all_features_async, get_road_density_async, get_satellite_indices_async, run_blocking
+)
+from backend.feature_cache import get_feature_cache
+from backend.http_clients import close_async_client, get_client_stats
+from backend.micro_batcher import MICRO_BATCH_ENABLED, MicroBatcher
+from backend.nearby_amenities import get_amenity_cache_stats, get_nearby_amenities_async, get_nearby_amenities_batch
+from backend.model_store import load_model_metadata, load_neighbourhood_index, load_price_model
+from backend.batch_predictor import (
+    FEATURE_COLUMNS, DEFAULT_CHUNK_SIZE, records_to_matrix, frame_to_matrix, properties_to_matrix
+)
+import asyncio
 import io
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import numpy as np
 import requests
@@ -23,27 +35,57 @@ app.add_middleware(
 )
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODEL_PATH = os.path.join(BASE_DIR, "model", "price_model.pkl")
-MODEL_PATH_ROOT = os.path.join(BASE_DIR, "price_model.pkl")
+MODEL_DIR = os.path.join(BASE_DIR, "model")
+MODEL_DIR_ROOT = BASE_DIR
 
-# Load the model - try both locations
+# Load the model - try both locations. The backend comes from model.json; for the forest,
+# memory-mapped flat arrays are preferred over the pickle (PRICE_MODEL_ENGINE=sklearn forces the pickle).
 model = None
 try:
-    if os.path.exists(MODEL_PATH):
-        model = joblib.load(MODEL_PATH)
-        print(f"✅ Model loaded from {MODEL_PATH}")
-    elif os.path.exists(MODEL_PATH_ROOT):
-        model = joblib.load(MODEL_PATH_ROOT)
-        print(f"✅ Model loaded from {MODEL_PATH_ROOT}")
+    for model_dir in (MODEL_DIR, MODEL_DIR_ROOT):
+        model = load_price_model(model_dir)
+        if model is not None:
+            print(f"✅ Model loaded from {model_dir} ({load_model_metadata(model_dir)['backend']}, {type(model).__name__})")
+            break
     else:
-        print(f"Warning: Model not found at {MODEL_PATH} or {MODEL_PATH_ROOT}. Please train the model first.")
+        print(f"Warning: Model not found in {MODEL_DIR} or {MODEL_DIR_ROOT}. Please train the model first.")
 except Exception as e:
     print(f"Error loading model: {e}")
     model = None
 
+# Spatial index for sqft_living15 / sqft_lot15, saved next to the model by train_tabular.py
+neighbourhood_index = None
+try:
+    for model_dir in (MODEL_DIR, MODEL_DIR_ROOT):
+        neighbourhood_index = load_neighbourhood_index(model_dir)
+        if neighbourhood_index is not None:
+            break
+except Exception as e:
+    print(f"Error loading neighbourhood index: {e}")
+
+# Model inference runs on its own small pool, so predictions never queue behind
+# slow feature lookups (which use feature_extractor's fan-out pool or the async client)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+_inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+
+async def run_inference(X):
+    """model.predict(X) on the inference pool, as a float64 array."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_inference_executor, lambda: np.asarray(model.predict(X), dtype=np.float64))
+
+
+# Opt-in (PREDICT_MICRO_BATCH=1): concurrent /predict calls are scored together, see micro_batcher.py
+_predict_batcher = MicroBatcher(run_inference) if MICRO_BATCH_ENABLED else None
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_async_client()
+
 
 @app.get("/predict")
-def predict(
+async def predict(
     bedrooms: float, 
     bathrooms: float, 
     sqft_living: int, 
@@ -112,9 +154,12 @@ def predict(
     ]], dtype=np.float64)
     
     try:
-        price = model.predict(features)
+        if _predict_batcher is not None:
+            price = await _predict_batcher.submit(features[0])
+        else:
+            price = float((await run_inference(features))[0])
         return {
-            "predicted_price": float(price[0]),
+            "predicted_price": price,
             "status": "success",
             "features_used": 18
         }
@@ -125,28 +170,111 @@ def predict(
         }
 
 
+@app.get("/predict/stats")
+def predict_stats():
+    """Micro-batching metrics for /predict: current and peak queue depth, batch size distribution."""
+    if _predict_batcher is None:
+        return {"enabled": False}
+    return _predict_batcher.stats()
+
+
+async def _stream_batch_predictions(X, ids, chunk_size):
+    """Yield one NDJSON line per scored row, predicting a whole chunk at a time on the inference pool."""
+    chunk_size = max(1, int(chunk_size))
+    for start in range(0, X.shape[0], chunk_size):
+        prices = await run_inference(X[start:start + chunk_size])
+        lines = []
+        for offset, price in enumerate(prices):
+            row = start + offset
+            lines.append(json.dumps({
+                "index": row,
+                "id": ids[row] if ids is not None else None,
+                "predicted_price": float(price)
+            }))
+        yield "\n".join(lines) + "\n"
+
+
+@app.post("/predict/batch")
+def predict_batch(
+    records: List[Union[List[float], Dict[str, Union[float, int, str, None]]]] = Body(...),
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+):
+    """
+    Predict prices for many properties in one request.
+
+    The body is a JSON array of records, each either a list of the 18 feature
+    values in `model/feature_names.txt` order or an object keyed by feature name
+    (an optional `id` key is echoed back). Rows are scored with one vectorized
+    `model.predict` call per chunk and streamed back as NDJSON, one
+    `{"index", "id", "predicted_price"}` object per line.
+    """
+    if model is None:
+        return {"error": "Model not loaded. Please train the model first."}
+
+    try:
+        X = records_to_matrix(records, FEATURE_COLUMNS)
+    except (ValueError, TypeError) as e:
+        return {"error": f"Invalid records: {str(e)}", "status": "error"}
+
+    ids = [record.get("id") if isinstance(record, dict) else None for record in records]
+    return StreamingResponse(_stream_batch_predictions(X, ids, chunk_size), media_type="application/x-ndjson")
+
+
+@app.post("/predict/batch/upload")
+def predict_batch_upload(file: UploadFile = File(...), chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Predict prices for a CSV or Parquet upload containing the 18 feature columns
+    (sqft_living15 / sqft_lot15 may be omitted and are then derived from lat/long).
+    An `id` column, if present, is echoed back. Results are streamed as NDJSON
+    in the same format as `/predict/batch`.
+    """
+    if model is None:
+        return {"error": "Model not loaded. Please train the model first."}
+
+    import pandas as pd
+
+    filename = (file.filename or "").lower()
+    try:
+        if filename.endswith(".parquet") or filename.endswith(".pq"):
+            df = pd.read_parquet(file.file)
+        elif filename.endswith(".csv"):
+            df = pd.read_csv(file.file)
+        else:
+            return {"error": "Unsupported file type. Upload a .csv or .parquet file.", "status": "error"}
+        X = frame_to_matrix(df, FEATURE_COLUMNS, neighbourhood_index)
+    except Exception as e:
+        return {"error": f"Could not read upload: {str(e)}", "status": "error"}
+
+    ids = df["id"].tolist() if "id" in df.columns else None
+    return StreamingResponse(_stream_batch_predictions(X, ids, chunk_size), media_type="application/x-ndjson")
+
+
+def _render_satellite_png(lat: float, lon: float) -> bytes:
+    image_array = fetch_satellite_image(lat, lon)
+    
+    # Ensure image is in correct format
+    if len(image_array.shape) == 3 and image_array.shape[2] == 3:
+        image = Image.fromarray(image_array, 'RGB')
+    else:
+        # Fallback: convert to RGB
+        if len(image_array.shape) == 2:
+            image_array = np.stack([image_array, image_array, image_array], axis=-1)
+        image = Image.fromarray(image_array.astype(np.uint8), 'RGB')
+    
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
 @app.get("/satellite")
-def get_satellite(lat: float, lon: float):
+async def get_satellite(lat: float, lon: float):
     """
     Fetch satellite image for given coordinates.
     """
     try:
-        image_array = fetch_satellite_image(lat, lon)
-        
-        # Ensure image is in correct format
-        if len(image_array.shape) == 3 and image_array.shape[2] == 3:
-            image = Image.fromarray(image_array, 'RGB')
-        else:
-            # Fallback: convert to RGB
-            import numpy as np
-            if len(image_array.shape) == 2:
-                image_array = np.stack([image_array, image_array, image_array], axis=-1)
-            image = Image.fromarray(image_array.astype(np.uint8), 'RGB')
-        
-        buf = io.BytesIO()
-        image.save(buf, format="PNG")
-        buf.seek(0)
-        return Response(content=buf.read(), media_type="image/png")
+        # Sentinel Hub's client is blocking; fetch and encode off the event loop
+        png = await run_blocking(_render_satellite_png, lat, lon)
+        return Response(content=png, media_type="image/png")
     except Exception as e:
         import traceback
         error_msg = f"Failed to fetch satellite image: {str(e)}\n{traceback.format_exc()}"
@@ -160,41 +288,39 @@ def get_satellite(lat: float, lon: float):
 
 
 @app.get("/ndvi")
-def get_ndvi(lat: float, lon: float):
+async def get_ndvi(lat: float, lon: float):
     """
     Calculate NDVI (greenery index) for given coordinates.
     Returns a value between -1 and 1, where higher values indicate more vegetation.
     """
     try:
-        bands = fetch_satellite_bands(lat, lon)
-        ndvi = calculate_ndvi(bands)
+        ndvi = (await get_satellite_indices_async(lat, lon))["ndvi"]
         return {"ndvi": ndvi, "interpretation": "Higher values indicate more vegetation/greenery"}
     except Exception as e:
         return {"error": f"Failed to calculate NDVI: {str(e)}"}
 
 
 @app.get("/ndwi")
-def get_ndwi(lat: float, lon: float):
+async def get_ndwi(lat: float, lon: float):
     """
     Calculate NDWI (water index) for given coordinates.
     Returns a value between -1 and 1, where higher values indicate more water nearby.
     """
     try:
-        bands = fetch_satellite_bands(lat, lon)
-        ndwi = calculate_ndwi(bands)
+        ndwi = (await get_satellite_indices_async(lat, lon))["ndwi"]
         return {"ndwi": ndwi, "interpretation": "Higher values indicate more water bodies nearby"}
     except Exception as e:
         return {"error": f"Failed to calculate NDWI: {str(e)}"}
 
 
 @app.get("/road-density")
-def get_road_density_endpoint(lat: float, lon: float):
+async def get_road_density_endpoint(lat: float, lon: float):
     """
     Calculate road density for given coordinates using OpenStreetMap.
     Returns a normalized score between 0 and 1.
     """
     try:
-        density = get_road_density(lat, lon)
+        density = await get_road_density_async(lat, lon)
         return {
             "road_density": density,
             "interpretation": "Higher values indicate more roads/urbanization in the area"
@@ -204,30 +330,62 @@ def get_road_density_endpoint(lat: float, lon: float):
 
 
 @app.get("/features")
-def get_all_features(lat: float, lon: float):
+async def get_all_features(lat: float, lon: float):
     """
     Extract all location-based features (NDVI, NDWI, road density) at once.
+    Sources are fetched concurrently; any that miss their deadline are listed in "timed_out".
     """
     try:
-        features = extract_all_features(lat, lon)
+        features = await extract_all_features_async(lat, lon)
         return features
     except Exception as e:
         return {"error": f"Failed to extract features: {str(e)}"}
 
 
+@app.get("/cache/stats")
+def feature_cache_stats():
+    """
+    Hit/miss counters of the persistent feature cache (shared with the Streamlit app),
+    plus how many amenity lookups in this process were answered without Overpass and
+    the shared HTTP clients' upstream/coalesced/throttled counters.
+    """
+    return {
+        **get_feature_cache().stats(),
+        "amenities": get_amenity_cache_stats(),
+        "http": get_client_stats()
+    }
+
+
 @app.get("/explain")
-def explain_price(bedrooms: int, bathrooms: float, sqft_living: int, lat: float = None, lon: float = None, use_openai: bool = True):
+async def explain_price(bedrooms: int, bathrooms: float, sqft_living: int, lat: float = None, lon: float = None, use_openai: bool = True):
     """
     Generate a human-readable explanation of why a property has a certain predicted price.
     Optionally uses OpenAI to enhance the explanation.
+    Without lat/lon the property is placed at the default Seattle location and no
+    location features are used; other property specs take their usual defaults.
     """
     if model is None:
         return {"error": "Model not loaded. Please train the model first."}
     
-    # Get prediction and features
-    prediction_result = predict(bedrooms, bathrooms, sqft_living, lat, lon)
-    predicted_price = prediction_result["predicted_price"]
-    location_features = prediction_result.get("location_features", {})
+    # Get location features and prediction
+    location_features = {}
+    if lat is not None and lon is not None:
+        features = await extract_all_features_async(lat, lon)
+        location_features = {name: features[name] for name in ("ndvi", "ndwi", "road_density", "zipcode")}
+    
+    # Without coordinates, place the property in the default zipcode (98178)
+    prop = {
+        "bedrooms": bedrooms,
+        "bathrooms": bathrooms,
+        "sqft_living": sqft_living,
+        "lat": lat if lat is not None else 47.5112,
+        "lon": lon if lon is not None else -122.257
+    }
+    try:
+        X = properties_to_matrix([prop], [location_features], FEATURE_COLUMNS, neighbourhood_index)
+        predicted_price = float((await run_inference(X))[0])
+    except Exception as e:
+        return {"error": f"Failed to make prediction: {str(e)}", "status": "error"}
     
     # Generate base explanation
     explanations = []
@@ -291,9 +449,10 @@ def explain_price(bedrooms: int, bathrooms: float, sqft_living: int, lat: float
                 "sqft_living": sqft_living,
                 **location_features
             }
-            explanation_text = enhance_explanation(predicted_price, features_dict, base_explanation)
+            # The OpenAI client is blocking; keep it off the event loop
+            explanation_text = await run_blocking(enhance_explanation, predicted_price, features_dict, base_explanation)
             if lat is not None and lon is not None:
-                location_context = analyze_location_context(lat, lon, location_features)
+                location_context = await run_blocking(analyze_location_context, lat, lon, location_features)
     except ImportError:
         pass  # OpenAI not available
     except Exception:
@@ -313,14 +472,14 @@ def explain_price(bedrooms: int, bathrooms: float, sqft_living: int, lat: float
 
 
 @app.get("/nearby-amenities")
-def nearby_amenities(lat: float, lon: float, radius: int = 1000):
+async def nearby_amenities(lat: float, lon: float, radius: int = 1000):
     """
     Get nearby amenities (schools, hospitals, shops, etc.) for a location.
     User-friendly feature for normal users.
     """
     try:
         print(f"Fetching amenities for lat={lat}, lon={lon}, radius={radius}")
-        amenities = get_nearby_amenities(lat, lon, radius)
+        amenities = await get_nearby_amenities_async(lat, lon, radius)
         print(f"Amenities result: {amenities}")
         return amenities
     except Exception as e:
@@ -331,3 +490,32 @@ def nearby_amenities(lat: float, lon: float, radius: int = 1000):
         return {"error": f"Error: {error_msg}", "total": 0, "by_category": {}}
 
 
+@app.post("/nearby-amenities/batch")
+def nearby_amenities_batch(
+    points: List[Union[List[float], Dict[str, Union[float, int, str, None]]]] = Body(...),
+    radius: int = 1000
+):
+    """
+    Nearby amenities for many locations in one request.
+
+    The body is a JSON array of `[lat, lon]` pairs or `{"lat", "lon"}` objects
+    (an optional `id` key is echoed back). Points are grouped spatially and each
+    group costs one Overpass query; `results` holds one `/nearby-amenities`
+    style object per point, in input order.
+    """
+    try:
+        pairs = [[point["lat"], point["lon"]] if isinstance(point, dict) else point for point in points]
+        for i, pair in enumerate(pairs):
+            if len(pair) != 2:
+                raise ValueError(f"point {i} has {len(pair)} values, expected [lat, lon]")
+        coords = np.array(pairs, dtype=np.float64).reshape(-1, 2)
+    except (KeyError, TypeError, ValueError) as e:
+        return {"error": f"Invalid points: {str(e)}", "status": "error"}
+
+    results = get_nearby_amenities_batch(coords[:, 0], coords[:, 1], radius)
+    for point, result in zip(points, results):
+        if isinstance(point, dict) and "id" in point:
+            result["id"] = point["id"]
+    return {"results": results, "count": len(results), "status": "success"}
+
+
@@ -0,0 +1,253 @@
+"""
+Pluggable model backends for the price model.
+
+A backend knows how to build an estimator, write its artifacts into the model
+directory and load them back for serving. train_tabular.py trains whichever
+backend is requested and model_store records the choice in `model/model.json`,
+so the API, the Streamlit app and bulk scoring load the right artifacts without
+hardcoded paths.
+
+Backends:
+- `random_forest`: the RandomForestRegressor from train_tabular.py, saved as
+  `price_model.pkl` plus memory-mappable `price_model_flat/` arrays, and optionally
+  `price_model_compact/` (a pruned, small-dtype copy written by compact_forest.py)
+- `hist_gradient_boosting`: a HistGradientBoostingRegressor on binned features,
+  saved as `price_model_hgb.pkl`; shallow boosted trees over 255 bins are much
+  smaller and faster to evaluate than 200 depth-20 trees
+
+Usage:
+    python model_backends.py compare [--backends random_forest hist_gradient_boosting]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from forest_engine import ENGINE_ENV_VAR, FlatForest, select_engine
+
+DEFAULT_BACKEND = "random_forest"
+
+
+class ModelBackend(ABC):
+    """Build, save and load one kind of price model."""
+
+    name = ""
+    default_params: Dict = {}
+
+    @abstractmethod
+    def build(self, params: Optional[Dict] = None, verbose: int = 0):
+        """An unfitted estimator with default_params updated by params."""
+
+    @abstractmethod
+    def save(self, model, model_dir: str) -> List[str]:
+        """Write the fitted model's artifacts into model_dir; returns their paths."""
+
+    @abstractmethod
+    def load(self, model_dir: str, engine: Optional[str] = None):
+        """Load the model saved in model_dir, or None if its artifacts are missing."""
+
+    @abstractmethod
+    def artifact_paths(self, model_dir: str) -> List[str]:
+        """Paths of the files and directories save writes into model_dir."""
+
+    def artifact_bytes(self, model_dir: str) -> int:
+        """Total size of the backend's artifacts on disk."""
+        total = 0
+        for path in self.artifact_paths(model_dir):
+            if os.path.isdir(path):
+                total += sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+            elif os.path.exists(path):
+                total += os.path.getsize(path)
+        return total
+
+
+class RandomForestBackend(ModelBackend):
+    name = "random_forest"
+    default_params = {
+        "n_estimators": 200,
+        "max_depth": 20,
+        "min_samples_leaf": 2,
+        "min_samples_split": 5,
+        "max_features": "sqrt",
+    }
+    pickle_filename = "price_model.pkl"
+    flat_dirname = "price_model_flat"
+    compact_dirname = "price_model_compact"
+
+    def build(self, params=None, verbose=0):
+        from sklearn.ensemble import RandomForestRegressor
+
+        return RandomForestRegressor(**{**self.default_params, **(params or {})},
+                                     random_state=42, n_jobs=-1, verbose=verbose)
+
+    def save(self, model, model_dir):
+        os.makedirs(model_dir, exist_ok=True)
+        pickle_path, flat_dir = self.artifact_paths(model_dir)
+        joblib.dump(model, pickle_path)
+        FlatForest.from_sklearn(model).save(flat_dir)
+        # A compact copy of the previous forest would no longer match; compact_forest.py rebuilds it
+        shutil.rmtree(os.path.join(model_dir, self.compact_dirname), ignore_errors=True)
+        return [pickle_path, flat_dir]
+
+    def load(self, model_dir, engine=None):
+        """
+        engine (default: the PRICE_MODEL_ENGINE env var, else "auto"):
+        - "auto" / "flat": memory-map `price_model_flat/` if present, otherwise unpickle
+          `price_model.pkl` and convert it to a FlatForest
+        - "sklearn": always unpickle `price_model.pkl`
+        - "compact": memory-map `price_model_compact/` if present, otherwise like flat
+          with the forest converted to compact dtypes (all trees)
+        """
+        engine = (engine or os.getenv(ENGINE_ENV_VAR, "auto")).lower()
+        pickle_path, flat_dir = self.artifact_paths(model_dir)
+        compact_dir = os.path.join(model_dir, self.compact_dirname)
+
+        if engine == "compact":
+            if os.path.isdir(compact_dir):
+                return FlatForest.load(compact_dir, mmap_mode="r")
+            if os.path.isdir(flat_dir):
+                return FlatForest.load(flat_dir, mmap_mode="r").compact()
+        if engine in ("auto", "flat") and os.path.isdir(flat_dir):
+            return FlatForest.load(flat_dir, mmap_mode="r")
+        if os.path.exists(pickle_path):
+            return select_engine(joblib.load(pickle_path), engine)
+        return None
+
+    def artifact_paths(self, model_dir):
+        return [os.path.join(model_dir, self.pickle_filename), os.path.join(model_dir, self.flat_dirname)]
+
+
+class HistGradientBoostingBackend(ModelBackend):
+    name = "hist_gradient_boosting"
+    default_params = {
+        "max_iter": 600,
+        "learning_rate": 0.05,
+        "max_leaf_nodes": 31,
+        "min_samples_leaf": 20,
+        "l2_regularization": 1.0,
+        # Fixed iteration count: early stopping would hold out a random slice of the training data
+        "early_stopping": False,
+    }
+    pickle_filename = "price_model_hgb.pkl"
+
+    def build(self, params=None, verbose=0):
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        return HistGradientBoostingRegressor(**{**self.default_params, **(params or {})},
+                                             random_state=42, verbose=verbose)
+
+    def save(self, model, model_dir):
+        os.makedirs(model_dir, exist_ok=True)
+        pickle_path, = self.artifact_paths(model_dir)
+        joblib.dump(model, pickle_path)
+        return [pickle_path]
+
+    def load(self, model_dir, engine=None):
+        pickle_path, = self.artifact_paths(model_dir)
+        return joblib.load(pickle_path) if os.path.exists(pickle_path) else None
+
+    def artifact_paths(self, model_dir):
+        return [os.path.join(model_dir, self.pickle_filename)]
+
+
+BACKENDS: Dict[str, ModelBackend] = {
+    backend.name: backend for backend in (RandomForestBackend(), HistGradientBoostingBackend())
+}
+
+
+def get_backend(name: str) -> ModelBackend:
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model backend '{name}' (available: {', '.join(BACKENDS)})")
+
+
+def compare_backends(names: List[str], train_path: str = os.path.join("data", "train.xlsx"),
+                     validation_path: str = os.path.join("data", "validation.xlsx"), repeats: int = 200) -> List[Dict]:
+    """
+    Train each backend with its default parameters and report validation accuracy,
+    artifact size, load time and single-row / batch predict speed side by side.
+    """
+    from sklearn.metrics import mean_absolute_error, r2_score
+
+    from batch_predictor import DEFAULT_FEATURE_COLUMNS
+    from prepare_data import load_dataset
+
+    X_train, y_train = load_dataset(train_path, DEFAULT_FEATURE_COLUMNS).features_and_target("price")
+    X_val, y_val = load_dataset(validation_path, DEFAULT_FEATURE_COLUMNS).features_and_target("price")
+    batch = np.resize(X_val, (10000, X_val.shape[1]))
+
+    reports = []
+    for name in names:
+        backend = get_backend(name)
+        started = time.perf_counter()
+        model = backend.build().fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - started
+
+        with tempfile.TemporaryDirectory() as model_dir:
+            backend.save(model, model_dir)
+            size_mb = backend.artifact_bytes(model_dir) / 1e6
+            load_times = []
+            for _ in range(3):
+                started = time.perf_counter()
+                served = backend.load(model_dir)
+                load_times.append(time.perf_counter() - started)
+            if hasattr(served, "verbose"):
+                served.verbose = 0
+
+            y_pred = served.predict(X_val)
+            served.predict(X_val[:1])  # warm-up
+            latencies = []
+            for i in range(repeats):
+                row = X_val[i % len(X_val):i % len(X_val) + 1]
+                started = time.perf_counter()
+                served.predict(row)
+                latencies.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            served.predict(batch)
+            batch_seconds = time.perf_counter() - started
+
+        reports.append({
+            "backend": name,
+            "serving_model": type(served).__name__,
+            "r2": float(r2_score(y_val, y_pred)),
+            "mae": float(mean_absolute_error(y_val, y_pred)),
+            "fit_seconds": fit_seconds,
+            "artifact_mb": size_mb,
+            "load_ms": float(np.median(load_times)) * 1000,
+            "latency_p50_ms": float(np.percentile(latencies, 50)),
+            "latency_p99_ms": float(np.percentile(latencies, 99)),
+            "batch_rows_per_sec": len(batch) / batch_seconds
+        })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price model backends")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compare_parser = subparsers.add_parser("compare", help="Train every backend and report them side by side")
+    compare_parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    compare_parser.add_argument("--train", default=os.path.join("data", "train.xlsx"))
+    compare_parser.add_argument("--validation", default=os.path.join("data", "validation.xlsx"))
+    compare_parser.add_argument("--out", default=os.path.join("model", "backend_comparison.csv"))
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        import pandas as pd
+
+        report = pd.DataFrame(compare_backends(args.backends, args.train, args.validation))
+        print(report.to_string(index=False, float_format=lambda v: f"{v:,.4g}"))
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        report.to_csv(args.out, index=False)
+        print(f"✅ Comparison saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
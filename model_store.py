@@ -0,0 +1,99 @@
+"""
+Model artifact storage and loading shared by the API, the Streamlit app and the training script.
+
+Training writes into `model/`:
+- the backend's model artifacts (see model_backends.py), e.g. `price_model.pkl` and
+  `price_model_flat/` (raw `.npy` node arrays, see forest_engine.FlatForest) for the forest
+- `model.json`: which backend produced them, its parameters and validation metrics
+- `tree_windows.json` (forest only): the training data window each tree was grown on
+  (see incremental_train.py)
+- `neighbourhood_index/`: training coordinates and areas for sqft_living15 / sqft_lot15
+  (see neighbourhood_index.NeighbourhoodIndex)
+
+Serving picks the backend from `model.json`; model directories written before it
+existed are treated as random_forest. The forest prefers its flat arrays, which are
+memory-mapped instead of unpickled.
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from model_backends import DEFAULT_BACKEND, get_backend
+from neighbourhood_index import META_FILENAME as NEIGHBOURHOOD_META_FILENAME, NeighbourhoodIndex
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+METADATA_FILENAME = "model.json"
+TREE_WINDOWS_FILENAME = "tree_windows.json"
+NEIGHBOURHOOD_DIRNAME = "neighbourhood_index"
+
+
+def save_model(model, model_dir=MODEL_DIR, backend=DEFAULT_BACKEND, params: Optional[Dict] = None,
+               metrics: Optional[Dict] = None, reference_metrics: Optional[Dict] = None):
+    """
+    Write the backend's artifacts and model.json; returns the artifact paths.
+    `reference_metrics` are those of the last full retrain, which incremental
+    updates are validated against (default: `metrics`, i.e. this is a full retrain).
+    """
+    paths = get_backend(backend).save(model, model_dir)
+    with open(os.path.join(model_dir, METADATA_FILENAME), "w") as f:
+        json.dump({
+            "backend": backend,
+            "params": params or {},
+            "metrics": metrics or {},
+            "reference_metrics": reference_metrics or metrics or {},
+            "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "artifacts": [os.path.basename(path) for path in paths]
+        }, f, indent=2)
+    return paths
+
+
+def load_model_metadata(model_dir=MODEL_DIR) -> Dict:
+    """Contents of model.json ({"backend": "random_forest"} for older model directories)."""
+    path = os.path.join(model_dir, METADATA_FILENAME)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"backend": DEFAULT_BACKEND}
+
+
+def load_price_model(model_dir=MODEL_DIR, engine=None):
+    """
+    Load the price model from model_dir with the backend named in its model.json,
+    or return None if no artifact exists. `engine` selects the forest's inference
+    engine (see model_backends.RandomForestBackend.load).
+    """
+    return get_backend(load_model_metadata(model_dir)["backend"]).load(model_dir, engine)
+
+
+def save_tree_windows(windows: List[Dict], tree_windows: List[int], model_dir=MODEL_DIR):
+    """
+    Record the data windows ({id, source, sha256, rows, added_at}) and, per tree
+    in estimator order, the id of the window it was trained on.
+    """
+    with open(os.path.join(model_dir, TREE_WINDOWS_FILENAME), "w") as f:
+        json.dump({"windows": windows, "trees": [int(window) for window in tree_windows]}, f, indent=2)
+
+
+def load_tree_windows(model_dir=MODEL_DIR) -> Optional[Dict]:
+    """{"windows": [...], "trees": [...]} from tree_windows.json, or None if it has not been written."""
+    path = os.path.join(model_dir, TREE_WINDOWS_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_neighbourhood_index(df, model_dir=MODEL_DIR):
+    """Index the training rows' coordinates and areas next to the model; returns the artifact directory."""
+    index_dir = os.path.join(model_dir, NEIGHBOURHOOD_DIRNAME)
+    NeighbourhoodIndex.from_frame(df).save(index_dir)
+    return index_dir
+
+
+def load_neighbourhood_index(model_dir=MODEL_DIR):
+    """Load the NeighbourhoodIndex saved next to the model, or None if it has not been built."""
+    index_dir = os.path.join(model_dir, NEIGHBOURHOOD_DIRNAME)
+    if os.path.exists(os.path.join(index_dir, NEIGHBOURHOOD_META_FILENAME)):
+        return NeighbourhoodIndex.load(index_dir)
+    return None
@@ -1,185 +1,449 @@
 """
 Nearby amenities detection for user-friendly location information.
 """
+import asyncio
+import os
+import threading
+import time
 import requests
 import numpy as np
 from typing import Dict, List
 
+from concurrent.futures import ThreadPoolExecutor
 
-def get_nearby_amenities(lat: float, lon: float, radius: int = 1000) -> Dict:
+from amenity_index import AmenityIndex, get_amenity_index
+from feature_cache import get_feature_cache
+from geo_utils import bbox_offsets
+from http_clients import overpass_query, overpass_query_async
+# Cached POI sets are keyed by ~1 km cells (see get_cached_amenities)
+AMENITY_CELL_SIZE = float(os.getenv("AMENITY_CACHE_CELL_SIZE", "0.01"))
+# Batch scoring groups points into ~5 km grid clusters, one Overpass query each
+BATCH_CLUSTER_SIZE = 0.05
+# The public Overpass server grants two concurrent query slots per client
+BATCH_MAX_WORKERS = 2
+
+AMENITY_CATEGORIES = (
+    "Education",
+    "Healthcare",
+    "Shopping",
+    "Dining",
+    "Services",
+    "Recreation",
+    "Safety"
+)
+
+CATEGORY_MAPPING = {
+    "school": "Education",
+    "university": "Education",
+    "college": "Education",
+    "kindergarten": "Education",
+    "hospital": "Healthcare",
+    "clinic": "Healthcare",
+    "pharmacy": "Healthcare",
+    "dentist": "Healthcare",
+    "doctors": "Healthcare",
+    "supermarket": "Shopping",
+    "marketplace": "Shopping",
+    "shop": "Shopping",
+    "bank": "Services",
+    "atm": "Services",
+    "post_office": "Services",
+    "restaurant": "Dining",
+    "cafe": "Dining",
+    "bar": "Dining",
+    "parking": "Services",
+    "fuel": "Services",
+    "gym": "Recreation",
+    "cinema": "Recreation",
+    "theatre": "Recreation",
+    "library": "Recreation",
+    "park": "Recreation",
+    "police": "Safety",
+    "fire_station": "Safety"
+}
+DEFAULT_CATEGORY = "Services"
+
+_amenity_stats = {"requests": 0, "index": 0, "cache": 0, "network": 0}
+_stats_lock = threading.Lock()
+
+
+def parse_amenity_elements(elements: List[Dict]) -> List[Dict]:
     """
-    Get nearby amenities using Overpass API.
-    Returns user-friendly information about schools, hospitals, shops, etc.
+    Turn Overpass `out center` elements into amenity records
+    ({name, type, lat, lon, category}), skipping unnamed or unlocated ones.
     """
-    try:
-        # Calculate bounding box
-        lat_offset = radius / 111000
-        lon_offset = radius / (111000 * np.cos(np.radians(lat)))
+    amenities = []
+    for element in elements:
+        amenity_type = element.get("tags", {}).get("amenity", "unknown").lower()
+        name = element.get("tags", {}).get("name", f"{amenity_type.title()}")
         
-        bbox = f"{lat - lat_offset},{lon - lon_offset},{lat + lat_offset},{lon + lon_offset}"
+        # Skip if no name
+        if name == "Unknown":
+            continue
         
-        # Simplified query - search for amenities in a simpler way
-        query = f"""
-        [out:json][timeout:30];
-        (
-          node["amenity"]({bbox});
-          way["amenity"]({bbox});
-          relation["amenity"]({bbox});
-        );
-        out center;
-        """
-        
-        url = "https://overpass-api.de/api/interpreter"
+        # Get coordinates
+        if "center" in element:
+            coord = element["center"]
+        elif "lat" in element:
+            coord = {"lat": element["lat"], "lon": element["lon"]}
+        else:
+            continue
         
-        # Retry logic for API rate limiting
-        max_retries = 3
-        retry_delay = 2
+        amenities.append({
+            "name": name,
+            "type": amenity_type,
+            "lat": coord.get("lat"),
+            "lon": coord.get("lon"),
+            "category": CATEGORY_MAPPING.get(amenity_type, DEFAULT_CATEGORY)
+        })
+    return amenities
+
+
+def summarize_amenities(amenities: List[Dict]) -> Dict:
+    """Group amenity records by category and compute the convenience score/rating."""
+    amenities_by_category = {category: [] for category in AMENITY_CATEGORIES}
+    for amenity in amenities:
+        amenities_by_category[amenity["category"]].append({
+            "name": amenity["name"],
+            "type": amenity["type"],
+            "lat": amenity["lat"],
+            "lon": amenity["lon"]
+        })
+    
+    # Count totals
+    total_count = len(amenities)
+    
+    # Calculate convenience score (0-100)
+    convenience_score = min(100, (total_count / 20) * 100)  # 20+ amenities = 100 score
+    
+    return {
+        "total": total_count,
+        "by_category": {k: v for k, v in amenities_by_category.items() if v},
+        "convenience_score": round(convenience_score, 1),
+        "convenience_rating": "Excellent" if convenience_score > 80 else "Very Good" if convenience_score > 60 else "Good" if convenience_score > 40 else "Fair" if convenience_score > 20 else "Limited",
+        "error": None
+    }
+
+
+def _empty_result(error: str) -> Dict:
+    return {
+        "total": 0,
+        "by_category": {},
+        "convenience_score": 0,
+        "convenience_rating": "Unknown",
+        "error": error
+    }
+
+
+def _amenity_query(south: float, west: float, north: float, east: float, timeout: int = 30) -> str:
+    bbox = f"{south},{west},{north},{east}"
+    
+    # Simplified query - search for amenities in a simpler way
+    return f"""
+    [out:json][timeout:{timeout}];
+    (
+      node["amenity"]({bbox});
+      way["amenity"]({bbox});
+      relation["amenity"]({bbox});
+    );
+    out center;
+    """
+
+
+# Overpass attempts per amenity query and the base delay between them, in seconds
+AMENITY_MAX_RETRIES = 3
+AMENITY_RETRY_DELAY = 2
+
+
+def _amenity_fetch_steps(south: float, west: float, north: float, east: float, timeout: int = 30):
+    """
+    Overpass lookup for every amenity in a bbox, retrying on rate limits and timeouts,
+    written once for both HTTP clients (see _run_steps). Yields ("query", query, timeout)
+    and ("sleep", seconds) steps, is sent each query's response (None if it timed out)
+    and returns (elements, error) where exactly one of the two is None.
+    """
+    query = _amenity_query(south, west, north, east, timeout)
+    
+    for attempt in range(AMENITY_MAX_RETRIES):
+        response = yield "query", query, timeout + 10
+        if response is not None and response.status_code != 429:
+            if response.status_code != 200:
+                return None, f"Overpass API error: {response.status_code}"
+            return response.json().get("elements", []), None
         
-        for attempt in range(max_retries):
+        rate_limited = response is not None
+        if attempt == AMENITY_MAX_RETRIES - 1:
+            if rate_limited:
+                return None, "Overpass API rate limited - please try again later"
+            return None, "Overpass API timeout - please try again"
+        # Exponential backoff on rate limits, a fixed delay after timeouts
+        yield "sleep", AMENITY_RETRY_DELAY * (attempt + 1) if rate_limited else AMENITY_RETRY_DELAY
+
+
+def _run_steps(steps):
+    """Run a step generator (see _amenity_fetch_steps) on the blocking HTTP client; returns its result."""
+    try:
+        step = next(steps)
+        while True:
+            if step[0] == "sleep":
+                time.sleep(step[1])
+                step = steps.send(None)
+                continue
             try:
-                response = requests.post(url, data={"data": query}, timeout=40)
-                
-                # Handle rate limiting (429) or server errors (too many requests)
-                if response.status_code == 429:
-                    if attempt < max_retries - 1:
-                        import time
-                        time.sleep(retry_delay * (attempt + 1))  # Exponential backoff
-                        continue
-                    else:
-                        return {
-                            "total": 0,
-                            "by_category": {},
-                            "convenience_score": 0,
-                            "convenience_rating": "Unknown",
-                            "error": "Overpass API rate limited - please try again later"
-                        }
-                
-                break  # Success, exit retry loop
-                
+                response = overpass_query(step[1], timeout=step[2])
             except requests.Timeout:
-                if attempt < max_retries - 1:
-                    import time
-                    time.sleep(retry_delay)
-                    continue
-                else:
-                    return {
-                        "total": 0,
-                        "by_category": {},
-                        "convenience_score": 0,
-                        "convenience_rating": "Unknown",
-                        "error": "Overpass API timeout - please try again"
-                    }
-        
-        if response.status_code == 200:
-            data = response.json()
-            elements = data.get("elements", [])
-            
-            if not elements:
-                return {
-                    "total": 0,
-                    "by_category": {},
-                    "convenience_score": 0,
-                    "convenience_rating": "Limited",
-                    "error": None
-                }
-            
-            # Categorize amenities
-            amenities_by_category = {
-                "Education": [],
-                "Healthcare": [],
-                "Shopping": [],
-                "Dining": [],
-                "Services": [],
-                "Recreation": [],
-                "Safety": []
-            }
-            
-            category_mapping = {
-                "school": "Education",
-                "university": "Education",
-                "college": "Education",
-                "kindergarten": "Education",
-                "hospital": "Healthcare",
-                "clinic": "Healthcare",
-                "pharmacy": "Healthcare",
-                "dentist": "Healthcare",
-                "doctors": "Healthcare",
-                "supermarket": "Shopping",
-                "marketplace": "Shopping",
-                "shop": "Shopping",
-                "bank": "Services",
-                "atm": "Services",
-                "post_office": "Services",
-                "restaurant": "Dining",
-                "cafe": "Dining",
-                "bar": "Dining",
-                "parking": "Services",
-                "fuel": "Services",
-                "gym": "Recreation",
-                "cinema": "Recreation",
-                "theatre": "Recreation",
-                "library": "Recreation",
-                "park": "Recreation",
-                "police": "Safety",
-                "fire_station": "Safety"
-            }
-            
-            for element in elements:
-                amenity_type = element.get("tags", {}).get("amenity", "unknown").lower()
-                name = element.get("tags", {}).get("name", f"{amenity_type.title()}")
-                
-                # Skip if no name
-                if name == "Unknown":
-                    continue
-                
-                # Get coordinates
-                if "center" in element:
-                    coord = element["center"]
-                elif "lat" in element:
-                    coord = {"lat": element["lat"], "lon": element["lon"]}
-                else:
-                    continue
-                
-                category = category_mapping.get(amenity_type, "Services")
-                
-                amenities_by_category[category].append({
-                    "name": name,
-                    "type": amenity_type,
-                    "lat": coord.get("lat"),
-                    "lon": coord.get("lon")
-                })
-            
-            # Count totals
-            total_count = sum(len(amenities) for amenities in amenities_by_category.values())
-            
-            # Calculate convenience score (0-100)
-            convenience_score = min(100, (total_count / 20) * 100)  # 20+ amenities = 100 score
-            
-            return {
-                "total": total_count,
-                "by_category": {k: v for k, v in amenities_by_category.items() if v},
-                "convenience_score": round(convenience_score, 1),
-                "convenience_rating": "Excellent" if convenience_score > 80 else "Very Good" if convenience_score > 60 else "Good" if convenience_score > 40 else "Fair" if convenience_score > 20 else "Limited",
-                "error": None
-            }
-        else:
-            return {
-                "total": 0,
-                "by_category": {},
-                "convenience_score": 0,
-                "convenience_rating": "Unknown",
-                "error": f"Overpass API error: {response.status_code}"
-            }
+                response = None
+            step = steps.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def _run_steps_async(steps):
+    """_run_steps on the async HTTP client."""
+    import httpx
+
+    try:
+        step = next(steps)
+        while True:
+            if step[0] == "sleep":
+                await asyncio.sleep(step[1])
+                step = steps.send(None)
+                continue
+            try:
+                response = await overpass_query_async(step[1], timeout=step[2])
+            except httpx.TimeoutException:
+                response = None
+            step = steps.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+def fetch_amenity_elements(south: float, west: float, north: float, east: float, timeout: int = 30):
+    """
+    Query Overpass (http_clients.OVERPASS_URL) for every amenity in a bbox, retrying
+    on rate limits and timeouts. Returns (elements, error) where exactly one of the two is None.
+    """
+    return _run_steps(_amenity_fetch_steps(south, west, north, east, timeout))
+
+
+async def fetch_amenity_elements_async(south: float, west: float, north: float, east: float, timeout: int = 30):
+    """fetch_amenity_elements on the async HTTP client, with the same retries and (elements, error) result."""
+    return await _run_steps_async(_amenity_fetch_steps(south, west, north, east, timeout))
+
+
+def _record(outcome: str):
+    with _stats_lock:
+        _amenity_stats["requests"] += 1
+        _amenity_stats[outcome] += 1
+
+
+def get_amenity_cache_stats() -> Dict:
+    """
+    Counters for amenity lookups in this process: how many were answered by the
+    offline index, by the cached POI set of a larger area, or by Overpass.
+    """
+    with _stats_lock:
+        stats = dict(_amenity_stats)
+    local = stats["index"] + stats["cache"]
+    cache_lookups = stats["cache"] + stats["network"]
+    return {
+        **stats,
+        "cache_hit_ratio": round(stats["cache"] / cache_lookups, 4) if cache_lookups else 0.0,
+        "offline_share": round(local / stats["requests"], 4) if stats["requests"] else 0.0,
+        "cell_size_deg": AMENITY_CELL_SIZE
+    }
+
+
+def _filter_bbox(entry: Dict, lat: float, lon: float, radius: int) -> List[Dict]:
+    """Amenities of a cached area that fall inside the bbox around a point, in Overpass order."""
+    rows = entry["amenities"]
+    if not rows:
+        return []
+    lat_offset, lon_offset = bbox_offsets(lat, radius)
+    coords = np.array([(row[2], row[3]) for row in rows], dtype=np.float64)
+    inside = (np.abs(coords[:, 0] - lat) <= lat_offset) & (np.abs(coords[:, 1] - lon) <= lon_offset)
+    return [
+        {"name": row[0], "type": row[1], "lat": row[2], "lon": row[3], "category": row[4]}
+        for row, keep in zip(rows, inside) if keep
+    ]
+
+
+def _contains(entry: Dict, lat: float, lon: float, radius: int) -> bool:
+    lat_offset, lon_offset = bbox_offsets(lat, radius)
+    return (abs(lat - entry["lat"]) + lat_offset <= entry["lat_offset"] and
+            abs(lon - entry["lon"]) + lon_offset <= entry["lon_offset"])
+
+
+def _cached_cell(lat: float, lon: float, radius: int):
+    """
+    Look up the cache cell for a point. Returns (cell, amenities): the amenities
+    on a hit, otherwise None and the cell's bbox to fetch.
+    """
+    cell_lat = round(lat / AMENITY_CELL_SIZE) * AMENITY_CELL_SIZE
+    cell_lon = round(lon / AMENITY_CELL_SIZE) * AMENITY_CELL_SIZE
+    
+    entry = get_feature_cache().get("amenities", cell_lat, cell_lon)
+    if entry is not None and _contains(entry, lat, lon, radius):
+        _record("cache")
+        return None, _filter_bbox(entry, lat, lon, radius)
+    
+    fetch_radius = max(radius, entry["radius"]) if entry is not None else radius
+    # Padded by half a cell; the widest longitude offset is at the cell edge furthest from the equator
+    lat_offset, lon_offset = bbox_offsets(abs(cell_lat) + AMENITY_CELL_SIZE / 2, fetch_radius)
+    lat_offset += AMENITY_CELL_SIZE / 2
+    lon_offset += AMENITY_CELL_SIZE / 2
+    _record("network")
+    return {
+        "lat": cell_lat,
+        "lon": cell_lon,
+        "radius": fetch_radius,
+        "lat_offset": lat_offset,
+        "lon_offset": lon_offset
+    }, None
+
+
+def _cell_bbox(cell: Dict):
+    return (cell["lat"] - cell["lat_offset"], cell["lon"] - cell["lon_offset"],
+            cell["lat"] + cell["lat_offset"], cell["lon"] + cell["lon_offset"])
+
+
+def _store_cell(cell: Dict, elements: List[Dict], lat: float, lon: float, radius: int) -> List[Dict]:
+    """Cache the elements fetched for a cell and return the ones inside the point's bbox."""
+    entry = {
+        **cell,
+        "amenities": [
+            [a["name"], a["type"], a["lat"], a["lon"], a["category"]]
+            for a in parse_amenity_elements(elements)
+        ]
+    }
+    get_feature_cache().set("amenities", cell["lat"], cell["lon"], entry)
+    return _filter_bbox(entry, lat, lon, radius)
+
+
+def _cached_amenity_steps(lat: float, lon: float, radius: int):
+    """Steps of get_cached_amenities (see _amenity_fetch_steps); returns (amenities, error)."""
+    cell, amenities = _cached_cell(lat, lon, radius)
+    if cell is None:
+        return amenities, None
+    
+    elements, error = yield from _amenity_fetch_steps(*_cell_bbox(cell))
+    if error is not None:
+        return None, error
+    return _store_cell(cell, elements, lat, lon, radius), None
+
+
+def get_cached_amenities(lat: float, lon: float, radius: int = 1000):
+    """
+    Amenity records inside the bbox around a point, reusing previously fetched areas.
+    Returns (amenities, error).
+    
+    Each AMENITY_CELL_SIZE cell of the feature cache holds the raw POI set for the
+    largest radius requested anywhere in that cell, fetched around the cell centre
+    and padded by half a cell. Any smaller radius, or any other point in the same
+    cell, is then answered by filtering that set locally; a larger radius refetches
+    and replaces the entry.
+    """
+    return _run_steps(_cached_amenity_steps(lat, lon, radius))
+
+
+async def get_cached_amenities_async(lat: float, lon: float, radius: int = 1000):
+    """get_cached_amenities with the Overpass call made on the async HTTP client."""
+    return await _run_steps_async(_cached_amenity_steps(lat, lon, radius))
+
+
+def _nearby_amenity_steps(lat: float, lon: float, radius: int):
+    """Steps of get_nearby_amenities (see _amenity_fetch_steps); returns the summary."""
+    index = get_amenity_index()
+    if index is not None and index.covers(lat, lon, radius):
+        _record("index")
+        return summarize_amenities(index.query(lat, lon, radius))
+    
+    amenities, error = yield from _cached_amenity_steps(lat, lon, radius)
+    return _empty_result(error) if error is not None else summarize_amenities(amenities)
+
+
+def get_nearby_amenities(lat: float, lon: float, radius: int = 1000) -> Dict:
+    """
+    Get nearby amenities using Overpass API.
+    Returns user-friendly information about schools, hospitals, shops, etc.
+    
+    Points covered by the offline POI index (see amenity_index.py) are answered
+    locally without calling Overpass; elsewhere previously fetched areas are
+    reused through get_cached_amenities.
+    """
+    try:
+        return _run_steps(_nearby_amenity_steps(lat, lon, radius))
+    except Exception as e:
+        return _lookup_error(e)
+
+
+async def get_nearby_amenities_async(lat: float, lon: float, radius: int = 1000) -> Dict:
+    """get_nearby_amenities for async callers; Overpass is called without blocking the event loop."""
+    try:
+        return await _run_steps_async(_nearby_amenity_steps(lat, lon, radius))
     except Exception as e:
-        import traceback
-        error_msg = str(e)
-        print(f"Amenities error: {error_msg}")
-        print(traceback.format_exc())
-        return {
-            "total": 0,
-            "by_category": {},
-            "convenience_score": 0,
-            "convenience_rating": "Unknown",
-            "error": f"Error: {error_msg}"
-        }
+        return _lookup_error(e)
+
+
+def _lookup_error(e: Exception) -> Dict:
+    import traceback
+    error_msg = str(e)
+    print(f"Amenities error: {error_msg}")
+    print(traceback.format_exc())
+    return _empty_result(f"Error: {error_msg}")
+
 
+def _score_cluster(lats: np.ndarray, lons: np.ndarray, radius: int) -> List[Dict]:
+    """One Overpass query over the union bbox of a cluster, assigned back to each point."""
+    lat_offset, lon_offset = bbox_offsets(lats, radius)
+    elements, error = fetch_amenity_elements(
+        float(lats.min() - lat_offset), float((lons - lon_offset).min()),
+        float(lats.max() + lat_offset), float((lons + lon_offset).max()),
+        timeout=120
+    )
+    if error is not None:
+        return [_empty_result(error) for _ in lats]
+    
+    cluster = AmenityIndex.from_elements(elements)
+    return [summarize_amenities(cluster.amenities(idx)) for idx in cluster.query_indices(lats, lons, radius)]
+
+
+def get_nearby_amenities_batch(lats, lons, radius: int = 1000, cluster_size: float = BATCH_CLUSTER_SIZE,
+                               max_workers: int = BATCH_MAX_WORKERS) -> List[Dict]:
+    """
+    Nearby amenities for many points, in the same per-point format as get_nearby_amenities.
+    
+    Points covered by the offline POI index are answered locally. The rest are
+    grouped into cluster_size-degree grid clusters and each cluster is fetched with
+    a single Overpass query over the union of its points' bboxes; the POIs are
+    then assigned back to every point with a vectorized bbox filter.
+    """
+    lats = np.asarray(lats, dtype=np.float64).ravel()
+    lons = np.asarray(lons, dtype=np.float64).ravel()
+    if lats.shape != lons.shape:
+        raise ValueError("lats and lons must have the same length")
+    results = [None] * len(lats)
+    
+    pending = np.arange(len(lats))
+    index = get_amenity_index()
+    if index is not None and len(lats):
+        covered = np.asarray(index.covers(lats, lons, radius), dtype=bool)
+        for i, idx in zip(pending[covered], index.query_indices(lats[covered], lons[covered], radius)):
+            _record("index")
+            results[i] = summarize_amenities(index.amenities(idx))
+        pending = pending[~covered]
+    
+    if len(pending):
+        cells = np.floor(np.column_stack((lats[pending], lons[pending])) / cluster_size).astype(np.int64)
+        _, cluster_ids = np.unique(cells, axis=0, return_inverse=True)
+        cluster_ids = cluster_ids.ravel()
+        clusters = [pending[cluster_ids == k] for k in range(cluster_ids.max() + 1)]
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            scored = executor.map(lambda members: _score_cluster(lats[members], lons[members], radius), clusters)
+            for members, cluster_results in zip(clusters, scored):
+                for i, result in zip(members, cluster_results):
+                    _record("network")
+                    results[i] = result
+    
+    return results
@@ -0,0 +1,75 @@
+"""
+Spatial index for the neighbourhood features sqft_living15 / sqft_lot15.
+
+The model was trained on King County's `sqft_living15` and `sqft_lot15` columns:
+the mean living and lot area of the 15 nearest properties. This index keeps the
+training properties' coordinates in a KD-tree so the same aggregates can be
+computed for any coordinate, one point or whole arrays at a time, instead of
+copying the subject property's own areas.
+"""
+import json
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from geo_utils import METERS_PER_DEGREE
+
+META_FILENAME = "neighbourhood.json"
+NEIGHBOURS = 15
+
+
+class NeighbourhoodIndex:
+    """KD-tree over projected training coordinates with their living and lot areas."""
+
+    def __init__(self, points: np.ndarray, sqft_living: np.ndarray, sqft_lot: np.ndarray, k: int = NEIGHBOURS):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.sqft_living = np.asarray(sqft_living, dtype=np.float64)
+        self.sqft_lot = np.asarray(sqft_lot, dtype=np.float64)
+        self.k = min(int(k), len(self.points))
+        self.lon_scale = float(np.cos(np.radians(self.points[:, 0].mean())))
+        self.tree = cKDTree(self._project(self.points[:, 0], self.points[:, 1]))
+
+    def _project(self, lat, lon):
+        return np.column_stack((
+            np.asarray(lon, dtype=np.float64) * METERS_PER_DEGREE * self.lon_scale,
+            np.asarray(lat, dtype=np.float64) * METERS_PER_DEGREE
+        ))
+
+    @classmethod
+    def from_frame(cls, df, k: int = NEIGHBOURS) -> "NeighbourhoodIndex":
+        """Build from a DataFrame with lat, long, sqft_living and sqft_lot columns (e.g. data/train.xlsx)."""
+        df = df[["lat", "long", "sqft_living", "sqft_lot"]].dropna()
+        return cls(df[["lat", "long"]].to_numpy(), df["sqft_living"].to_numpy(), df["sqft_lot"].to_numpy(), k)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name in ("points", "sqft_living", "sqft_lot"):
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, META_FILENAME), "w") as f:
+            json.dump({"k": self.k, "n_points": len(self.points)}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "NeighbourhoodIndex":
+        with open(os.path.join(directory, META_FILENAME)) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy")) for name in ("points", "sqft_living", "sqft_lot")}
+        return cls(k=meta["k"], **arrays)
+
+    def aggregates(self, lats, lons):
+        """Mean (sqft_living, sqft_lot) of the k nearest training properties, as two arrays over the points."""
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        _, nearest = self.tree.query(self._project(lats, lons), k=self.k)
+        nearest = nearest.reshape(len(lats), -1)
+        return self.sqft_living[nearest].mean(axis=1), self.sqft_lot[nearest].mean(axis=1)
+
+    def lookup(self, lat: float, lon: float):
+        """(sqft_living15, sqft_lot15) for a single coordinate."""
+        living, lot = self.aggregates(lat, lon)
+        return float(living[0]), float(lot[0])
+
+    def fill_frame(self, df, lat_column: str = "lat", lon_column: str = "long"):
+        """Add sqft_living15 / sqft_lot15 columns to a DataFrame that lacks them (returns a copy)."""
+        living, lot = self.aggregates(df[lat_column].to_numpy(), df[lon_column].to_numpy())
+        return df.assign(sqft_living15=living, sqft_lot15=lot)
@@ -0,0 +1,208 @@
+"""
+Columnar cache of the xlsx datasets for training, validation and scoring.
+
+Parsing xlsx with openpyxl dominates a retrain besides the fit itself. This
+stage converts a source file once into `.npy` arrays:
+- `features.npy`: float64 matrix of the feature columns in `feature_names.txt` order
+  (NaN where the source lacks a column, e.g. sqft_living15 in raw inputs)
+- `<column>.npy`: every other numeric column (`price`, `id`, ...) in its own dtype
+
+Each prepared copy lives in `data/prepared/<name>-<key>/`, where the key hashes the
+source file's bytes and the feature column list, so an edited source (or a new
+feature order) is prepared again while unchanged sources are reused. Readers get
+the arrays as read-only memory maps: no parsing and no copy until rows are used.
+
+Usage:
+    python prepare_data.py data/train.xlsx data/validation.xlsx data/test2.xlsx
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from batch_predictor import FEATURE_COLUMNS
+
+DEFAULT_PREPARED_DIR = os.getenv(
+    "PREPARED_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "prepared")
+)
+META_FILENAME = "dataset.json"
+FEATURES_FILENAME = "features.npy"
+
+
+def source_key(path: str, feature_columns: Sequence[str] = FEATURE_COLUMNS) -> str:
+    """SHA-256 of the source file's bytes and the feature column order."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update("\n".join(feature_columns).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def prepared_path(path: str, key: str, prepared_dir: str = DEFAULT_PREPARED_DIR) -> str:
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(prepared_dir, f"{name}-{key[:16]}")
+
+
+class PreparedDataset:
+    """Memory-mapped arrays of one prepared source file."""
+
+    def __init__(self, directory: str, mmap_mode: Optional[str] = "r"):
+        with open(os.path.join(directory, META_FILENAME)) as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.source = meta["source"]
+        self.feature_columns: List[str] = meta["feature_columns"]
+        self.missing_columns: List[str] = meta["missing_columns"]
+        self.features = np.load(os.path.join(directory, FEATURES_FILENAME), mmap_mode=mmap_mode)
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in meta["columns"]
+        }
+
+    def __len__(self):
+        return self.features.shape[0]
+
+    def column(self, name: str) -> np.ndarray:
+        """A feature or extra column as a 1-D array (a strided view into the feature matrix for features)."""
+        if name in self.columns:
+            return self.columns[name]
+        if name in self.feature_columns and name not in self.missing_columns:
+            return self.features[:, self.feature_columns.index(name)]
+        raise KeyError(name)
+
+    def complete_rows(self, *extra_columns: str) -> np.ndarray:
+        """Boolean mask of rows with no NaN in the available features or the given extra columns."""
+        available = [i for i, name in enumerate(self.feature_columns) if name not in self.missing_columns]
+        mask = ~np.isnan(self.features[:, available]).any(axis=1)
+        for name in extra_columns:
+            values = self.columns[name]
+            if values.dtype.kind == "f":
+                mask &= ~np.isnan(values)
+        return mask
+
+    def features_and_target(self, target: str = "price"):
+        """
+        (X, y) over the complete rows. When no row has a NaN, X is the memory map
+        itself rather than a copy.
+        """
+        rows = self.complete_rows(target)
+        y = self.columns[target].astype(np.float64)
+        if rows.all():
+            return self.features, y
+        return self.features[rows], y[rows]
+
+    def frame(self, start: int = 0, stop: Optional[int] = None):
+        """
+        Rows [start, stop) as a DataFrame with the available feature columns and the
+        extra columns, as the source would have been read (minus non-numeric columns).
+        """
+        import pandas as pd
+
+        stop = len(self) if stop is None else min(stop, len(self))
+        data = {
+            name: self.features[start:stop, i]
+            for i, name in enumerate(self.feature_columns) if name not in self.missing_columns
+        }
+        data.update({name: values[start:stop] for name, values in self.columns.items()})
+        return pd.DataFrame(data)
+
+
+def prepare_dataset(path: str, feature_columns: Sequence[str] = FEATURE_COLUMNS,
+                    prepared_dir: str = DEFAULT_PREPARED_DIR, force: bool = False) -> str:
+    """
+    Convert an xlsx/CSV/Parquet source into `.npy` arrays unless an up-to-date
+    copy exists; returns the prepared directory.
+    """
+    import pandas as pd
+
+    key = source_key(path, feature_columns)
+    out_dir = prepared_path(path, key, prepared_dir)
+    if not force and os.path.exists(os.path.join(out_dir, META_FILENAME)):
+        return out_dir
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        df = pd.read_csv(path)
+    elif ext in (".parquet", ".pq"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_excel(path)
+
+    missing = [name for name in feature_columns if name not in df.columns]
+    features = np.full((len(df), len(feature_columns)), np.nan, dtype=np.float64)
+    for i, name in enumerate(feature_columns):
+        if name not in missing:
+            features[:, i] = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+
+    # Extra numeric columns (price, id, ...) keep their own dtype; text columns such as `date` are dropped
+    extra = {
+        name: df[name].to_numpy()
+        for name in df.columns
+        if name not in feature_columns and pd.api.types.is_numeric_dtype(df[name])
+    }
+
+    # Write into a temporary directory and swap it in, so readers never see a partial copy
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, FEATURES_FILENAME), features)
+    for name, values in extra.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+    with open(os.path.join(tmp_dir, META_FILENAME), "w") as f:
+        json.dump({
+            "source": os.path.abspath(path),
+            "sha256": key,
+            "rows": len(df),
+            "feature_columns": list(feature_columns),
+            "missing_columns": missing,
+            "columns": list(extra)
+        }, f, indent=2)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    print(f"✅ Prepared {len(df):,} rows from {path} -> {out_dir}")
+    return out_dir
+
+
+def load_dataset(path: str, feature_columns: Sequence[str] = FEATURE_COLUMNS,
+                 prepared_dir: str = DEFAULT_PREPARED_DIR) -> PreparedDataset:
+    """Memory-map the prepared copy of a source file, preparing it first if needed."""
+    return PreparedDataset(prepare_dataset(path, feature_columns, prepared_dir))
+
+
+def load_recorded_dataset(path: str, key: str, feature_columns: Sequence[str] = FEATURE_COLUMNS,
+                          prepared_dir: str = DEFAULT_PREPARED_DIR) -> PreparedDataset:
+    """
+    Memory-map a source as it was when `key` (its source_key) was recorded. The prepared
+    copy is used even if the source has since been edited or deleted; without one, the
+    source is prepared again only if it still hashes to `key`.
+    """
+    directory = prepared_path(path, key, prepared_dir)
+    if os.path.exists(os.path.join(directory, META_FILENAME)):
+        return PreparedDataset(directory)
+    if not os.path.exists(path):
+        raise ValueError(f"{path} is gone and has no prepared copy in {directory}")
+    if source_key(path, feature_columns) != key:
+        raise ValueError(f"{path} has changed since it was recorded and has no prepared copy in {directory}")
+    return PreparedDataset(prepare_dataset(path, feature_columns, prepared_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert xlsx/CSV/Parquet datasets into cached .npy arrays")
+    parser.add_argument("sources", nargs="+", help="Source files, e.g. data/train.xlsx data/validation.xlsx")
+    parser.add_argument("--out", default=DEFAULT_PREPARED_DIR, help="Prepared data directory")
+    parser.add_argument("--force", action="store_true", help="Prepare again even if an up-to-date copy exists")
+    args = parser.parse_args()
+
+    for source in args.sources:
+        out_dir = prepare_dataset(source, prepared_dir=args.out, force=args.force)
+        print(f"   {source}: {len(PreparedDataset(out_dir)):,} rows in {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,50 +2,180 @@
 Direct Python service for price prediction, features extraction, and amenities.
 Replaces HTTP calls for cloud-safe Streamlit deployment.
 """
-import joblib
 import numpy as np
 import os
-from typing import Dict, List
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
 import streamlit as st
-from feature_extractor import extract_all_features
+from batch_predictor import FEATURE_COLUMNS, properties_to_matrix, resolve_zipcode
+from feature_extractor import DEFAULT_FEATURES, extract_all_features_concurrent
 from nearby_amenities import get_nearby_amenities as get_amenities_data
+from model_store import load_neighbourhood_index as load_neighbourhood_artifact
+from model_store import load_price_model as load_model_artifact
 
 
 # ✅ Load pre-trained model
 @st.cache_resource
 def load_price_model():
-    """Load the pre-trained price prediction model"""
+    """Load the pre-trained price prediction model (memory-mapped flat arrays when available)"""
     try:
-        model_path = os.path.join(os.path.dirname(__file__), "model", "price_model.pkl")
-        if os.path.exists(model_path):
-            return joblib.load(model_path)
+        return load_model_artifact(os.path.join(os.path.dirname(__file__), "model"))
     except Exception as e:
         st.warning(f"Could not load model: {e}")
     return None
 
 
+@st.cache_resource
+def load_neighbourhood_index():
+    """Load the KD-tree used for sqft_living15 / sqft_lot15 (None if it has not been built)"""
+    try:
+        return load_neighbourhood_artifact(os.path.join(os.path.dirname(__file__), "model"))
+    except Exception as e:
+        st.warning(f"Could not load neighbourhood index: {e}")
+    return None
+
+
+class _PartialFeatures(Exception):
+    """Raised inside the cached lookup so partial results are returned but not cached."""
+
+    def __init__(self, features: Dict):
+        super().__init__("partial features")
+        self.features = features
+
+
+# Comparison views gather features for every location at once
+MAX_COMPARISON_LOCATIONS = 25
+_comparison_executor = ThreadPoolExecutor(max_workers=MAX_COMPARISON_LOCATIONS, thread_name_prefix="comparison")
+
+# Per-source fetch times of the last extraction on this thread (left empty by cache hits)
+_fetch_timings = threading.local()
+
+
+def _location_features(lat: float, lon: float) -> Tuple[Dict, bool]:
+    """Extract features for a location; returns (features, partial)."""
+    features = extract_all_features_concurrent(lat, lon) or {}
+    _fetch_timings.source_seconds = features.get("source_seconds", {})
+    result = {name: features.get(name, default) for name, default in DEFAULT_FEATURES.items()}
+    return result, bool(features.get("partial"))
+
+
 @st.cache_data(ttl=3600, max_entries=128)
+def _get_complete_features(lat: float, lon: float) -> Dict:
+    result, partial = _location_features(lat, lon)
+    if partial:
+        raise _PartialFeatures(result)
+    return result
+
+
+def _cached_features(lat: float, lon: float) -> Dict:
+    """Features through the st.cache_data lookup; partial results are returned uncached."""
+    try:
+        return _get_complete_features(lat, lon)
+    except _PartialFeatures as e:
+        return e.features
+
+
 def get_features(lat: float, lon: float) -> Dict:
     """Cached wrapper: return satellite features (NDVI, NDWI, road density, zipcode).
 
-    Caching reduces repeated API calls for the same location.
+    Caching reduces repeated API calls for the same location. Underneath this
+    per-session cache, feature extraction also uses the persistent on-disk
+    feature cache shared with the FastAPI backend (see feature_cache.py).
+    Results where a source missed its deadline are returned but not cached.
     """
     try:
-        features = extract_all_features(lat, lon) or {}
-        return {
-            "ndvi": features.get("ndvi", 0.0),
-            "ndwi": features.get("ndwi", 0.0),
-            "road_density": features.get("road_density", 0.3),
-            "zipcode": features.get("zipcode", "98178")  # Default Seattle zipcode
-        }
+        return _cached_features(lat, lon)
     except Exception as e:
         st.warning(f"Could not fetch satellite features: {e}")
-        return {
-            "ndvi": 0.0,
-            "ndwi": 0.0,
-            "road_density": 0.3,
-            "zipcode": "98178"  # Ensure zipcode is always returned
-        }
+        return dict(DEFAULT_FEATURES)
+
+
+def iter_location_features(locations: List[Dict]) -> Iterator[Tuple[int, Dict]]:
+    """
+    Gather features for many {lat, lon} locations concurrently, yielding
+    (position, features) pairs in completion order so callers can render
+    each location as soon as it is ready. Each lookup goes through the same
+    st.cache_data cache as get_features, so reruns reuse gathered features.
+    """
+    futures = {
+        _comparison_executor.submit(_cached_features, loc["lat"], loc["lon"]): i
+        for i, loc in enumerate(locations)
+    }
+    for future in as_completed(futures):
+        try:
+            features = future.result()
+        except Exception as e:
+            print(f"Could not fetch features for location {futures[future]}: {e}")
+            features = dict(DEFAULT_FEATURES)
+        yield futures[future], features
+
+
+def build_feature_matrix(properties: List[Dict], location_features: List[Dict]) -> np.ndarray:
+    """
+    Model feature matrix (FEATURE_COLUMNS order) for property specs with
+    bedrooms, bathrooms, sqft_living, lat and lon plus any PROPERTY_DEFAULTS
+    keys, and the matching location features.
+    """
+    return properties_to_matrix(properties, location_features, FEATURE_COLUMNS, load_neighbourhood_index())
+
+
+def predict_prices_batch(properties: List[Dict], location_features: List[Dict]) -> np.ndarray:
+    """Score many properties with a single model.predict call (see build_feature_matrix)."""
+    model = load_price_model()
+    if model is None:
+        raise RuntimeError("Model not available")
+    return np.asarray(model.predict(build_feature_matrix(properties, location_features)), dtype=np.float64)
+
+
+@contextmanager
+def _stage(timings: Dict, name: str):
+    """Record the wall time of a pipeline stage in milliseconds."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def _explain(bedrooms, bathrooms, sqft_living, location_features: Dict, predicted_price: float):
+    """Human-readable explanation and location context for a prediction."""
+    reasons = []
+    
+    # Property features
+    if bedrooms >= 3:
+        reasons.append(f"{int(bedrooms)} bedrooms add value")
+    if bathrooms >= 2:
+        reasons.append(f"{bathrooms} bathrooms increase desirability")
+    if sqft_living > 1500:
+        reasons.append(f"Large living area ({int(sqft_living)} sqft) adds premium")
+    elif sqft_living < 800:
+        reasons.append("Smaller property reduces price")
+    
+    # Location features
+    ndvi = location_features.get("ndvi", 0)
+    ndwi = location_features.get("ndwi", 0)
+    road_density = location_features.get("road_density", 0.3)
+    
+    if ndvi > 0.3:
+        reasons.append("Green, park-like neighborhood increases value")
+    if ndwi > 0.2:
+        reasons.append("Water proximity adds premium")
+    if road_density > 0.6:
+        reasons.append("Excellent connectivity boosts price")
+    
+    explanation = " + ".join(reasons) if reasons else "Premium location"
+    
+    # Location context
+    location_context = "Premium area" if predicted_price > 800000 else "Standard area"
+    if ndvi > 0.3:
+        location_context += " with excellent greenery"
+    if road_density > 0.6:
+        location_context += " and great connectivity"
+    
+    return explanation, location_context
 
 
 def predict_price(bedrooms: int, bathrooms: float, sqft_living: int, lat: float, lon: float, 
@@ -56,6 +186,12 @@ def predict_price(bedrooms: int, bathrooms: float, sqft_living: int, lat: float,
     """
     Predict property price based on features.
     
+    Runs as a pipeline: location features are resolved once and feed both the
+    model input and the explanation. Per-stage wall times in milliseconds
+    (feature_fetch, model, explanation, total) are returned as `timings`. When
+    features were fetched rather than cached, the concurrent sources inside
+    feature_fetch (satellite, road_density, zipcode) are reported too.
+    
     Args:
         bedrooms: Number of bedrooms
         bathrooms: Number of bathrooms
@@ -75,8 +211,10 @@ def predict_price(bedrooms: int, bathrooms: float, sqft_living: int, lat: float,
         zipcode: ZIP code of the property
         
     Returns:
-        Dict with: predicted_price, explanation, location_context, features
+        Dict with: predicted_price, explanation, location_context, features, timings
     """
+    timings = {}
+    started = time.perf_counter()
     try:
         model = load_price_model()
         
@@ -89,81 +227,47 @@ def predict_price(bedrooms: int, bathrooms: float, sqft_living: int, lat: float,
                     "bedrooms": bedrooms,
                     "bathrooms": bathrooms,
                     "sqft_living": sqft_living
-                }
+                },
+                "timings": timings
             }
         
-        # Get location features including zipcode
-        location_features = get_features(lat, lon)
-        
-        # Use provided zipcode or fall back to extracted one
-        zipcode = zipcode or location_features.get('zipcode', '98178')
-        
-        # Set default for sqft_above if not provided
-        if sqft_above is None:
-            sqft_above = sqft_living  # Default to living area if not specified
-            
-        # Prepare all features in the exact order expected by the model
-        feature_values = [
-            float(bedrooms),
-            float(bathrooms),
-            float(sqft_living),
-            float(sqft_lot),
-            float(floors),
-            float(waterfront),
-            float(view),
-            float(condition),
-            float(grade),
-            float(sqft_above),
-            float(sqft_basement),
-            float(yr_built),
-            float(yr_renovated),
-            float(zipcode) if zipcode and zipcode.isdigit() else 98178,  # Use provided zipcode or default
-            float(lat),
-            float(lon),
-            float(sqft_living),  # sqft_living15 (same as sqft_living for now)
-            float(sqft_lot)      # sqft_lot15 (same as sqft_lot for now)
-        ]
-        
-        X = np.array([feature_values], dtype=np.float64)
-        predicted_price = float(model.predict(X)[0])
-        
-        # Generate explanation
-        reasons = []
-        
-        # Property features
-        if bedrooms >= 3:
-            reasons.append(f"{int(bedrooms)} bedrooms add value")
-        if bathrooms >= 2:
-            reasons.append(f"{bathrooms} bathrooms increase desirability")
-        if sqft_living > 1500:
-            reasons.append(f"Large living area ({int(sqft_living)} sqft) adds premium")
-        elif sqft_living < 800:
-            reasons.append("Smaller property reduces price")
-        
-        # Get location features for explanation
-        location_features = get_features(lat, lon) or {}
+        # Stage 1: location features (satellite indices, road density and zipcode, fetched concurrently)
+        _fetch_timings.source_seconds = {}
+        with _stage(timings, "feature_fetch"):
+            location_features = get_features(lat, lon) or {}
+        for source, seconds in _fetch_timings.source_seconds.items():
+            timings[source] = round(seconds * 1000, 2)
+        zipcode = resolve_zipcode(zipcode, location_features)
         
-        # Location features
-        ndvi = location_features.get("ndvi", 0)
-        ndwi = location_features.get("ndwi", 0)
-        road_density = location_features.get("road_density", 0.3)
-        
-        if ndvi > 0.3:
-            reasons.append("Green, park-like neighborhood increases value")
-        if ndwi > 0.2:
-            reasons.append("Water proximity adds premium")
-        if road_density > 0.6:
-            reasons.append("Excellent connectivity boosts price")
-        
-        explanation = " + ".join(reasons) if reasons else "Premium location"
+        # Stage 2: assemble the model input in the exact feature order and predict
+        with _stage(timings, "model"):
+            X = build_feature_matrix([{
+                "bedrooms": bedrooms,
+                "bathrooms": bathrooms,
+                "sqft_living": sqft_living,
+                "lat": lat,
+                "lon": lon,
+                "sqft_lot": sqft_lot,
+                "floors": floors,
+                "waterfront": waterfront,
+                "view": view,
+                "condition": condition,
+                "grade": grade,
+                "sqft_above": sqft_above,
+                "sqft_basement": sqft_basement,
+                "yr_built": yr_built,
+                "yr_renovated": yr_renovated,
+                "zipcode": zipcode
+            }], [location_features])
+            predicted_price = float(model.predict(X)[0])
         
-        # Location context
-        location_context = "Premium area" if predicted_price > 800000 else "Standard area"
-        if ndvi > 0.3:
-            location_context += " with excellent greenery"
-        if road_density > 0.6:
-            location_context += " and great connectivity"
+        # Stage 3: explanation from the same location features
+        with _stage(timings, "explanation"):
+            explanation, location_context = _explain(
+                bedrooms, bathrooms, sqft_living, location_features, predicted_price
+            )
         
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
         return {
             "predicted_price": predicted_price,
             "explanation": explanation,
@@ -172,13 +276,16 @@ def predict_price(bedrooms: int, bathrooms: float, sqft_living: int, lat: float,
                 "bedrooms": bedrooms,
                 "bathrooms": bathrooms,
                 "sqft_living": sqft_living,
-                "ndvi": ndvi,
-                "ndwi": ndwi,
-                "road_density": road_density
-            }
+                "ndvi": location_features.get("ndvi", 0),
+                "ndwi": location_features.get("ndwi", 0),
+                "road_density": location_features.get("road_density", 0.3),
+                "zipcode": zipcode
+            },
+            "timings": timings
         }
     
     except Exception as e:
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
         return {
             "predicted_price": 500000,
             "explanation": f"Could not calculate: {str(e)}",
@@ -187,10 +294,9 @@ def predict_price(bedrooms: int, bathrooms: float, sqft_living: int, lat: float,
                 "bedrooms": bedrooms,
                 "bathrooms": bathrooms,
                 "sqft_living": sqft_living,
-                "ndvi": 0.0,
-                "ndwi": 0.0,
-                "road_density": 0.3
-            }
+                **DEFAULT_FEATURES
+            },
+            "timings": timings
         }
 
 
@@ -0,0 +1,221 @@
+"""
+Precomputed regional NDVI/NDWI rasters with O(1) point lookups.
+
+A batch job pulls Sentinel-2 bands for the whole training region (the bounding box
+of the lat/long columns in data/train.xlsx) tile by tile and stores per-pixel NDVI
+and NDWI at ~10 m resolution as flat float32 files. Lookups memory-map those files
+and average the same ±TILE_HALF_SIZE window that a live per-point request would
+cover, so scoring properties inside the region needs no network calls.
+
+Usage:
+    python regional_raster.py build [--train data/train.xlsx] [--out rasters]
+"""
+import argparse
+import json
+import math
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from geo_utils import bbox_offsets
+
+DEFAULT_RASTER_DIR = os.getenv(
+    "REGIONAL_RASTER_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "rasters")
+)
+META_FILENAME = "raster.json"
+LAYERS = ("ndvi", "ndwi")
+RESOLUTION_METERS = 10
+# Sentinel Hub caps a single request at 2500 x 2500 px
+TILE_PIXELS = 2000
+# Same half-width as feature_extractor.TILE_HALF_SIZE
+WINDOW_HALF_SIZE = 0.002
+
+
+def region_bounds_from_training(train_path: str = os.path.join("data", "train.xlsx"),
+                                margin: float = 0.01) -> Tuple[float, float, float, float]:
+    """Return (min_lat, min_lon, max_lat, max_lon) of the training coordinates plus a margin in degrees."""
+    import pandas as pd
+
+    df = pd.read_excel(train_path, usecols=["lat", "long"])
+    return (
+        float(df["lat"].min()) - margin,
+        float(df["long"].min()) - margin,
+        float(df["lat"].max()) + margin,
+        float(df["long"].max()) + margin,
+    )
+
+
+class RegionalRaster:
+    """
+    Memory-mapped NDVI/NDWI rasters over a lat/lon grid.
+
+    Row 0 is the northern edge (max_lat) and column 0 the western edge (min_lon),
+    matching the orientation of Sentinel Hub image tiles.
+    """
+
+    def __init__(self, directory: str, meta: Dict, layers: Dict[str, np.ndarray]):
+        self.directory = directory
+        self.meta = meta
+        self.layers = layers
+        self.min_lat, self.min_lon, self.max_lat, self.max_lon = meta["bounds"]
+        self.lat_step = meta["lat_step"]
+        self.lon_step = meta["lon_step"]
+        self.shape = tuple(meta["shape"])
+
+    @classmethod
+    def load(cls, directory: str = DEFAULT_RASTER_DIR) -> "RegionalRaster":
+        with open(os.path.join(directory, META_FILENAME)) as f:
+            meta = json.load(f)
+        shape = tuple(meta["shape"])
+        layers = {
+            name: np.memmap(os.path.join(directory, f"{name}.f32"), dtype=np.float32, mode="r", shape=shape)
+            for name in LAYERS
+        }
+        return cls(directory, meta, layers)
+
+    def window(self, lat: float, lon: float, half_size: float = WINDOW_HALF_SIZE):
+        """Return (row0, row1, col0, col1) for the window around a point, or None if it leaves the region."""
+        row0 = int(math.floor((self.max_lat - (lat + half_size)) / self.lat_step))
+        row1 = int(math.ceil((self.max_lat - (lat - half_size)) / self.lat_step))
+        col0 = int(math.floor((lon - half_size - self.min_lon) / self.lon_step))
+        col1 = int(math.ceil((lon + half_size - self.min_lon) / self.lon_step))
+        if row0 < 0 or col0 < 0 or row1 > self.shape[0] or col1 > self.shape[1]:
+            return None
+        return row0, row1, col0, col1
+
+    def lookup(self, lat: float, lon: float, half_size: float = WINDOW_HALF_SIZE) -> Optional[Dict[str, float]]:
+        """
+        Mean NDVI/NDWI over the window around a point, or None if the point is
+        outside the region or its tile has not been built yet.
+        """
+        bounds = self.window(lat, lon, half_size)
+        if bounds is None:
+            return None
+        row0, row1, col0, col1 = bounds
+
+        result = {}
+        for name in LAYERS:
+            values = self.layers[name][row0:row1, col0:col1]
+            if values.size == 0 or np.isnan(values).any():
+                return None
+            result[name] = float(values.mean(dtype=np.float64))
+        return result
+
+
+def build_rasters(out_dir: str = DEFAULT_RASTER_DIR, bounds: Optional[Tuple[float, float, float, float]] = None,
+                  train_path: str = os.path.join("data", "train.xlsx"), tile_pixels: int = TILE_PIXELS,
+                  time_interval=None):
+    """
+    Fetch the region tile by tile and write ndvi.f32 / ndwi.f32 plus raster.json into out_dir.
+
+    Completed tiles are recorded in raster.json, so an interrupted build resumes
+    where it stopped when run again with the same bounds.
+    """
+    from feature_extractor import DEFAULT_TIME_INTERVAL, fetch_bands_bbox, ndvi_pixels, ndwi_pixels
+
+    time_interval = tuple(time_interval or DEFAULT_TIME_INTERVAL)
+    bounds = tuple(bounds or region_bounds_from_training(train_path))
+    min_lat, min_lon, max_lat, max_lon = bounds
+    mid_lat = (min_lat + max_lat) / 2
+    lat_step, lon_step = (float(step) for step in bbox_offsets(mid_lat, RESOLUTION_METERS))
+    shape = (int(math.ceil((max_lat - min_lat) / lat_step)), int(math.ceil((max_lon - min_lon) / lon_step)))
+
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, META_FILENAME)
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if tuple(meta["bounds"]) != bounds or tuple(meta["shape"]) != shape:
+            print("⚠️  Existing rasters cover a different region; rebuilding from scratch")
+            meta = None
+    if meta is None:
+        meta = {
+            "bounds": list(bounds),
+            "lat_step": lat_step,
+            "lon_step": lon_step,
+            "shape": list(shape),
+            "time_interval": list(time_interval),
+            "completed_tiles": []
+        }
+        for name in LAYERS:
+            layer = np.memmap(os.path.join(out_dir, f"{name}.f32"), dtype=np.float32, mode="w+", shape=shape)
+            layer[:] = np.nan
+            layer.flush()
+            del layer
+
+    layers = {
+        name: np.memmap(os.path.join(out_dir, f"{name}.f32"), dtype=np.float32, mode="r+", shape=shape)
+        for name in LAYERS
+    }
+    completed = {tuple(tile) for tile in meta["completed_tiles"]}
+    tiles = [(row, col) for row in range(0, shape[0], tile_pixels) for col in range(0, shape[1], tile_pixels)]
+    print(f"🛰️  Region {bounds} -> {shape[0]} x {shape[1]} px in {len(tiles)} tiles ({len(completed)} already done)")
+
+    for i, (row, col) in enumerate(tiles, start=1):
+        if (row, col) in completed:
+            continue
+        height = min(tile_pixels, shape[0] - row)
+        width = min(tile_pixels, shape[1] - col)
+        bbox = [
+            min_lon + col * lon_step,
+            max_lat - (row + height) * lat_step,
+            min_lon + (col + width) * lon_step,
+            max_lat - row * lat_step,
+        ]
+        bands = fetch_bands_bbox(bbox, (width, height), time_interval)
+        layers["ndvi"][row:row + height, col:col + width] = ndvi_pixels(bands)
+        layers["ndwi"][row:row + height, col:col + width] = ndwi_pixels(bands)
+        for layer in layers.values():
+            layer.flush()
+
+        meta["completed_tiles"].append([row, col])
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        print(f"   tile {i}/{len(tiles)} done")
+
+    print(f"✅ Rasters written to {out_dir}")
+    return out_dir
+
+
+_regional_raster = None
+_regional_raster_loaded = False
+_regional_raster_lock = threading.Lock()
+
+
+def get_regional_raster() -> Optional[RegionalRaster]:
+    """Process-wide raster from REGIONAL_RASTER_DIR, or None if no rasters have been built."""
+    global _regional_raster, _regional_raster_loaded
+    if not _regional_raster_loaded:
+        with _regional_raster_lock:
+            if not _regional_raster_loaded:
+                if os.path.exists(os.path.join(DEFAULT_RASTER_DIR, META_FILENAME)):
+                    try:
+                        _regional_raster = RegionalRaster.load(DEFAULT_RASTER_DIR)
+                    except Exception as e:
+                        print(f"Could not load regional rasters: {e}")
+                _regional_raster_loaded = True
+    return _regional_raster
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regional NDVI/NDWI raster builder")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Fetch the training region and write the rasters")
+    build_parser.add_argument("--train", default=os.path.join("data", "train.xlsx"),
+                              help="Training file whose lat/long columns define the region")
+    build_parser.add_argument("--out", default=DEFAULT_RASTER_DIR, help="Output directory")
+    build_parser.add_argument("--tile-pixels", type=int, default=TILE_PIXELS, help="Pixels per request side")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_rasters(args.out, train_path=args.train, tile_pixels=args.tile_pixels)
+
+
+if __name__ == "__main__":
+    main()
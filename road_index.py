@@ -0,0 +1,252 @@
+"""
+Offline road-network index for road density lookups.
+
+Road segments from an OSM extract (a .osm.pbf file, read with the optional
+`osmium` package, or an Overpass `out geom` JSON dump) are binned once by
+midpoint into a regular grid of road length per cell. A summed-area table over
+that grid answers "total road length inside this bbox" with four array reads, so
+road density for any point and radius, or for whole arrays of points, is
+computed locally without the public Overpass server.
+
+Usage:
+    python road_index.py download --out data/roads.json
+    python road_index.py build data/roads.json --out road_index
+"""
+import argparse
+import json
+import os
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+from geo_utils import METERS_PER_DEGREE, bbox_offsets, haversine_km, pack_way_geometry, way_segments
+
+DEFAULT_INDEX_DIR = os.getenv(
+    "ROAD_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "road_index")
+)
+META_FILENAME = "road_index.json"
+DEFAULT_CELL_METERS = 50
+
+# Road classes counted by get_road_density
+HIGHWAY_TYPES = (
+    "primary", "secondary", "tertiary", "residential",
+    "unclassified", "service", "trunk", "motorway"
+)
+HIGHWAY_FILTER = f'way["highway"~"^({"|".join(HIGHWAY_TYPES)})$"]'
+
+
+def density_from_length(total_length_km, lat, lat_offset, lon_offset):
+    """
+    Normalize total road length in a bbox to the 0-1 road density score
+    (km/km², where ~20 km/km² counts as maximum density).
+    """
+    area_km2 = (2 * lat_offset * 111) * (2 * lon_offset * 111 * np.cos(np.radians(lat)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        density = np.where(area_km2 > 0, total_length_km / area_km2, 0.0)
+    return np.minimum(density / 20.0, 1.0)
+
+
+def segments_from_overpass(elements):
+    """Return (lat1, lon1, lat2, lon2) arrays for every consecutive node pair of the ways in an Overpass response."""
+    return way_segments(*pack_way_geometry(elements))
+
+
+def segments_from_pbf(path):
+    """Return (lat1, lon1, lat2, lon2) arrays for the road ways of an OSM PBF extract (requires `osmium`)."""
+    try:
+        import osmium
+    except ImportError:
+        raise ImportError("Reading .osm.pbf files requires the 'osmium' package (pip install osmium)")
+
+    highway_types = set(HIGHWAY_TYPES)
+    starts, ends = [], []
+
+    class RoadHandler(osmium.SimpleHandler):
+        def way(self, way):
+            if way.tags.get("highway") not in highway_types:
+                return
+            coords = [(node.lat, node.lon) for node in way.nodes if node.location.valid()]
+            if len(coords) > 1:
+                starts.extend(coords[:-1])
+                ends.extend(coords[1:])
+
+    RoadHandler().apply_file(path, locations=True)
+    starts = np.array(starts, dtype=np.float64).reshape(-1, 2)
+    ends = np.array(ends, dtype=np.float64).reshape(-1, 2)
+    return starts[:, 0], starts[:, 1], ends[:, 0], ends[:, 1]
+
+
+class RoadIndex:
+    """
+    Summed-area table of road length (km) over a lat/lon grid.
+
+    `table[r, c]` is the total length of segments whose midpoint lies in cells
+    [0, r) x [0, c); row 0 is the southern edge (min_lat) and column 0 the
+    western edge (min_lon).
+    """
+
+    def __init__(self, table: np.ndarray, min_lat: float, min_lon: float, lat_step: float, lon_step: float):
+        self.table = table
+        self.min_lat = min_lat
+        self.min_lon = min_lon
+        self.lat_step = lat_step
+        self.lon_step = lon_step
+        self.rows = table.shape[0] - 1
+        self.cols = table.shape[1] - 1
+        self.max_lat = min_lat + self.rows * lat_step
+        self.max_lon = min_lon + self.cols * lon_step
+
+    @classmethod
+    def from_segments(cls, lat1, lon1, lat2, lon2, cell_meters: float = DEFAULT_CELL_METERS,
+                      bounds: Optional[Tuple[float, float, float, float]] = None) -> "RoadIndex":
+        """Bin segments by midpoint into cell_meters cells covering bounds (default: the segments' extent)."""
+        lengths = haversine_km(lat1, lon1, lat2, lon2)
+        mid_lat = (np.asarray(lat1) + np.asarray(lat2)) / 2
+        mid_lon = (np.asarray(lon1) + np.asarray(lon2)) / 2
+
+        if bounds is None:
+            bounds = (mid_lat.min(), mid_lon.min(), mid_lat.max(), mid_lon.max())
+        min_lat, min_lon, max_lat, max_lon = bounds
+        lat_step = cell_meters / METERS_PER_DEGREE
+        lon_step = cell_meters / (METERS_PER_DEGREE * np.cos(np.radians((min_lat + max_lat) / 2)))
+        rows = int(np.ceil((max_lat - min_lat) / lat_step)) + 1
+        cols = int(np.ceil((max_lon - min_lon) / lon_step)) + 1
+
+        row = np.floor((mid_lat - min_lat) / lat_step).astype(np.int64)
+        col = np.floor((mid_lon - min_lon) / lon_step).astype(np.int64)
+        inside = (row >= 0) & (row < rows) & (col >= 0) & (col < cols)
+        grid = np.bincount(row[inside] * cols + col[inside], weights=lengths[inside], minlength=rows * cols)
+
+        table = np.zeros((rows + 1, cols + 1), dtype=np.float64)
+        table[1:, 1:] = grid.reshape(rows, cols).cumsum(axis=0).cumsum(axis=1)
+        return cls(table, float(min_lat), float(min_lon), float(lat_step), float(lon_step))
+
+    def save(self, directory: str = DEFAULT_INDEX_DIR):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "table.npy"), self.table)
+        with open(os.path.join(directory, META_FILENAME), "w") as f:
+            json.dump({
+                "min_lat": self.min_lat,
+                "min_lon": self.min_lon,
+                "lat_step": self.lat_step,
+                "lon_step": self.lon_step
+            }, f)
+
+    @classmethod
+    def load(cls, directory: str = DEFAULT_INDEX_DIR, mmap_mode: Optional[str] = "r") -> "RoadIndex":
+        with open(os.path.join(directory, META_FILENAME)) as f:
+            meta = json.load(f)
+        table = np.load(os.path.join(directory, "table.npy"), mmap_mode=mmap_mode)
+        return cls(table, meta["min_lat"], meta["min_lon"], meta["lat_step"], meta["lon_step"])
+
+    def covers(self, lat, lon, radius_meters: float = 500):
+        """True where the bbox around each point lies inside the indexed area."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        lat_offset, lon_offset = bbox_offsets(lat, radius_meters)
+        return ((lat - lat_offset >= self.min_lat) & (lat + lat_offset <= self.max_lat) &
+                (lon - lon_offset >= self.min_lon) & (lon + lon_offset <= self.max_lon))
+
+    def road_length_km(self, lat, lon, radius_meters: float = 500):
+        """Total road length (km) in the square bbox around each point, vectorized over arrays of points."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        lat_offset, lon_offset = bbox_offsets(lat, radius_meters)
+
+        # Snap the bbox edges to the nearest cell boundaries
+        r0 = np.clip(np.rint((lat - lat_offset - self.min_lat) / self.lat_step), 0, self.rows).astype(np.int64)
+        r1 = np.clip(np.rint((lat + lat_offset - self.min_lat) / self.lat_step), 0, self.rows).astype(np.int64)
+        c0 = np.clip(np.rint((lon - lon_offset - self.min_lon) / self.lon_step), 0, self.cols).astype(np.int64)
+        c1 = np.clip(np.rint((lon + lon_offset - self.min_lon) / self.lon_step), 0, self.cols).astype(np.int64)
+
+        table = self.table
+        return table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0]
+
+    def road_density(self, lat, lon, radius_meters: float = 500):
+        """Road density score (0-1) for each point, same normalization as feature_extractor.get_road_density."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lat_offset, lon_offset = bbox_offsets(lat, radius_meters)
+        total_length = self.road_length_km(lat, lon, radius_meters)
+        return density_from_length(total_length, lat, lat_offset, lon_offset)
+
+
+def build_road_index(source_path: str, out_dir: str = DEFAULT_INDEX_DIR,
+                     cell_meters: float = DEFAULT_CELL_METERS) -> RoadIndex:
+    """Build and save a RoadIndex from an .osm.pbf extract or an Overpass JSON dump."""
+    if source_path.endswith(".pbf"):
+        segments = segments_from_pbf(source_path)
+    else:
+        with open(source_path) as f:
+            segments = segments_from_overpass(json.load(f).get("elements", []))
+
+    index = RoadIndex.from_segments(*segments, cell_meters=cell_meters)
+    index.save(out_dir)
+    print(f"✅ Indexed {len(segments[0]):,} road segments into a {index.rows} x {index.cols} grid -> {out_dir}")
+    return index
+
+
+def download_region_roads(out_path: str, train_path: str = os.path.join("data", "train.xlsx"),
+                          url: Optional[str] = None):
+    """Save an Overpass `out geom` dump of all indexed road classes over the training region."""
+    from http_clients import overpass_query
+    from regional_raster import region_bounds_from_training
+
+    min_lat, min_lon, max_lat, max_lon = region_bounds_from_training(train_path)
+    query = f"""
+    [out:json][timeout:900];
+    (
+      {HIGHWAY_FILTER}({min_lat},{min_lon},{max_lat},{max_lon});
+    );
+    out geom;
+    """
+    response = overpass_query(query, timeout=960, url=url)
+    response.raise_for_status()
+    with open(out_path, "wb") as f:
+        f.write(response.content)
+    print(f"✅ Saved road network for {min_lat:.3f},{min_lon:.3f},{max_lat:.3f},{max_lon:.3f} -> {out_path}")
+
+
+_road_index = None
+_road_index_loaded = False
+_road_index_lock = threading.Lock()
+
+
+def get_road_index() -> Optional[RoadIndex]:
+    """Process-wide RoadIndex from ROAD_INDEX_DIR, or None if no index has been built."""
+    global _road_index, _road_index_loaded
+    if not _road_index_loaded:
+        with _road_index_lock:
+            if not _road_index_loaded:
+                if os.path.exists(os.path.join(DEFAULT_INDEX_DIR, META_FILENAME)):
+                    try:
+                        _road_index = RoadIndex.load(DEFAULT_INDEX_DIR)
+                    except Exception as e:
+                        print(f"Could not load road index: {e}")
+                _road_index_loaded = True
+    return _road_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline road-network index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    download_parser = subparsers.add_parser("download", help="Dump the training region's roads from Overpass")
+    download_parser.add_argument("--out", default=os.path.join("data", "roads.json"))
+    download_parser.add_argument("--train", default=os.path.join("data", "train.xlsx"))
+
+    build_parser = subparsers.add_parser("build", help="Build the index from a .osm.pbf or Overpass JSON file")
+    build_parser.add_argument("source", help="OSM extract (.osm.pbf) or Overpass JSON dump")
+    build_parser.add_argument("--out", default=DEFAULT_INDEX_DIR)
+    build_parser.add_argument("--cell-size", type=float, default=DEFAULT_CELL_METERS, help="Grid cell size in metres")
+
+    args = parser.parse_args()
+    if args.command == "download":
+        download_region_roads(args.out, train_path=args.train)
+    elif args.command == "build":
+        build_road_index(args.source, args.out, cell_meters=args.cell_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Offline bulk scoring for large property files.
+
+Usage:
+    python score_tabular.py score data/test2.xlsx --output 24116063_final.csv
+
+Reads the input (xlsx, CSV or Parquet) in chunks, scores each chunk with
+the trained model (backend from `model/model.json`) across a process pool and appends `id,predicted_price`
+rows to the output as chunks finish. Memory stays bounded by the chunk size and
+the number of chunks in flight; xlsx inputs are converted once into the
+prepare_data.py cache and read back as memory maps. Progress is checkpointed next to the output so an
+interrupted run can be continued with `--resume`.
+"""
+import argparse
+import collections
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from batch_predictor import FEATURE_COLUMNS, frame_to_matrix
+from model_store import load_neighbourhood_index, load_price_model
+from prepare_data import load_dataset
+
+DEFAULT_MODEL_PATH = "model"
+DEFAULT_CHUNK_SIZE = 50000
+
+_worker_model = None
+
+
+def iter_input_chunks(path, chunk_size, skip_rows=0):
+    """Yield DataFrames of at most chunk_size rows from an xlsx, CSV or Parquet file, skipping the first skip_rows."""
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".csv":
+        reader = pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, skip_rows + 1))
+        for chunk in reader:
+            yield chunk
+
+    elif ext in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        to_skip = skip_rows
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            if to_skip >= batch.num_rows:
+                to_skip -= batch.num_rows
+                continue
+            if to_skip:
+                batch = batch.slice(to_skip)
+                to_skip = 0
+            yield batch.to_pandas()
+
+    elif ext in (".xlsx", ".xlsm"):
+        # Parsed once into the columnar cache (see prepare_data.py); chunks are slices of its memory maps
+        dataset = load_dataset(path)
+        for start in range(skip_rows, len(dataset), chunk_size):
+            yield dataset.frame(start, start + chunk_size)
+
+    else:
+        raise ValueError(f"Unsupported input format '{ext}' (expected .xlsx, .csv or .parquet)")
+
+
+def _model_dir(model_path):
+    """Model directory for --model, which may also name an artifact inside it (e.g. model/price_model.pkl)."""
+    return model_path if os.path.isdir(model_path) else os.path.dirname(os.path.abspath(model_path))
+
+
+def _init_worker(model_path):
+    """Load the model once per worker process."""
+    global _worker_model
+
+    # The sklearn estimator itself: large chunks are faster through it than through the flat engine
+    _worker_model = load_price_model(_model_dir(model_path), engine="sklearn")
+    if _worker_model is None:
+        raise FileNotFoundError(f"No trained model in {_model_dir(model_path)}")
+    # Parallelism comes from the process pool; keep each worker single-threaded and quiet
+    if hasattr(_worker_model, "n_jobs"):
+        _worker_model.n_jobs = 1
+    if hasattr(_worker_model, "verbose"):
+        _worker_model.verbose = 0
+
+
+def _score_chunk(ids, X):
+    """Score one chunk inside a worker process."""
+    return ids, _worker_model.predict(X)
+
+
+def _load_checkpoint(checkpoint_path, input_path):
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input") != os.path.abspath(input_path):
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to a different input: {checkpoint.get('input')}")
+    return checkpoint
+
+
+def _save_checkpoint(checkpoint_path, checkpoint):
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def score_file(input_path, output_path, model_path=DEFAULT_MODEL_PATH, chunk_size=DEFAULT_CHUNK_SIZE,
+               workers=None, resume=False):
+    """
+    Score input_path into output_path as id,predicted_price rows.
+
+    Returns the number of rows scored in this run.
+    """
+    workers = workers or os.cpu_count() or 1
+    # Inputs without sqft_living15 / sqft_lot15 get them from the index saved next to the model
+    neighbourhood_index = load_neighbourhood_index(_model_dir(model_path))
+    checkpoint_path = output_path + ".checkpoint.json"
+
+    checkpoint = _load_checkpoint(checkpoint_path, input_path) if resume else None
+    if checkpoint and (not os.path.exists(output_path) or
+                       os.path.getsize(output_path) < checkpoint["output_bytes"]):
+        # The rows the checkpoint counts as written are gone, so they have to be scored again
+        print(f"⚠️  {output_path} is missing or shorter than {checkpoint_path} records; starting over")
+        checkpoint = None
+    if checkpoint:
+        rows_done = checkpoint["rows_done"]
+        # Drop anything written after the last checkpoint (e.g. a partially flushed chunk)
+        with open(output_path, "r+b") as f:
+            f.truncate(checkpoint["output_bytes"])
+        out = open(output_path, "a", newline="")
+        print(f"⏩ Resuming from row {rows_done:,}")
+    else:
+        rows_done = 0
+        out = open(output_path, "w", newline="")
+        csv.writer(out, lineterminator="\n").writerow(["id", "predicted_price"])
+
+    writer = csv.writer(out, lineterminator="\n")
+    max_in_flight = workers * 2
+    started = time.perf_counter()
+    rows_scored = 0
+
+    def write_result(future):
+        nonlocal rows_done, rows_scored
+        ids, prices = future.result()
+        writer.writerows(zip(ids, prices.tolist()))
+        out.flush()
+        rows_done += len(ids)
+        rows_scored += len(ids)
+        _save_checkpoint(checkpoint_path, {
+            "input": os.path.abspath(input_path),
+            "rows_done": rows_done,
+            "output_bytes": out.tell()
+        })
+        elapsed = time.perf_counter() - started
+        print(f"   {rows_done:,} rows scored ({rows_scored / elapsed:,.0f} rows/sec)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+            pending = collections.deque()
+            next_row = rows_done
+            for chunk in iter_input_chunks(input_path, chunk_size, skip_rows=rows_done):
+                X = frame_to_matrix(chunk, FEATURE_COLUMNS, neighbourhood_index)
+                if "id" in chunk.columns:
+                    ids = chunk["id"].tolist()
+                else:
+                    ids = list(range(next_row, next_row + len(chunk)))
+                next_row += len(chunk)
+                pending.append(pool.submit(_score_chunk, ids, X))
+
+                # Write in input order and keep a bounded number of chunks in memory
+                while len(pending) >= max_in_flight or (pending and pending[0].done()):
+                    write_result(pending.popleft())
+
+            while pending:
+                write_result(pending.popleft())
+    finally:
+        out.close()
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    elapsed = time.perf_counter() - started
+    rate = rows_scored / elapsed if elapsed > 0 else float("inf")
+    print(f"✅ Scored {rows_scored:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/sec) -> {output_path}")
+    return rows_scored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk property price scoring")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    score_parser = subparsers.add_parser("score", help="Score an xlsx, CSV or Parquet file")
+    score_parser.add_argument("input", help="Input file with the 18 feature columns (and optionally id)")
+    score_parser.add_argument("--output", "-o", default="predictions.csv", help="Output CSV (id,predicted_price)")
+    score_parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Trained model directory")
+    score_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    score_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    score_parser.add_argument("--resume", action="store_true", help="Continue from the output's checkpoint")
+
+    args = parser.parse_args()
+    if args.command == "score":
+        score_file(args.input, args.output, model_path=args.model, chunk_size=args.chunk_size,
+                   workers=args.workers, resume=args.resume)
+
+
+if __name__ == "__main__":
+    main()
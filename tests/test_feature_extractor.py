@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import feature_extractor
+from feature_extractor import DEFAULT_FEATURES, extract_all_features_async, extract_all_features_concurrent
+
+SATELLITE = {"ndvi": 0.42, "ndwi": -0.1}
+
+
+def satellite(lat, lon):
+    return dict(SATELLITE)
+
+
+def road_density_down(lat, lon, radius_meters=500):
+    raise RuntimeError("Overpass API error: 504")
+
+
+def slow_zipcode(lat, lon):
+    time.sleep(0.5)
+    return "98101"
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    """Replace the three network sources with local stubs (a working, a failing and a slow one)."""
+    monkeypatch.setattr(feature_extractor, "get_satellite_indices", satellite)
+    monkeypatch.setattr(feature_extractor, "_cached_road_density", road_density_down)
+    monkeypatch.setattr(feature_extractor, "get_zipcode", slow_zipcode)
+
+    async def satellite_async(lat, lon):
+        return satellite(lat, lon)
+
+    async def road_density_down_async(lat, lon, radius_meters=500):
+        return road_density_down(lat, lon, radius_meters)
+
+    async def slow_zipcode_async(lat, lon):
+        await asyncio.sleep(0.5)
+        return "98101"
+
+    monkeypatch.setattr(feature_extractor, "get_satellite_indices_async", satellite_async)
+    monkeypatch.setattr(feature_extractor, "_cached_road_density_async", road_density_down_async)
+    monkeypatch.setattr(feature_extractor, "get_zipcode_async", slow_zipcode_async)
+
+
+def check_partial_result(result):
+    assert result["ndvi"] == SATELLITE["ndvi"] and result["ndwi"] == SATELLITE["ndwi"]
+    assert result["road_density"] == DEFAULT_FEATURES["road_density"]
+    assert result["zipcode"] == DEFAULT_FEATURES["zipcode"]
+    assert result["partial"] and not result["success"]
+    assert result["failed"] == {"road_density": "Overpass API error: 504"}
+    assert result["timed_out"] == ["zipcode"]
+    # Timings for every source that finished by its deadline, failed or not
+    assert set(result["source_seconds"]) == {"satellite", "road_density"}
+    assert result["elapsed_seconds"] < 0.5
+
+
+def test_concurrent_extraction_reports_failed_and_timed_out_sources(sources):
+    check_partial_result(extract_all_features_concurrent(47.6, -122.3, deadlines={"zipcode": 0.1}))
+
+
+def test_async_extraction_reports_failed_and_timed_out_sources(sources):
+    result = asyncio.run(extract_all_features_async(47.6, -122.3, deadlines={"zipcode": 0.1}))
+    check_partial_result(result)
+
+
+class LateCallbackFuture(Future):
+    """A Future whose done-callbacks run well after waiters in result() have been woken."""
+
+    def _invoke_callbacks(self):
+        time.sleep(0.05)
+        super()._invoke_callbacks()
+
+
+class LateCallbackExecutor:
+    def submit(self, fn, *args):
+        future = LateCallbackFuture()
+
+        def run():
+            # Finish after the caller has started waiting
+            time.sleep(0.01)
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run).start()
+        return future
+
+
+def test_complete_extraction_times_every_source(monkeypatch):
+    monkeypatch.setattr(feature_extractor, "_fanout_executor", LateCallbackExecutor())
+    monkeypatch.setattr(feature_extractor, "get_satellite_indices", satellite)
+    monkeypatch.setattr(feature_extractor, "_cached_road_density", lambda lat, lon: 0.7)
+    monkeypatch.setattr(feature_extractor, "get_zipcode", lambda lat, lon: "98101")
+
+    result = extract_all_features_concurrent(47.6, -122.3)
+    assert result["success"] and not result["partial"]
+    assert set(result["source_seconds"]) == {"satellite", "road_density", "zipcode"}
+    assert (result["road_density"], result["zipcode"]) == (0.7, "98101")
+
+
+def test_get_road_density_falls_back_when_the_lookup_fails(monkeypatch, capsys):
+    monkeypatch.setattr(feature_extractor, "_cached_road_density", road_density_down)
+    assert feature_extractor.get_road_density(47.6, -122.3) == DEFAULT_FEATURES["road_density"]
+    assert "Overpass API error: 504" in capsys.readouterr().out
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from forest_engine import ENGINE_ENV_VAR, FlatForest, select_engine
+
+
+@pytest.fixture(scope="module")
+def forest_data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 6))
+    y = X[:, 0] * 3 + np.sin(X[:, 1]) * 2 + X[:, 2] * X[:, 3] + rng.normal(scale=0.1, size=600)
+    model = RandomForestRegressor(n_estimators=25, max_depth=10, random_state=0).fit(X, y)
+    X_test = np.vstack([X[:100], rng.normal(size=(200, 6)) * 2])
+    return model, X_test
+
+
+def test_flat_forest_matches_sklearn(forest_data):
+    model, X = forest_data
+    flat = FlatForest.from_sklearn(model)
+
+    np.testing.assert_allclose(flat.predict(X), model.predict(X), rtol=1e-12)
+    assert flat.n_trees == len(model.estimators_)
+
+
+def test_flat_forest_round_trips_through_mmap(forest_data, tmp_path):
+    model, X = forest_data
+    flat = FlatForest.from_sklearn(model)
+    flat.save(str(tmp_path))
+
+    loaded = FlatForest.load(str(tmp_path), mmap_mode="r")
+    np.testing.assert_array_equal(loaded.predict(X), flat.predict(X))
+
+
+def test_select_keeps_only_the_given_trees(forest_data):
+    model, X = forest_data
+    trees = [7, 2, 19]
+    selected = FlatForest.from_sklearn(model).select(trees)
+
+    expected = np.mean([model.estimators_[t].predict(X.astype(np.float32)) for t in trees], axis=0)
+    np.testing.assert_allclose(selected.predict(X), expected, rtol=1e-12)
+
+
+def test_compact_reaches_the_same_leaves(forest_data):
+    model, X = forest_data
+    flat = FlatForest.from_sklearn(model)
+    compact = flat.compact()
+
+    assert compact.relative_children
+    assert compact.threshold.dtype == np.float32
+    np.testing.assert_array_equal(compact.apply(X), flat.apply(X))
+    # float32 leaf values: compare at float32 resolution of the target scale
+    np.testing.assert_allclose(compact.predict(X), model.predict(X), rtol=1e-6, atol=1e-5)
+
+
+def test_compact_of_a_selection_matches_sklearn(forest_data, tmp_path):
+    model, X = forest_data
+    trees = [3, 11, 0, 24]
+    FlatForest.from_sklearn(model).select(trees).compact().save(str(tmp_path))
+    compact = FlatForest.load(str(tmp_path))
+
+    expected = np.mean([model.estimators_[t].predict(X.astype(np.float32)) for t in trees], axis=0)
+    np.testing.assert_allclose(compact.predict(X), expected, rtol=1e-6, atol=1e-5)
+
+
+def test_select_engine_defaults_to_the_flat_engine(forest_data, monkeypatch):
+    model, _ = forest_data
+    monkeypatch.delenv(ENGINE_ENV_VAR, raising=False)
+
+    assert isinstance(select_engine(model), FlatForest)
+    assert select_engine(model, "sklearn") is model
+    assert select_engine(model, "compact").relative_children
@@ -0,0 +1,61 @@
+import math
+
+import numpy as np
+
+from geo_utils import (
+    EARTH_RADIUS_KM, METERS_PER_DEGREE, bbox_offsets, haversine_km, pack_way_geometry, road_length_km, way_segments
+)
+
+
+def haversine_reference(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * math.asin(math.sqrt(a))
+
+
+def test_bbox_offsets_scalar():
+    lat_offset, lon_offset = bbox_offsets(0.0, 1110)
+    assert lat_offset == 1110 / METERS_PER_DEGREE
+    assert math.isclose(lon_offset, lat_offset)
+
+    lat_offset, lon_offset = bbox_offsets(60.0, 500)
+    assert math.isclose(lon_offset, 2 * lat_offset)
+
+
+def test_bbox_offsets_accepts_latitude_arrays():
+    lats = np.array([0.0, 47.6, -47.6, 60.0])
+    lat_offset, lon_offset = bbox_offsets(lats, 1000)
+    assert lon_offset.shape == lats.shape
+    np.testing.assert_allclose(lon_offset, [bbox_offsets(lat, 1000)[1] for lat in lats])
+    assert lon_offset[1] == lon_offset[2]
+
+
+def test_haversine_matches_the_scalar_formula():
+    rng = np.random.default_rng(0)
+    lat1, lat2 = rng.uniform(-80, 80, (2, 50))
+    lon1, lon2 = rng.uniform(-180, 180, (2, 50))
+
+    expected = [haversine_reference(*args) for args in zip(lat1, lon1, lat2, lon2)]
+    np.testing.assert_allclose(haversine_km(lat1, lon1, lat2, lon2), expected, rtol=1e-12)
+
+
+def test_haversine_known_distances():
+    # One degree of latitude, and a quarter of the equator
+    assert math.isclose(haversine_km(0.0, 0.0, 1.0, 0.0), EARTH_RADIUS_KM * math.pi / 180)
+    assert math.isclose(haversine_km(0.0, 0.0, 0.0, 90.0), EARTH_RADIUS_KM * math.pi / 2)
+    assert haversine_km(47.6, -122.3, 47.6, -122.3) == 0.0
+
+
+def test_road_length_does_not_join_consecutive_ways():
+    elements = [
+        {"geometry": [{"lat": 0.0, "lon": 0.0}, {"lat": 0.0, "lon": 0.01}]},
+        {"geometry": [{"lat": 0.0, "lon": 0.01}]},  # a single node is not a way
+        {"geometry": [{"lat": 1.0, "lon": 1.0}, {"lat": 1.01, "lon": 1.0}, {"lat": 1.02, "lon": 1.0}]},
+    ]
+    coords, way_offsets = pack_way_geometry(elements)
+    np.testing.assert_array_equal(way_offsets, [0, 2, 5])
+    assert len(way_segments(coords, way_offsets)[0]) == 3
+
+    expected = haversine_reference(0, 0, 0, 0.01) + 2 * haversine_reference(1.0, 1.0, 1.01, 1.0)
+    assert math.isclose(road_length_km(coords, way_offsets), expected, rel_tol=1e-9)
+    assert road_length_km(*pack_way_geometry([])) == 0.0
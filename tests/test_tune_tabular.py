@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from tune_tabular import choose_for_slo, pareto_ranks
+
+
+def test_pareto_ranks_peels_successive_fronts():
+    results = pd.DataFrame({
+        "r2": [0.90, 0.85, 0.80, 0.85, 0.70],
+        "latency_p99_ms": [3.0, 1.0, 0.5, 2.0, 2.5],
+        "flat_mb": [10.0, 5.0, 2.0, 6.0, 8.0],
+    })
+    # 0, 1 and 2 trade accuracy for speed and size; 3 is dominated by 1; 4 by 1 and 3
+    np.testing.assert_array_equal(pareto_ranks(results), [0, 0, 0, 1, 2])
+
+
+def test_pareto_ranks_keeps_ties_on_the_same_front():
+    results = pd.DataFrame({"r2": [0.8, 0.8], "latency_p99_ms": [1.0, 1.0], "flat_mb": [2.0, 2.0]})
+    np.testing.assert_array_equal(pareto_ranks(results), [0, 0])
+
+
+def test_pareto_ranks_uses_the_given_objectives():
+    results = pd.DataFrame({
+        "r2": [0.9, 0.8],
+        "latency_p50_ms": [1.0, 2.0],
+        "latency_p99_ms": [5.0, 1.0],
+        "flat_mb": [1.0, 1.0],
+    })
+    np.testing.assert_array_equal(pareto_ranks(results), [0, 0])
+    np.testing.assert_array_equal(pareto_ranks(results, {"r2": 1, "latency_p50_ms": -1, "flat_mb": -1}), [0, 1])
+
+
+def test_choose_for_slo_uses_the_serial_latency():
+    front = pd.DataFrame({
+        "candidate": [0, 1, 2],
+        "r2": [0.90, 0.85, 0.80],
+        "latency_p99_ms": [0.2, 0.2, 0.2],
+        "serial_latency_p99_ms": [2.0, 0.9, 0.4],
+    })
+    assert choose_for_slo(front, None)["candidate"] == 0
+    assert choose_for_slo(front, 1.0)["candidate"] == 1
+    # Nothing meets the SLO: the fastest candidate
+    assert choose_for_slo(front, 0.1)["candidate"] == 2
@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+
+from zipcode_index import ZipcodeIndex, polygons_from_geojson
+
+
+def ring(south, west, north, east):
+    """Closed (lon, lat) ring of a lat/lon rectangle."""
+    return [[west, south], [east, south], [east, north], [west, north], [west, south]]
+
+
+@pytest.fixture
+def index(tmp_path):
+    zcta = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                # A square with a square hole in the middle
+                "properties": {"ZCTA5CE20": "98101"},
+                "geometry": {"type": "Polygon", "coordinates": [
+                    ring(47.50, -122.40, 47.70, -122.20),
+                    ring(47.55, -122.35, 47.65, -122.25),
+                ]},
+            },
+            {
+                "properties": {"ZCTA5CE10": "98004"},
+                "geometry": {"type": "MultiPolygon", "coordinates": [
+                    [ring(47.60, -122.20, 47.64, -122.15)],
+                    [ring(47.58, -122.10, 47.60, -122.08)],
+                ]},
+            },
+        ],
+    }
+    path = tmp_path / "zcta.geojson"
+    path.write_text(json.dumps(zcta))
+
+    points = np.array([[47.60, -122.30], [47.00, -121.00]])
+    return ZipcodeIndex(points, np.array(["98102", "98022"]), *polygons_from_geojson(str(path)))
+
+
+def test_lookup_uses_the_containing_polygon(index):
+    assert index.lookup(47.52, -122.38) == "98101"
+    assert index.lookup(47.62, -122.17) == "98004"
+    # Second part of the MultiPolygon
+    assert index.lookup(47.59, -122.09) == "98004"
+
+
+def test_points_in_a_hole_fall_back_to_the_nearest_point(index):
+    assert index.lookup_polygon(47.60, -122.301) is None
+    assert index.lookup(47.60, -122.301) == "98102"
+
+
+def test_nearest_point_is_only_trusted_within_the_cutoff(index):
+    # ~1.1 km and ~3.3 km north of the 98022 point (cutoff 2 km)
+    assert index.lookup(47.01, -121.00) == "98022"
+    assert index.lookup(47.03, -121.00) is None
+    assert index.lookup(47.90, -122.30) is None
+
+
+def test_lookup_many_matches_lookup(index, tmp_path):
+    lats = [47.52, 47.60, 47.01, 47.03, 47.59]
+    lons = [-122.38, -122.301, -121.00, -121.00, -122.09]
+    expected = [index.lookup(lat, lon) for lat, lon in zip(lats, lons)]
+    assert index.lookup_many(lats, lons) == expected == ["98101", "98102", "98022", None, "98004"]
+
+    index.save(str(tmp_path / "index"))
+    assert ZipcodeIndex.load(str(tmp_path / "index")).lookup_many(lats, lons) == expected
@@ -1,24 +1,33 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
-import joblib
+import argparse
+import json
 import os
+from model_backends import BACKENDS, DEFAULT_BACKEND, get_backend
+from incremental_train import initial_tree_windows
+from model_store import save_model, save_neighbourhood_index, save_tree_windows
+from prepare_data import load_dataset
+
+parser = argparse.ArgumentParser(description="Train the property price model")
+parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=list(BACKENDS),
+                    help="Model backend (see model_backends.py)")
+parser.add_argument("--params", default=None,
+                    help="JSON with estimator params to use, e.g. model/search/best_params.json from tune_tabular.py")
+args = parser.parse_args()
+
+# Optimized parameters per backend (tune_tabular.py searches around the forest's)
+backend = get_backend(args.backend)
+model_params = dict(backend.default_params)
+if args.params:
+    with open(args.params) as f:
+        model_params.update(json.load(f)["params"])
 
 print("=" * 70)
 print("🚀 TRAINING PROPERTY PRICE PREDICTION MODEL WITH ALL FEATURES")
 print("   (Optimized with Hyperparameter Tuning & Regularization)")
 print("=" * 70)
 
-# Load pre-split training and validation data
-print("\n📥 Loading pre-split training data...")
-df_train = pd.read_excel("data/train.xlsx")
-print(f"Training data shape: {df_train.shape}")
-
-print("📥 Loading pre-split validation data...")
-df_validation = pd.read_excel("data/validation.xlsx")
-print(f"Validation data shape: {df_validation.shape}")
-
 # Define all features (exclude id and price)
 feature_columns = [
     "bedrooms", "bathrooms", "sqft_living", "sqft_lot", "floors",
@@ -27,43 +36,36 @@ feature_columns = [
     "lat", "long", "sqft_living15", "sqft_lot15"
 ]
 
+# Load pre-split training and validation data from the columnar cache
+# (the xlsx files are parsed only when they change, see prepare_data.py)
+print("\n📥 Loading pre-split training data...")
+train_data = load_dataset("data/train.xlsx", feature_columns)
+print(f"Training data shape: {train_data.features.shape}")
+
+print("📥 Loading pre-split validation data...")
+validation_data = load_dataset("data/validation.xlsx", feature_columns)
+print(f"Validation data shape: {validation_data.features.shape}")
+
 print(f"\n📊 Using {len(feature_columns)} features:")
 print(f"   {', '.join(feature_columns)}")
 
 # Prepare training features and target
 print("\n🔧 Preparing training data...")
-X_train = df_train[feature_columns].astype(np.float64)
-y_train = df_train["price"].astype(np.float64)
-
-# Remove any NaN values
-X_train = X_train.dropna()
-y_train = y_train[X_train.index]
+# Rows with NaN values are removed; otherwise X is read straight from the memory map
+X_train, y_train = train_data.features_and_target("price")
 
 # Prepare validation features and target
 print("🔧 Preparing validation data...")
-X_val = df_validation[feature_columns].astype(np.float64)
-y_val = df_validation["price"].astype(np.float64)
-
-X_val = X_val.dropna()
-y_val = y_val[X_val.index]
+X_val, y_val = validation_data.features_and_target("price")
 
 print(f"Training set: {X_train.shape[0]} samples")
 print(f"Validation set: {X_val.shape[0]} samples")
 
 # Train model with optimized parameters
-print("\n🤖 Training RandomForest model with optimized parameters...")
-print("   (n_estimators=200, max_depth=20, min_samples_leaf=2)")
-
-model = RandomForestRegressor(
-    n_estimators=200,
-    max_depth=20,
-    min_samples_leaf=2,
-    min_samples_split=5,
-    max_features='sqrt',
-    random_state=42,
-    n_jobs=-1,
-    verbose=1
-)
+print(f"\n🤖 Training {backend.name} model with optimized parameters...")
+print(f"   ({', '.join(f'{name}={value}' for name, value in model_params.items())})")
+
+model = backend.build(model_params, verbose=1)
 
 model.fit(X_train, y_train)
 print("✅ Model training completed!")
@@ -104,23 +106,35 @@ elif overfitting_indicator < 0:
 else:
     print("✅ Good generalization - no significant overfitting")
 
-# Feature importance
-print("\n" + "=" * 70)
-print("🎯 FEATURE IMPORTANCE (Top 10)")
-print("=" * 70)
-feature_importance = pd.DataFrame({
-    'feature': feature_columns,
-    'importance': model.feature_importances_
-}).sort_values('importance', ascending=False)
-
-for idx, row in feature_importance.head(10).iterrows():
-    print(f"{row['feature']:20s}: {row['importance']:.6f} {'█' * int(row['importance'] * 100)}")
-
-# Save model
+# Feature importance (impurity-based; the forest exposes it, boosted trees do not)
+if hasattr(model, "feature_importances_"):
+    print("\n" + "=" * 70)
+    print("🎯 FEATURE IMPORTANCE (Top 10)")
+    print("=" * 70)
+    feature_importance = pd.DataFrame({
+        'feature': feature_columns,
+        'importance': model.feature_importances_
+    }).sort_values('importance', ascending=False)
+
+    for idx, row in feature_importance.head(10).iterrows():
+        print(f"{row['feature']:20s}: {row['importance']:.6f} {'█' * int(row['importance'] * 100)}")
+
+# Save model artifacts (for the forest: pickle plus memory-mappable tree arrays) and model.json,
+# from which the API, the Streamlit app and bulk scoring pick the backend
 os.makedirs("model", exist_ok=True)
-model_path = os.path.join("model", "price_model.pkl")
-joblib.dump(model, model_path)
-print(f"\n✅ Model saved to {model_path}")
+for path in save_model(model, "model", backend.name, model_params,
+                       {"val_r2": val_r2, "val_mae": val_mae, "val_rmse": val_rmse}):
+    print(f"\n✅ Model saved to {path}" if path.endswith(".pkl") else f"✅ Model artifacts saved to {path}")
+
+# Every tree of a fresh forest covers the full training file; incremental_train.py adds later windows
+if hasattr(model, "estimators_"):
+    tree_windows = initial_tree_windows(model, "data/train.xlsx")
+    save_tree_windows(tree_windows["windows"], tree_windows["trees"], "model")
+    print("✅ Tree data windows saved to model/tree_windows.json")
+
+# Save the spatial index used to derive sqft_living15 / sqft_lot15 at prediction time
+neighbourhood_dir = save_neighbourhood_index(train_data.frame(), "model")
+print(f"✅ Neighbourhood index saved to {neighbourhood_dir}")
 
 # Save feature names
 feature_names_path = os.path.join("model", "feature_names.txt")
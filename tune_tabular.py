@@ -0,0 +1,302 @@
+"""
+Hyperparameter search for the price model.
+
+Usage:
+    python tune_tabular.py grid [--workers 8] [--grid grid.json]
+    python tune_tabular.py halving [--eta 3] [--min-rows 1000] [--slo-ms 1.0]
+
+Every candidate RandomForestRegressor is fitted in a worker process on the
+prepared training arrays (see prepare_data.py) and scored on:
+- validation R² and MAE
+- single-row p50/p99 latency and batch throughput with the serving engine (forest_engine.FlatForest)
+- artifact size on disk (`price_model.pkl` and `price_model_flat/`)
+
+`grid` evaluates every combination on the full training set. `halving` runs
+successive halving: all candidates start on a small subsample and each rung keeps
+the best 1/eta (by Pareto rank over accuracy, latency and size, then R²) on eta
+times as many rows, so accurate but slow configurations are not the only survivors.
+
+The Pareto front over (R², p99 latency, flat artifact size) is ranked on the timings
+every candidate was measured under, then re-timed serially into `serial_*` columns,
+since latencies measured while workers compete for cores are inflated. Results go
+to `model/search/results.csv`; the most accurate front member whose serial p99 is
+within `--slo-ms` is written to `model/search/best_params.json` for `python train_tabular.py --params`.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+
+from batch_predictor import DEFAULT_FEATURE_COLUMNS
+from forest_engine import FlatForest
+from prepare_data import load_dataset
+
+DEFAULT_OUT_DIR = os.path.join("model", "search")
+DEFAULT_TRAIN_PATH = os.path.join("data", "train.xlsx")
+DEFAULT_VALIDATION_PATH = os.path.join("data", "validation.xlsx")
+
+# Searched around train_tabular.py's configuration (200 trees, depth 20, sqrt features, leaf 2)
+DEFAULT_GRID = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [10, 15, 20, None],
+    "max_features": ["sqrt", 0.5, 1.0],
+    "min_samples_leaf": [1, 2, 4],
+}
+# Fixed for every candidate, as in train_tabular.py
+BASE_PARAMS = {"min_samples_split": 5, "random_state": 42}
+
+LATENCY_ROWS = 200
+BATCH_ROWS = 1000
+# Objectives of the Pareto front: column -> +1 to maximize, -1 to minimize
+OBJECTIVES = {"r2": 1, "latency_p99_ms": -1, "flat_mb": -1}
+# Rungs run with every worker busy, where p99 is dominated by scheduling noise; rank them on p50
+RUNG_OBJECTIVES = {"r2": 1, "latency_p50_ms": -1, "flat_mb": -1}
+# Measured again without competing workers for the Pareto front
+TIMING_COLUMNS = ("latency_p50_ms", "latency_p99_ms", "batch_rows_per_sec")
+
+_worker_data = None
+
+
+def _init_worker(train_path, validation_path):
+    """Memory-map the prepared datasets once per worker process."""
+    global _worker_data
+    X_train, y_train = load_dataset(train_path, DEFAULT_FEATURE_COLUMNS).features_and_target("price")
+    X_val, y_val = load_dataset(validation_path, DEFAULT_FEATURE_COLUMNS).features_and_target("price")
+    # Fixed shuffle so successive-halving rungs train on nested subsamples
+    order = np.random.default_rng(0).permutation(len(X_train))
+    _worker_data = (X_train, y_train, X_val, y_val, order)
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    """Every combination of the grid's values, as parameter dicts."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _directory_mb(directory: str) -> float:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 1e6
+
+
+def evaluate_candidate(params: Dict, n_rows: Optional[int] = None) -> Dict:
+    """Fit one configuration on the first n_rows of the shuffled training set and measure it."""
+    X_train, y_train, X_val, y_val, order = _worker_data
+    if n_rows and n_rows < len(order):
+        X_train, y_train = X_train[order[:n_rows]], y_train[order[:n_rows]]
+    # On the full set rows stay in file order, so train_tabular.py --params reproduces the same forest
+
+    started = time.perf_counter()
+    model = RandomForestRegressor(**BASE_PARAMS, **params, n_jobs=1)
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+
+    y_pred = model.predict(X_val)
+    flat = FlatForest.from_sklearn(model)
+
+    flat.predict(X_val[:1])  # warm-up
+    latencies = []
+    for i in range(min(LATENCY_ROWS, len(X_val))):
+        row = X_val[i:i + 1]
+        started = time.perf_counter()
+        flat.predict(row)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    batch = np.resize(X_val, (BATCH_ROWS, X_val.shape[1]))
+    batch_seconds = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        flat.predict(batch)
+        batch_seconds = min(batch_seconds, time.perf_counter() - started)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pickle_path = os.path.join(tmp_dir, "price_model.pkl")
+        joblib.dump(model, pickle_path)
+        flat.save(os.path.join(tmp_dir, "price_model_flat"))
+        pickle_mb = os.path.getsize(pickle_path) / 1e6
+        flat_mb = _directory_mb(os.path.join(tmp_dir, "price_model_flat"))
+
+    return {
+        **params,
+        "train_rows": len(X_train),
+        "r2": float(r2_score(y_val, y_pred)),
+        "mae": float(mean_absolute_error(y_val, y_pred)),
+        "fit_seconds": round(fit_seconds, 3),
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p99_ms": float(np.percentile(latencies, 99)),
+        "batch_rows_per_sec": BATCH_ROWS / batch_seconds,
+        "n_nodes": int(len(flat.feature)),
+        "pickle_mb": pickle_mb,
+        "flat_mb": flat_mb
+    }
+
+
+def _evaluate_star(args):
+    candidate, params, n_rows = args
+    return {"candidate": candidate, **evaluate_candidate(params, n_rows)}
+
+
+def pareto_ranks(results: pd.DataFrame, objectives: Dict[str, int] = OBJECTIVES) -> np.ndarray:
+    """Non-dominated sorting: 0 for the Pareto front, 1 for the front once it is removed, and so on."""
+    # Flip maximized objectives so that smaller is better everywhere
+    scores = np.column_stack([-sign * results[name].to_numpy(dtype=np.float64) for name, sign in objectives.items()])
+    ranks = np.full(len(scores), -1)
+    rank = 0
+    while (ranks < 0).any():
+        remaining = np.flatnonzero(ranks < 0)
+        candidates = scores[remaining]
+        # i is dominated if some j is no worse everywhere and strictly better somewhere
+        no_worse = (candidates[None, :, :] <= candidates[:, None, :]).all(axis=2)
+        better = (candidates[None, :, :] < candidates[:, None, :]).any(axis=2)
+        dominated = (no_worse & better).any(axis=1)
+        ranks[remaining[~dominated]] = rank
+        rank += 1
+    return ranks
+
+
+def run_grid(candidates: List[Dict], pool: ProcessPoolExecutor) -> pd.DataFrame:
+    results = pd.DataFrame(list(pool.map(_evaluate_star, [(i, params, None) for i, params in enumerate(candidates)])))
+    results.insert(0, "rung", 0)
+    return results
+
+
+def run_halving(candidates: List[Dict], pool: ProcessPoolExecutor, n_train: int, eta: int = 3,
+                min_rows: int = 1000) -> pd.DataFrame:
+    """
+    Successive halving with the training rows as the resource: rung r trains the
+    survivors on n_train / eta**(n_rungs - 1 - r) rows; the last rung uses all rows.
+    """
+    n_rungs = 1
+    while eta ** n_rungs <= len(candidates) and n_train // eta ** n_rungs >= min_rows:
+        n_rungs += 1
+
+    rungs = []
+    survivors = list(range(len(candidates)))
+    for rung in range(n_rungs):
+        n_rows = n_train // eta ** (n_rungs - 1 - rung)
+        print(f"   rung {rung}: {len(survivors)} candidates on {n_rows:,} rows")
+        results = pd.DataFrame(list(pool.map(_evaluate_star, [(i, candidates[i], n_rows) for i in survivors])))
+        results.insert(0, "rung", rung)
+        rungs.append(results)
+        if rung < n_rungs - 1:
+            order = np.lexsort((-results["r2"].to_numpy(), pareto_ranks(results, RUNG_OBJECTIVES)))
+            survivors = [survivors[i] for i in order[:math.ceil(len(survivors) / eta)]]
+    return pd.concat(rungs, ignore_index=True)
+
+
+def choose_for_slo(front: pd.DataFrame, slo_ms: Optional[float]) -> pd.Series:
+    """The most accurate front member whose serial p99 latency meets the SLO (the fastest one if none does)."""
+    if slo_ms is not None:
+        within = front[front["serial_latency_p99_ms"] <= slo_ms]
+        if within.empty:
+            return front.loc[front["serial_latency_p99_ms"].idxmin()]
+        return within.loc[within["r2"].idxmax()]
+    return front.loc[front["r2"].idxmax()]
+
+
+def search(mode: str, grid: Dict[str, List] = None, train_path: str = DEFAULT_TRAIN_PATH,
+           validation_path: str = DEFAULT_VALIDATION_PATH, out_dir: str = DEFAULT_OUT_DIR,
+           workers: Optional[int] = None, eta: int = 3, min_rows: int = 1000,
+           slo_ms: Optional[float] = None) -> pd.DataFrame:
+    """Run a grid or successive-halving search; writes results.csv and best_params.json to out_dir."""
+    grid = grid or DEFAULT_GRID
+    candidates = expand_grid(grid)
+    workers = workers or os.cpu_count() or 1
+    param_names = list(grid)
+    started = time.perf_counter()
+
+    # Prepare the datasets once here so workers only memory-map them
+    _init_worker(train_path, validation_path)
+    n_train = len(_worker_data[0])
+    print(f"🔎 {mode}: {len(candidates)} candidates, {workers} workers, {n_train:,} training rows")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(train_path, validation_path)) as pool:
+        if mode == "halving":
+            results = run_halving(candidates, pool, n_train, eta, min_rows)
+        else:
+            results = run_grid(candidates, pool)
+
+    # The front is taken over the candidates evaluated on the full training set
+    final = results[results["rung"] == results["rung"].max()].copy()
+    final["pareto_rank"] = pareto_ranks(final)
+    front_index = final.index[final["pareto_rank"] == 0]
+
+    # Re-time the front without competing workers (the refit is deterministic). The serial
+    # timings go in their own columns: the ranking stays on the contended timings every
+    # candidate was measured under, and the SLO is checked on the serial ones.
+    print(f"⏱️  Re-timing {len(front_index)} Pareto-optimal candidates serially...")
+    for i in front_index:
+        measured = evaluate_candidate(candidates[final.at[i, "candidate"]])
+        for column in TIMING_COLUMNS:
+            final.at[i, f"serial_{column}"] = measured[column]
+    results = results.join(final[["pareto_rank"] + [f"serial_{column}" for column in TIMING_COLUMNS]])
+
+    os.makedirs(out_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, "results.csv")
+    results.to_csv(results_path, index=False)
+
+    front = final[final["pareto_rank"] == 0].sort_values("r2", ascending=False)
+    columns = param_names + ["r2", "mae", "latency_p99_ms", "serial_latency_p50_ms", "serial_latency_p99_ms",
+                             "serial_batch_rows_per_sec", "flat_mb", "pickle_mb"]
+    print(f"\n🏁 Pareto front ({len(front)} of {len(final)} full-data candidates):")
+    print(front[columns].to_string(index=False, float_format=lambda v: f"{v:,.4g}"))
+
+    best = choose_for_slo(front, slo_ms)
+    best_params = candidates[int(best["candidate"])]
+    best_path = os.path.join(out_dir, "best_params.json")
+    with open(best_path, "w") as f:
+        json.dump({
+            "params": best_params,
+            "slo_ms": slo_ms,
+            "metrics": {name: float(best[name]) for name in
+                        ("r2", "mae", "serial_latency_p50_ms", "serial_latency_p99_ms",
+                         "serial_batch_rows_per_sec", "flat_mb", "pickle_mb")}
+        }, f, indent=2)
+
+    slo_text = f"p99 <= {slo_ms} ms" if slo_ms is not None else "no latency SLO"
+    print(f"\n✅ Selected for {slo_text}: {best_params}")
+    print(f"   R² {best['r2']:.4f} | MAE ${best['mae']:,.0f} | serial p99 {best['serial_latency_p99_ms']:.3f} ms | "
+          f"{best['flat_mb']:.1f} MB flat")
+    print(f"✅ {len(results)} evaluations in {time.perf_counter() - started:.0f}s -> {results_path}, {best_path}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperparameter search for the price model")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, help_text in (("grid", "Evaluate every grid combination on the full training set"),
+                               ("halving", "Successive halving over training-set subsamples")):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument("--grid", default=None, help="JSON file mapping parameter names to value lists")
+        sub.add_argument("--train", default=DEFAULT_TRAIN_PATH)
+        sub.add_argument("--validation", default=DEFAULT_VALIDATION_PATH)
+        sub.add_argument("--out", default=DEFAULT_OUT_DIR)
+        sub.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+        sub.add_argument("--slo-ms", type=float, default=None, help="Single-row p99 latency budget for the selection")
+        if command == "halving":
+            sub.add_argument("--eta", type=int, default=3, help="Keep 1/eta of the candidates per rung")
+            sub.add_argument("--min-rows", type=int, default=1000, help="Training rows of the first rung (at least)")
+
+    args = parser.parse_args()
+    grid = None
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    search(args.command, grid, train_path=args.train, validation_path=args.validation, out_dir=args.out,
+           workers=args.workers, eta=getattr(args, "eta", 3), min_rows=getattr(args, "min_rows", 1000),
+           slo_ms=args.slo_ms)
+
+
+if __name__ == "__main__":
+    main()
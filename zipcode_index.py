@@ -0,0 +1,245 @@
+"""
+Offline reverse-geocoding index for zipcode lookups.
+
+Two sources can be indexed:
+- ZCTA polygons (a Census ZIP Code Tabulation Area GeoJSON export), answered
+  with a bbox prefilter and an even-odd point-in-polygon test in NumPy;
+- the lat/long/zipcode tuples of data/train.xlsx, answered with a KD-tree
+  nearest-neighbour lookup (used where no polygon matches).
+
+Either way get_zipcode resolves points in the covered area locally in
+microseconds instead of calling Nominatim.
+
+Usage:
+    python zipcode_index.py build [--train data/train.xlsx] [--zcta zcta.geojson] [--out zipcode_index]
+"""
+import argparse
+import json
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from geo_utils import METERS_PER_DEGREE
+
+DEFAULT_INDEX_DIR = os.getenv(
+    "ZIPCODE_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "zipcode_index")
+)
+META_FILENAME = "zipcode_index.json"
+# Nearest-neighbour answers further than this from any training point are not trusted
+DEFAULT_MAX_DISTANCE_METERS = 2000
+# Property names holding the 5-digit code in Census ZCTA exports (2020, 2010) and generic files
+ZCTA_PROPERTIES = ("ZCTA5CE20", "ZCTA5CE10", "GEOID20", "GEOID10", "ZCTA5", "zipcode", "ZIP")
+
+
+def polygons_from_geojson(path: str):
+    """
+    Flatten ZCTA polygons into arrays: ring vertices (lon, lat), ring start offsets,
+    the polygon each ring belongs to, per-polygon bboxes and per-polygon zipcodes.
+    """
+    with open(path) as f:
+        features = json.load(f).get("features", [])
+
+    vertices, ring_offsets, ring_polygon, bboxes, zipcodes = [], [0], [], [], []
+    for feature in features:
+        properties = feature.get("properties") or {}
+        zipcode = next((str(properties[key]) for key in ZCTA_PROPERTIES if properties.get(key)), None)
+        geometry = feature.get("geometry") or {}
+        if zipcode is None or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+            continue
+        parts = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+        for rings in parts:
+            polygon = len(zipcodes)
+            ring_arrays = [np.asarray(ring, dtype=np.float64)[:, :2] for ring in rings if len(ring) >= 3]
+            if not ring_arrays:
+                continue
+            for ring in ring_arrays:
+                vertices.append(ring)
+                ring_offsets.append(ring_offsets[-1] + len(ring))
+                ring_polygon.append(polygon)
+            outer = ring_arrays[0]
+            bboxes.append((outer[:, 1].min(), outer[:, 0].min(), outer[:, 1].max(), outer[:, 0].max()))
+            zipcodes.append(zipcode.split("-")[0])
+
+    return (
+        np.concatenate(vertices) if vertices else np.empty((0, 2)),
+        np.array(ring_offsets, dtype=np.int64),
+        np.array(ring_polygon, dtype=np.int64),
+        np.array(bboxes, dtype=np.float64).reshape(-1, 4),
+        np.array(zipcodes, dtype="U10")
+    )
+
+
+def points_from_training(train_path: str = os.path.join("data", "train.xlsx")):
+    """Unique (lat, lon) -> zipcode tuples from the training data."""
+    import pandas as pd
+
+    df = pd.read_excel(train_path, usecols=["lat", "long", "zipcode"]).dropna().drop_duplicates(["lat", "long"])
+    coords = df[["lat", "long"]].to_numpy(dtype=np.float64)
+    zipcodes = df["zipcode"].astype(np.int64).astype(str).to_numpy(dtype="U10")
+    return coords, zipcodes
+
+
+class ZipcodeIndex:
+    """
+    Point-in-polygon over ZCTA rings (optional) with a KD-tree nearest-neighbour
+    fallback over known (lat, lon, zipcode) points.
+    """
+
+    def __init__(self, points: np.ndarray, point_zipcodes: np.ndarray,
+                 vertices: Optional[np.ndarray] = None, ring_offsets: Optional[np.ndarray] = None,
+                 ring_polygon: Optional[np.ndarray] = None, polygon_bbox: Optional[np.ndarray] = None,
+                 polygon_zipcodes: Optional[np.ndarray] = None,
+                 max_distance_meters: float = DEFAULT_MAX_DISTANCE_METERS):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.point_zipcodes = np.asarray(point_zipcodes)
+        self.vertices = vertices if vertices is not None else np.empty((0, 2))
+        self.ring_offsets = ring_offsets if ring_offsets is not None else np.zeros(1, dtype=np.int64)
+        self.ring_polygon = ring_polygon if ring_polygon is not None else np.empty(0, dtype=np.int64)
+        self.polygon_bbox = polygon_bbox if polygon_bbox is not None else np.empty((0, 4))
+        self.polygon_zipcodes = polygon_zipcodes if polygon_zipcodes is not None else np.empty(0, dtype="U10")
+        self.max_distance_meters = max_distance_meters
+
+        lat_mid = float(self.points[:, 0].mean()) if len(self.points) else 0.0
+        self.lon_scale = float(np.cos(np.radians(lat_mid)))
+        self.tree = cKDTree(self._project(self.points[:, 0], self.points[:, 1])) if len(self.points) else None
+
+    def _project(self, lat, lon):
+        return np.column_stack((
+            np.asarray(lon, dtype=np.float64) * METERS_PER_DEGREE * self.lon_scale,
+            np.asarray(lat, dtype=np.float64) * METERS_PER_DEGREE
+        ))
+
+    @classmethod
+    def build(cls, train_path: Optional[str] = os.path.join("data", "train.xlsx"),
+              zcta_path: Optional[str] = None) -> "ZipcodeIndex":
+        points, point_zipcodes = np.empty((0, 2)), np.empty(0, dtype="U10")
+        if train_path:
+            points, point_zipcodes = points_from_training(train_path)
+        polygons = polygons_from_geojson(zcta_path) if zcta_path else ()
+        return cls(points, point_zipcodes, *polygons)
+
+    def save(self, directory: str = DEFAULT_INDEX_DIR):
+        os.makedirs(directory, exist_ok=True)
+        for name in ("points", "point_zipcodes", "vertices", "ring_offsets", "ring_polygon",
+                     "polygon_bbox", "polygon_zipcodes"):
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, META_FILENAME), "w") as f:
+            json.dump({
+                "points": len(self.points),
+                "polygons": len(self.polygon_zipcodes),
+                "max_distance_meters": self.max_distance_meters
+            }, f)
+
+    @classmethod
+    def load(cls, directory: str = DEFAULT_INDEX_DIR) -> "ZipcodeIndex":
+        with open(os.path.join(directory, META_FILENAME)) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"))
+            for name in ("points", "point_zipcodes", "vertices", "ring_offsets", "ring_polygon",
+                         "polygon_bbox", "polygon_zipcodes")
+        }
+        return cls(max_distance_meters=meta["max_distance_meters"], **arrays)
+
+    def _polygon_contains(self, polygon: int, lat: float, lon: float) -> bool:
+        """Even-odd ray casting over every ring of a polygon (holes flip the parity back)."""
+        inside = False
+        first, last = np.searchsorted(self.ring_polygon, [polygon, polygon + 1])
+        for ring in range(first, last):
+            ring_vertices = self.vertices[self.ring_offsets[ring]:self.ring_offsets[ring + 1]]
+            x0, y0 = ring_vertices[:, 0], ring_vertices[:, 1]
+            x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+            crosses = (y0 > lat) != (y1 > lat)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_at = x0 + (lat - y0) * (x1 - x0) / (y1 - y0)
+            inside ^= bool(np.count_nonzero(crosses & (lon < x_at)) % 2)
+        return inside
+
+    def lookup_polygon(self, lat: float, lon: float) -> Optional[str]:
+        if not len(self.polygon_zipcodes):
+            return None
+        bbox = self.polygon_bbox
+        candidates = np.flatnonzero((bbox[:, 0] <= lat) & (lat <= bbox[:, 2]) & (bbox[:, 1] <= lon) & (lon <= bbox[:, 3]))
+        for polygon in candidates:
+            if self._polygon_contains(polygon, lat, lon):
+                return str(self.polygon_zipcodes[polygon])
+        return None
+
+    def lookup_nearest(self, lats, lons) -> List[Optional[str]]:
+        """Zipcode of the nearest known point for each coordinate, None beyond max_distance_meters."""
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        if self.tree is None:
+            return [None] * len(lats)
+        distances, nearest = self.tree.query(self._project(lats, lons), k=1)
+        return [
+            str(self.point_zipcodes[i]) if d <= self.max_distance_meters else None
+            for d, i in zip(distances, nearest)
+        ]
+
+    def lookup(self, lat: float, lon: float) -> Optional[str]:
+        """Zipcode for a point: containing ZCTA polygon first, else the nearest known point."""
+        return self.lookup_polygon(lat, lon) or self.lookup_nearest(lat, lon)[0]
+
+    def lookup_many(self, lats, lons) -> List[Optional[str]]:
+        """lookup() over arrays of points, with one vectorized KD-tree query for the fallback."""
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        results = [self.lookup_polygon(lat, lon) for lat, lon in zip(lats, lons)]
+        missing = [i for i, zipcode in enumerate(results) if zipcode is None]
+        if missing:
+            for i, zipcode in zip(missing, self.lookup_nearest(lats[missing], lons[missing])):
+                results[i] = zipcode
+        return results
+
+
+def build_zipcode_index(out_dir: str = DEFAULT_INDEX_DIR, train_path: Optional[str] = os.path.join("data", "train.xlsx"),
+                        zcta_path: Optional[str] = None) -> ZipcodeIndex:
+    """Build and save a ZipcodeIndex from the training data and/or a ZCTA GeoJSON file."""
+    index = ZipcodeIndex.build(train_path, zcta_path)
+    index.save(out_dir)
+    print(f"✅ Indexed {len(index.points):,} training points and {len(index.polygon_zipcodes):,} ZCTA polygons -> {out_dir}")
+    return index
+
+
+_zipcode_index = None
+_zipcode_index_loaded = False
+_zipcode_index_lock = threading.Lock()
+
+
+def get_zipcode_index() -> Optional[ZipcodeIndex]:
+    """Process-wide ZipcodeIndex from ZIPCODE_INDEX_DIR, or None if no index has been built."""
+    global _zipcode_index, _zipcode_index_loaded
+    if not _zipcode_index_loaded:
+        with _zipcode_index_lock:
+            if not _zipcode_index_loaded:
+                if os.path.exists(os.path.join(DEFAULT_INDEX_DIR, META_FILENAME)):
+                    try:
+                        _zipcode_index = ZipcodeIndex.load(DEFAULT_INDEX_DIR)
+                    except Exception as e:
+                        print(f"Could not load zipcode index: {e}")
+                _zipcode_index_loaded = True
+    return _zipcode_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline zipcode reverse-geocoding index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build the index from training points and/or ZCTA polygons")
+    build_parser.add_argument("--train", default=os.path.join("data", "train.xlsx"),
+                              help="Training file with lat/long/zipcode columns ('' to skip)")
+    build_parser.add_argument("--zcta", default=None, help="ZCTA polygons as GeoJSON")
+    build_parser.add_argument("--out", default=DEFAULT_INDEX_DIR)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_zipcode_index(args.out, train_path=args.train or None, zcta_path=args.zcta)
+
+
+if __name__ == "__main__":
+    main()